@@ -0,0 +1,157 @@
+"""
+音乐响度包络
+在后台线程中解码一次背景音乐，计算每帧的整体响度和低频能量包络并缓存到磁盘，
+渲染循环只按播放位置查表，不做实时频谱分析
+"""
+import hashlib
+import os
+import threading
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pygame
+
+
+# 每秒包络帧数
+ENVELOPE_RATE = 60
+# 低频能量的频率上限（Hz）
+BASS_CUTOFF_HZ = 200.0
+# 计算逻辑变化时递增，使旧缓存失效
+ENVELOPE_VERSION = 1
+# 每次做 FFT 的帧数（限制计算时的临时内存）
+FFT_BATCH = 1024
+
+
+# ============================================================================
+# 包络计算
+# ============================================================================
+
+def _release(values: np.ndarray, decay: float) -> np.ndarray:
+    """快速上升、按 decay 逐帧衰减，使脉冲在节拍之间平滑回落"""
+    result = np.empty_like(values)
+    level = 0.0
+    for i, value in enumerate(values.tolist()):
+        level = value if value > level else level * decay
+        result[i] = level
+    return result
+
+
+def compute_envelope(samples: np.ndarray, sample_rate: int, rate: int = ENVELOPE_RATE,
+                     decay: float = 0.85) -> np.ndarray:
+    """
+    计算响度包络
+
+    Args:
+        samples: 解码后的采样（(n,) 或 (n, 声道数)，整数或浮点）
+        sample_rate: 采样率
+        rate: 每秒包络帧数
+        decay: 每帧衰减系数
+
+    Returns:
+        (帧数, 2) 的 float32 数组，两列分别为整体响度和低频能量，按 95 分位数归一化到 [0, 1]
+    """
+    mono = samples.astype(np.float32)
+    if mono.ndim == 2:
+        mono = mono.mean(axis=1)
+    hop = max(1, sample_rate // rate)
+    frames = len(mono) // hop
+    if frames == 0:
+        return np.zeros((1, 2), dtype=np.float32)
+    blocks = mono[:frames * hop].reshape(frames, hop)
+
+    window = np.hanning(hop).astype(np.float32)
+    bass_bins = np.fft.rfftfreq(hop, 1.0 / sample_rate) < BASS_CUTOFF_HZ
+    envelope = np.empty((frames, 2), dtype=np.float32)
+    for start in range(0, frames, FFT_BATCH):
+        batch = blocks[start:start + FFT_BATCH]
+        envelope[start:start + len(batch), 0] = np.sqrt(np.mean(batch * batch, axis=1))
+        spectrum = np.abs(np.fft.rfft(batch * window, axis=1)[:, bass_bins])
+        envelope[start:start + len(batch), 1] = np.sqrt(np.mean(spectrum * spectrum, axis=1))
+
+    for column in range(2):
+        reference = float(np.percentile(envelope[:, column], 95))
+        if reference > 0:
+            envelope[:, column] = np.clip(envelope[:, column] / reference, 0.0, 1.0)
+        envelope[:, column] = _release(envelope[:, column], decay)
+    return envelope
+
+
+# ============================================================================
+# 后台加载与查表
+# ============================================================================
+
+class AudioEnvelope:
+    """音乐包络：后台线程加载（优先读缓存），渲染循环按播放位置查表"""
+
+    def __init__(self, audio_path: str, fallback_cache_dir: str, rate: int = ENVELOPE_RATE):
+        """
+        初始化包络
+
+        Args:
+            audio_path: 音乐文件路径
+            fallback_cache_dir: 音乐文件所在目录不可写时（例如打包后）使用的缓存目录
+            rate: 每秒包络帧数
+        """
+        self.audio_path = audio_path
+        self.fallback_cache_dir = fallback_cache_dir
+        self.rate = rate
+        self.envelope: Optional[np.ndarray] = None  # 加载完成后整体替换，读取方无需加锁
+        self._thread = threading.Thread(target=self._load, name="audio-envelope", daemon=True)
+
+    def start(self) -> None:
+        """启动后台加载"""
+        self._thread.start()
+
+    def cache_paths(self) -> Sequence[str]:
+        """缓存文件候选路径：音乐文件旁，其次是用户缓存目录"""
+        stat = os.stat(self.audio_path)
+        mixer = pygame.mixer.get_init()
+        key = f"{ENVELOPE_VERSION}:{stat.st_size}:{stat.st_mtime_ns}:{self.rate}:{mixer}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        name = f"{os.path.splitext(os.path.basename(self.audio_path))[0]}.envelope-{digest}.npy"
+        return (os.path.join(os.path.dirname(os.path.abspath(self.audio_path)), name),
+                os.path.join(self.fallback_cache_dir, name))
+
+    def _load(self) -> None:
+        """读取缓存；没有缓存时解码音乐、计算包络并写入第一个可写的缓存位置"""
+        try:
+            paths = self.cache_paths()
+            for path in paths:
+                if os.path.exists(path):
+                    try:
+                        self.envelope = np.load(path)
+                        print(f"Audio envelope loaded: {path}")
+                        return
+                    except (OSError, ValueError) as error:
+                        print(f"Failed to load audio envelope '{path}': {error}")
+
+            frequency = pygame.mixer.get_init()[0]
+            samples = pygame.sndarray.array(pygame.mixer.Sound(self.audio_path))
+            envelope = compute_envelope(samples, frequency, self.rate)
+            del samples
+            self.envelope = envelope
+
+            for path in paths:
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    temp_path = f"{path}.{os.getpid()}.tmp.npy"
+                    np.save(temp_path, envelope)
+                    os.replace(temp_path, path)
+                    print(f"Audio envelope cached: {path} ({len(envelope)} frames)")
+                    break
+                except OSError:
+                    continue
+        except (OSError, pygame.error, ValueError) as error:
+            print(f"Audio-reactive effects unavailable: {error}")
+
+    def level(self, position_ms: int) -> Tuple[float, float]:
+        """
+        按播放位置返回 (响度, 低频能量)，尚未加载完成或音乐未播放时返回 (0, 0)
+
+        get_pos 返回自开始播放以来的毫秒数（循环播放时持续增长），按包络长度取模。
+        """
+        envelope = self.envelope
+        if envelope is None or position_ms < 0:
+            return 0.0, 0.0
+        loudness, bass = envelope[(position_ms * self.rate // 1000) % len(envelope)]
+        return float(loudness), float(bass)
@@ -6,6 +6,7 @@
 使用方法：
   普通应用：pyinstaller build.spec
   Windows 屏保：pyinstaller build.spec --screensaver
+  内置预烘焙场景：BAKE_SCENE=1 pyinstaller build.spec
 """
 
 import os
@@ -20,9 +21,21 @@ IS_LINUX = sys.platform.startswith('linux')
 # 检查是否构建屏保版本（通过环境变量或命令行参数）
 IS_SCREENSAVER = os.environ.get('BUILD_SCREENSAVER', '0') == '1' or '--screensaver' in sys.argv
 
+# 是否预先烘焙默认场景并打包（通过环境变量或命令行参数）
+BAKE_SCENE = os.environ.get('BAKE_SCENE', '0') == '1' or '--bake-scene' in sys.argv
+
 # 获取 pygame 路径
 pygame_path = os.path.dirname(pygame.__file__)
 
+# 烘焙默认场景：启动时直接内存映射加载，跳过粒子生成
+scene_datas = []
+if BAKE_SCENE:
+    import shutil
+    import subprocess
+    shutil.rmtree('scene_cache', ignore_errors=True)
+    subprocess.check_call([sys.executable, 'main.py', '--bake-scene', 'scene_cache'])
+    scene_datas.append(('scene_cache', 'scene_cache'))
+
 # 根据模式选择入口文件和输出名称
 if IS_SCREENSAVER and IS_WINDOWS:
     entry_script = 'screensaver.py'
@@ -60,7 +73,7 @@ a = Analysis(
         ('music.mp3', '.'),  # 包含音乐文件到根目录
         ('icon.png', '.'),  # 运行时加载的窗口图标
         ('icons', 'icons'),  # 音量控制图标目录
-    ],
+    ] + scene_datas,
     hiddenimports=hidden_imports,
     hookspath=[],
     hooksconfig={},
@@ -147,4 +160,5 @@ print(f"Platform: {'Windows' if IS_WINDOWS else 'macOS' if IS_MACOS else 'Linux'
 print(f"Mode: {'Screensaver' if IS_SCREENSAVER else 'Application'}")
 print(f"Entry: {entry_script}")
 print(f"Output: {app_name}")
+print(f"Baked scene: {'yes' if BAKE_SCENE else 'no'}")
 print("=" * 60)
@@ -0,0 +1,94 @@
+"""
+相机
+偏航（绕Y轴）、俯仰（绕X轴）和缩放组合成一个 3×4 仿射视图矩阵，每帧只计算一次，
+所有粒子在原有的旋转阶段中一次完成变换；透视投影、雾化和近平面剔除仍按视图空间的 z 计算
+"""
+import math
+from typing import NamedTuple, Tuple
+
+# 3×4 仿射矩阵按行展开：(m00, m01, m02, tx, m10, m11, m12, ty, m20, m21, m22, tz)
+# x' = m00·x + m01·y + m02·z + tx，y'、z' 同理
+View = Tuple[float, float, float, float, float, float, float, float, float, float, float, float]
+Vector = Tuple[float, float, float]
+
+IDENTITY: View = (1.0, 0.0, 0.0, 0.0,
+                  0.0, 1.0, 0.0, 0.0,
+                  0.0, 0.0, 1.0, 0.0)
+
+
+def yaw_pitch_view(yaw: float, pitch: float, dolly: float = 0.0) -> View:
+    """
+    先绕Y轴旋转 yaw，再绕X轴旋转 pitch，最后沿视线平移 dolly
+
+    pitch 为正时相机抬高、向下俯视树（屏幕 y 轴向下）；pitch 为 0 时与 Particle.rotate_y 的结果逐位相同。
+    """
+    cos_y, sin_y = math.cos(yaw), math.sin(yaw)
+    cos_p, sin_p = math.cos(pitch), math.sin(pitch)
+    return (cos_y, 0.0, -sin_y, 0.0,
+            -sin_p * sin_y, cos_p, -sin_p * cos_y, 0.0,
+            cos_p * sin_y, sin_p, cos_p * cos_y, dolly)
+
+
+def rotation_y(angle: float, factor: float = 1.0, translation: Vector = (0.0, 0.0, 0.0)) -> View:
+    """绕Y轴旋转 angle、均匀缩放 factor 后平移（森林实例的模型变换）"""
+    cos_a, sin_a = math.cos(angle) * factor, math.sin(angle) * factor
+    tx, ty, tz = translation
+    return (cos_a, 0.0, -sin_a, tx,
+            0.0, factor, 0.0, ty,
+            sin_a, 0.0, cos_a, tz)
+
+
+def compose(outer: View, inner: View) -> View:
+    """组合两个变换：先 inner 后 outer"""
+    result = []
+    for row in range(3):
+        a0, a1, a2, at = outer[row * 4:row * 4 + 4]
+        for column in range(4):
+            value = a0 * inner[column] + a1 * inner[4 + column] + a2 * inner[8 + column]
+            result.append(value + at if column == 3 else value)
+    return tuple(result)
+
+
+def scale_of(view: View) -> float:
+    """变换的均匀缩放系数（第一列的长度），旋转误差范围内的刚体变换返回精确的 1.0"""
+    scale = math.sqrt(view[0] * view[0] + view[4] * view[4] + view[8] * view[8])
+    return 1.0 if abs(scale - 1.0) < 1e-9 else scale
+
+
+def transform_point(view: View, point: Vector) -> Vector:
+    """变换一个点"""
+    x, y, z = point
+    return (view[0] * x + view[1] * y + view[2] * z + view[3],
+            view[4] * x + view[5] * y + view[6] * z + view[7],
+            view[8] * x + view[9] * y + view[10] * z + view[11])
+
+
+def inverse(view: View) -> View:
+    """旋转加均匀缩放再平移的变换的逆变换（转置除以缩放的平方）"""
+    inv_sq = 1.0 / (scale_of(view) ** 2)
+    rows = [[view[column * 4 + row] * inv_sq for column in range(3)] for row in range(3)]
+    translation = (view[3], view[7], view[11])
+    result = []
+    for row in rows:
+        result.extend(row)
+        result.append(-sum(r * t for r, t in zip(row, translation)))
+    return tuple(result)
+
+
+class Camera(NamedTuple):
+    """相机状态：偏航、俯仰（弧度）和缩放倍数（可在进程间传递）"""
+    yaw: float = 0.0
+    pitch: float = 0.0
+    zoom: float = 1.0
+
+    def dolly(self, view_distance: float) -> float:
+        """缩放对应的视线方向平移：相机到场景中心的距离变为 view_distance / zoom"""
+        return view_distance / self.zoom - view_distance
+
+    def view(self, view_distance: float) -> View:
+        """随场景旋转的对象（树、心形、地面）使用的视图矩阵"""
+        return yaw_pitch_view(self.yaw, self.pitch, self.dolly(view_distance))
+
+    def static_view(self, view_distance: float) -> View:
+        """不随场景旋转的对象（雪花、火花、森林实例）使用的视图矩阵：只有俯仰和缩放"""
+        return yaw_pitch_view(0.0, self.pitch, self.dolly(view_distance))
@@ -0,0 +1,151 @@
+"""
+外部配置文件
+从 TOML 或 JSON 文件读取 Config 覆盖值（键名与 Config 属性相同），
+并在后台线程中监视文件变化，供运行中热重载
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    tomllib = None
+
+
+# ============================================================================
+# 读取与应用
+# ============================================================================
+
+def load_config_file(path: str) -> Dict[str, object]:
+    """读取配置文件（按扩展名区分 .toml / .json），返回 {键: 值}"""
+    if path.lower().endswith(".toml"):
+        if tomllib is None:
+            raise ValueError("TOML config files require Python 3.11+, use JSON instead")
+        with open(path, "rb") as config_file:
+            values = tomllib.load(config_file)
+    else:
+        with open(path, "r", encoding="utf-8") as config_file:
+            values = json.load(config_file)
+    if not isinstance(values, dict):
+        raise ValueError(f"{path}: expected a table of Config values")
+    return values
+
+
+def _coerce(current: object, value: object) -> object:
+    """把文件中的值转换为与当前值相同的形式（JSON/TOML 的数组对应元组或元组列表）"""
+    if isinstance(current, tuple) and isinstance(value, list):
+        return tuple(value)
+    if (isinstance(current, list) and isinstance(value, list) and current
+            and isinstance(current[0], tuple)):
+        return [tuple(item) if isinstance(item, list) else item for item in value]
+    if isinstance(current, float) and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def config_values(config: type) -> Dict[str, object]:
+    """config 类中全部配置项（大写属性）的当前值"""
+    return {key: getattr(config, key) for key in dir(config) if key.isupper()}
+
+
+def apply_config_values(config: type, values: Dict[str, object], skip: Sequence[str] = (),
+                        defaults: Optional[Dict[str, object]] = None,
+                        previous: Sequence[str] = ()) -> Tuple[List[str], List[str]]:
+    """
+    把配置值写入 config 类
+
+    Args:
+        config: 配置类（Config）
+        values: {键: 值}，未知的键会被忽略并提示
+        skip: 不应用的键（例如只在启动时读取的配置）
+        defaults: 配置文件应用之前的值（见 config_values）
+        previous: 上一份配置文件中的键；其中不在 values 里的键恢复为 defaults 中的值
+
+    Returns:
+        (实际发生变化的键, 因 skip 被忽略且值有变化的键)
+    """
+    values = dict(values)
+    if defaults is not None:
+        for key in previous:
+            if key not in values and key in defaults:
+                values[key] = defaults[key]
+    changed: List[str] = []
+    skipped: List[str] = []
+    for key, value in values.items():
+        if not key.isupper() or not hasattr(config, key):
+            print(f"Unknown config key ignored: {key}")
+            continue
+        current = getattr(config, key)
+        value = _coerce(current, value)
+        if value == current:
+            continue
+        if key in skip:
+            skipped.append(key)
+            continue
+        setattr(config, key, value)
+        changed.append(key)
+    return changed, skipped
+
+
+# ============================================================================
+# 文件监视
+# ============================================================================
+
+class ConfigWatcher:
+    """在守护线程中轮询配置文件，内容变化且解析成功时保存最新的配置值"""
+
+    def __init__(self, path: str, interval: float = 1.0):
+        """
+        初始化文件监视
+
+        Args:
+            path: 配置文件路径
+            interval: 轮询间隔（秒）
+        """
+        self.path = path
+        self.interval = interval
+        self._signature = self._stat()
+        self._latest: Optional[Dict[str, object]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        """文件的 (修改时间, 大小)，文件不存在时返回 None"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _run(self) -> None:
+        """轮询循环：编辑器保存时可能先截断再写入，解析失败时保留上一份配置，等待下一次变化"""
+        while not self._stop.wait(self.interval):
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                continue
+            self._signature = signature
+            try:
+                values = load_config_file(self.path)
+            except (OSError, ValueError) as error:
+                print(f"Failed to reload config '{self.path}': {error}")
+                continue
+            with self._lock:
+                self._latest = values
+
+    def start(self) -> None:
+        """启动后台线程"""
+        self._thread.start()
+        print(f"Watching config file: {self.path}")
+
+    def poll(self) -> Optional[Dict[str, object]]:
+        """取出自上次调用以来最新的配置值（没有变化时返回 None）"""
+        with self._lock:
+            values, self._latest = self._latest, None
+        return values
+
+    def stop(self) -> None:
+        """停止轮询"""
+        self._stop.set()
@@ -0,0 +1,196 @@
+"""
+渲染一致性校验（golden frame）
+用固定种子生成场景，在固定角度和时间下分别通过参考渲染路径和候选路径渲染，
+以逐像素容差、PSNR 和 SSIM 对比，结果不一致时保存差异图
+
+使用方法：
+  python golden_frames.py --candidate reference          # 自检：参考路径与自身对比
+  python golden_frames.py --candidate 模块名:函数名       # 对比任意候选渲染函数
+"""
+import argparse
+import importlib
+import os
+import random
+import sys
+from typing import Callable, List, Tuple
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # 不需要窗口
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    print("golden_frames.py requires NumPy: pip install numpy")
+    sys.exit(2)
+
+import main
+from main import Config, Particle
+
+Renderer = Callable[[pygame.Surface, List[Particle], float], None]
+
+
+# ============================================================================
+# 场景渲染
+# ============================================================================
+
+def build_scene(seed: int) -> Tuple[List[Particle], List[Particle]]:
+    """用固定种子生成场景，返回 (旋转对象, 雪花)"""
+    random.seed(seed)
+    rotating_objects = (main.generate_ragged_tree(Config.TREE_PARTICLES) +
+                        main.generate_pillow_heart(Config.HEART_PARTICLES) +
+                        main.generate_bright_white_ground(Config.GROUND_PARTICLES))
+    snow_particles = main.generate_snow(Config.SNOW_PARTICLES)
+    return rotating_objects, snow_particles
+
+
+def render_frame(renderer: Renderer, rotating_objects: List[Particle], snow_particles: List[Particle],
+                 angle: float, time_seconds: float, stipple_seed: int) -> np.ndarray:
+    """按主循环的顺序准备粒子并渲染一帧，返回 (高, 宽, 3) 的像素数组"""
+    for p in rotating_objects:
+        p.rotate_y(angle)
+    all_particles = rotating_objects + snow_particles
+    all_particles.sort(key=lambda p: p.z, reverse=True)
+
+    surface = pygame.Surface((Config.VIRTUAL_WIDTH, Config.VIRTUAL_HEIGHT))
+    surface.fill(Config.BG_COLOR)
+    main.set_stipple_seed(stipple_seed)
+    renderer(surface, all_particles, time_seconds)
+    main.set_stipple_seed(None)
+    return pygame.surfarray.array3d(surface).swapaxes(0, 1)
+
+
+def resolve_renderer(name: str) -> Renderer:
+    """根据名称查找渲染函数：main.RENDERERS 中的名称或 "模块:函数" """
+    if name in main.RENDERERS:
+        return main.RENDERERS[name]
+    if ":" not in name:
+        raise SystemExit(f"Unknown renderer '{name}', available: {', '.join(main.RENDERERS)}")
+    module_name, func_name = name.split(":", 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+# ============================================================================
+# 图像对比
+# ============================================================================
+
+def psnr(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """峰值信噪比（dB），完全一致时返回 inf"""
+    mse = np.mean((reference.astype(np.float64) - candidate.astype(np.float64)) ** 2)
+    if mse == 0:
+        return float("inf")
+    return 10.0 * np.log10(255.0 ** 2 / mse)
+
+
+def _box_filter(image: np.ndarray, size: int) -> np.ndarray:
+    """用积分图计算 size×size 窗口均值（只保留完整窗口）"""
+    integral = np.pad(image, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    window_sum = (integral[size:, size:] - integral[:-size, size:] -
+                  integral[size:, :-size] + integral[:-size, :-size])
+    return window_sum / (size * size)
+
+
+def ssim(reference: np.ndarray, candidate: np.ndarray, window: int = 7) -> float:
+    """基于亮度通道、均匀窗口的平均结构相似度"""
+    weights = np.array([0.299, 0.587, 0.114])
+    x = reference.astype(np.float64) @ weights
+    y = candidate.astype(np.float64) @ weights
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+
+    mu_x = _box_filter(x, window)
+    mu_y = _box_filter(y, window)
+    var_x = _box_filter(x * x, window) - mu_x ** 2
+    var_y = _box_filter(y * y, window) - mu_y ** 2
+    cov_xy = _box_filter(x * y, window) - mu_x * mu_y
+
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov_xy + c2) /
+                ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2)))
+    return float(ssim_map.mean())
+
+
+def compare_frames(reference: np.ndarray, candidate: np.ndarray, tolerance: int) -> dict:
+    """计算两帧的差异指标"""
+    diff = np.abs(reference.astype(np.int16) - candidate.astype(np.int16)).max(axis=2)
+    return {
+        "mismatch": float(np.count_nonzero(diff > tolerance)) / diff.size,
+        "max_diff": int(diff.max()),
+        "psnr": psnr(reference, candidate),
+        "ssim": ssim(reference, candidate),
+        "diff": diff,
+    }
+
+
+def save_diff_images(output_dir: str, label: str, reference: np.ndarray,
+                     candidate: np.ndarray, diff: np.ndarray) -> None:
+    """保存参考帧、候选帧和放大后的差异图"""
+    os.makedirs(output_dir, exist_ok=True)
+    amplified = np.clip(diff.astype(np.int32) * 8, 0, 255).astype(np.uint8)
+    images = {
+        "reference": reference,
+        "candidate": candidate,
+        "diff": np.repeat(amplified[:, :, None], 3, axis=2),
+    }
+    for kind, pixels in images.items():
+        surface = pygame.surfarray.make_surface(np.ascontiguousarray(pixels.swapaxes(0, 1)))
+        pygame.image.save(surface, os.path.join(output_dir, f"{label}_{kind}.png"))
+
+
+# ============================================================================
+# 命令行入口
+# ============================================================================
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Golden-frame comparison of particle renderers")
+    parser.add_argument("--candidate", default="reference",
+                        help="候选渲染路径：main.RENDERERS 中的名称或 模块:函数")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--angles", type=float, nargs="+", default=[0.0, 1.3, 3.7])
+    parser.add_argument("--times", type=float, nargs="+", default=[0.0, 2.5])
+    parser.add_argument("--tolerance", type=int, default=8, help="单像素通道差异容差")
+    parser.add_argument("--max-mismatch", type=float, default=0.001,
+                        help="允许超出容差的像素比例")
+    parser.add_argument("--min-psnr", type=float, default=40.0)
+    parser.add_argument("--min-ssim", type=float, default=0.98)
+    parser.add_argument("--output", default="golden_diffs", help="差异图输出目录")
+    return parser.parse_args()
+
+
+def main_cli() -> int:
+    """运行全部场景对比，返回进程退出码"""
+    args = parse_args()
+    pygame.init()
+    reference = main.RENDERERS["reference"]
+    candidate = resolve_renderer(args.candidate)
+
+    failures = 0
+    for seed in args.seeds:
+        rotating_objects, snow_particles = build_scene(seed)
+        for angle in args.angles:
+            for time_seconds in args.times:
+                label = f"seed{seed}_angle{angle:g}_t{time_seconds:g}"
+                expected = render_frame(reference, rotating_objects, snow_particles,
+                                        angle, time_seconds, seed)
+                actual = render_frame(candidate, rotating_objects, snow_particles,
+                                      angle, time_seconds, seed)
+                result = compare_frames(expected, actual, args.tolerance)
+                passed = (result["mismatch"] <= args.max_mismatch and
+                          result["psnr"] >= args.min_psnr and
+                          result["ssim"] >= args.min_ssim)
+                print(f"{'PASS' if passed else 'FAIL'} {label}: mismatch={result['mismatch']:.5f} "
+                      f"max_diff={result['max_diff']} psnr={result['psnr']:.2f} "
+                      f"ssim={result['ssim']:.5f}")
+                if not passed:
+                    failures += 1
+                    save_diff_images(args.output, label, expected, actual, result["diff"])
+
+    pygame.quit()
+    if failures:
+        print(f"{failures} frame(s) diverged, diff images saved to {args.output}/")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,981 @@
+"""
+大场景流式渲染
+粒子以结构化数组（可以是内存映射）按固定大小的块流经旋转、投影、剔除和光栅化，
+各阶段复用预先分配的 float32 工作缓冲区，用深度缓冲代替全量排序，
+瞬时内存只取决于块大小和帧缓冲，与粒子总数无关
+"""
+import math
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context, shared_memory
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pygame
+
+from camera import IDENTITY, Camera, View, compose, rotation_y, scale_of, transform_point
+from profiling import DRAW_CIRCLE, DRAW_GLOW, DRAW_PIXEL, DRAW_SKIPPED
+
+# 点画随机数来源：给定数量，返回 [0, 1) 随机数数组
+StippleSource = Callable[[int], np.ndarray]
+
+# 块工作缓冲区：每个粒子一项的数组（变换阶段写入，光栅化阶段读取）
+SCRATCH_FIELDS = (
+    ("x", np.float32), ("y", np.float32), ("z", np.float32), ("scale", np.float32),
+    ("fog", np.float32), ("size", np.float32), ("tmp", np.float32),
+    ("sx", np.int32), ("sy", np.int32), ("packed", np.uint32), ("channel", np.uint32),
+    ("visible", bool), ("small", bool), ("mask", bool),
+)
+# 每个粒子占用的工作缓冲区字节数
+SCRATCH_BYTES_PER_PARTICLE = sum(np.dtype(dtype).itemsize for _, dtype in SCRATCH_FIELDS)
+# 并行更新雪花时每片的最少粒子数（更少时线程调度开销大于收益）
+MIN_PARALLEL_SNOW = 65536
+# 每个片元占用的字节数（索引、深度、颜色、坐标缓冲 + 排序和筛选时的临时数组）
+FRAGMENT_BYTES = 48
+# 每个待合成辉光占用的字节数（坐标、半径、深度、颜色）
+GLOW_BYTES = 20
+# 实例变换：位置 (x, z)、缩放、绕自身Y轴的旋转相位
+INSTANCE_DTYPE = np.dtype([("x", np.float32), ("z", np.float32),
+                           ("scale", np.float32), ("phase", np.float32)])
+
+
+class InstanceSet:
+    """共享同一份粒子几何的一组实例（例如森林：同一棵树在不同位置、缩放和旋转相位下绘制）"""
+
+    def __init__(self, layers: Sequence[np.ndarray], instances: np.ndarray, pivot_y: float = 0.0,
+                 detail: float = 1.0, max_skip: int = 16):
+        """
+        初始化实例集合
+
+        Args:
+            layers: 共享的粒子层（只读，可以是内存映射）
+            instances: INSTANCE_DTYPE 数组
+            pivot_y: 缩放时保持不动的高度（地面），实例缩放后仍立在地面上
+            detail: 细节系数，越大远处实例保留的粒子越多
+            max_skip: 远处实例抽稀的最大步长
+        """
+        self.layers = list(layers)
+        self.instances = instances
+        self.pivot_y = pivot_y
+        self.detail = detail
+        self.max_skip = max_skip
+        # 几何在 XZ 平面上的包围半径，用于整实例剔除
+        self.radius = max((float(np.sqrt(np.max(records["x"] ** 2 + records["z"] ** 2)))
+                           for records in self.layers if len(records)), default=0.0)
+        # 几何的最大 |y|，相机俯仰时用于估计实例的深度范围
+        self.height = max((float(np.max(np.abs(records["y"])))
+                           for records in self.layers if len(records)), default=0.0)
+        self.particle_count = sum(len(records) for records in self.layers)
+
+
+# ============================================================================
+# 圆形模板
+# ============================================================================
+
+_circle_stencils: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+_glow_stencils: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+
+def _stencil_from_surface(surface: pygame.Surface, origin: int) -> Tuple[np.ndarray, np.ndarray]:
+    """提取表面上被绘制的像素相对 origin 的偏移"""
+    xs, ys = np.nonzero(pygame.surfarray.pixels_alpha(surface))
+    return (xs - origin).astype(np.int32), (ys - origin).astype(np.int32)
+
+
+def circle_stencil(radius: int) -> Tuple[np.ndarray, np.ndarray]:
+    """pygame.draw.circle 在给定半径下覆盖的像素偏移 (dx, dy)，与参考路径逐像素一致"""
+    stencil = _circle_stencils.get(radius)
+    if stencil is None:
+        size = radius * 2 + 3
+        surface = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(surface, (255, 255, 255, 255), (radius + 1, radius + 1), radius)
+        stencil = _circle_stencils[radius] = _stencil_from_surface(surface, radius + 1)
+    return stencil
+
+
+def glow_stencil(radius: int) -> Tuple[np.ndarray, np.ndarray]:
+    """参考路径辉光覆盖的像素偏移（辉光画在 2r×2r 的表面上，右下边缘被裁掉）"""
+    stencil = _glow_stencils.get(radius)
+    if stencil is None:
+        surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+        pygame.draw.circle(surface, (255, 255, 255, 255), (radius, radius), radius)
+        stencil = _glow_stencils[radius] = _stencil_from_surface(surface, radius)
+    return stencil
+
+
+# ============================================================================
+# 流式渲染器
+# ============================================================================
+
+def check_memory_budget(pixels: int, memory_budget_mb: float, framebuffer: bool = True) -> None:
+    """检查内存预算是否足够容纳帧缓冲和最小的块、片元缓冲，不足时抛出 ValueError"""
+    minimum = pixels * (8 if framebuffer else 4) + 1024 * SCRATCH_BYTES_PER_PARTICLE + 4096 * FRAGMENT_BYTES
+    if memory_budget_mb * 1024 * 1024 < minimum:
+        raise ValueError(f"Large scene memory budget {memory_budget_mb:g} MB is below the "
+                         f"minimum of {minimum / (1024 * 1024):.1f} MB for this resolution")
+
+
+class ChunkScratch:
+    """一个块的工作缓冲区；并行变换时每个线程使用自己的一组，互不共享"""
+
+    def __init__(self, capacity: int):
+        self.buffers = {name: np.empty(capacity, dtype=dtype) for name, dtype in SCRATCH_FIELDS}
+        self.bind(0)
+
+    def bind(self, count: int) -> None:
+        """把各字段绑定为前 count 项的视图"""
+        self.count = count
+        for name, buffer in self.buffers.items():
+            setattr(self, name, buffer[:count])
+
+    @property
+    def nbytes(self) -> int:
+        """缓冲区总字节数"""
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+
+class StreamRenderer:
+    """
+    按块流式渲染粒子数组
+
+    每个块依次完成旋转、透视投影、雾化、闪烁和剔除，然后展开为片元写入深度缓冲，
+    近处片元覆盖远处片元，结果与参考路径按深度排序后逐个绘制一致。
+    辉光是叠加混合，需要知道最终深度，因此先记录下来，在 finish 中统一合成。
+
+    threads 大于 1 时，旋转、投影、雾化、闪烁和剔除这些数组阶段在常驻线程池中
+    按块并行执行（NumPy 运算期间释放 GIL），主线程按顺序光栅化已完成的块。
+    """
+
+    def __init__(self, config, chunk_size: int = 65536, memory_budget_mb: float = 256.0,
+                 seed: Optional[int] = None, framebuffer: bool = True, threads: int = 1):
+        """
+        初始化渲染器并按内存预算分配全部工作缓冲区
+
+        Args:
+            config: 提供渲染参数的配置类（每帧读取，运行时修改立即生效）
+            chunk_size: 每块最多处理的粒子数量
+            memory_budget_mb: 瞬时工作内存上限（帧缓冲、深度缓冲、块缓冲和片元缓冲之和）
+            seed: 点画随机数种子
+            framebuffer: 是否分配自己的颜色缓冲；为 False 时由 begin 传入目标缓冲（如共享内存）
+            threads: 执行数组阶段的线程数（每个线程一组块缓冲，1 = 在调用线程中执行）
+
+        Raises:
+            ValueError: 内存预算连帧缓冲都容纳不下
+        """
+        self.config = config
+        self.width = config.VIRTUAL_WIDTH
+        self.height = config.VIRTUAL_HEIGHT
+        pixels = self.width * self.height
+
+        budget = int(memory_budget_mb * 1024 * 1024)
+        framebuffer_bytes = pixels * (8 if framebuffer else 4)  # 颜色 + 深度
+        check_memory_budget(pixels, memory_budget_mb, framebuffer)
+
+        # 多线程时每个线程一组块缓冲，另加一组供主线程光栅化，使变换和光栅化可以重叠
+        self.threads = max(1, threads)
+        scratch_sets = self.threads + 1 if self.threads > 1 else 1
+
+        # 剩余预算：块缓冲最多占 1/4，辉光记录占 1/16，其余给片元缓冲
+        available = budget - framebuffer_bytes
+        self.chunk_size = max(1024, min(chunk_size,
+                                        available // 4 // (SCRATCH_BYTES_PER_PARTICLE * scratch_sets)))
+        self.glow_capacity = max(1024, available // 16 // GLOW_BYTES)
+        self.fragment_capacity = max(4096, (available - self.chunk_size * SCRATCH_BYTES_PER_PARTICLE * scratch_sets -
+                                            self.glow_capacity * GLOW_BYTES) // FRAGMENT_BYTES)
+
+        # 帧缓冲（0x00RRGGBB，行优先，与 1920x1080 表面内存布局一致）和深度缓冲
+        self.color = np.empty(pixels, dtype=np.uint32) if framebuffer else None
+        self.depth = np.empty(pixels, dtype=np.float32)
+
+        # 当前绘制的行范围 [top, bottom) 及其颜色、深度视图（默认整帧）
+        self.top, self.bottom = 0, self.height
+        self._frame = self.color
+        self._zbuf = self.depth
+        self.row_counts: Optional[np.ndarray] = None
+
+        # 块工作缓冲区和常驻线程池
+        self._scratch = [ChunkScratch(self.chunk_size) for _ in range(scratch_sets)]
+        self.pool = (ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="stream")
+                     if self.threads > 1 else None)
+
+        # 片元缓冲区
+        self._frag_x = np.empty(self.fragment_capacity, dtype=np.int32)
+        self._frag_y = np.empty(self.fragment_capacity, dtype=np.int32)
+
+        # 待合成的辉光（中心坐标、半径、深度、颜色）
+        self._glow_x = np.empty(self.glow_capacity, dtype=np.int32)
+        self._glow_y = np.empty(self.glow_capacity, dtype=np.int32)
+        self._glow_r = np.empty(self.glow_capacity, dtype=np.int32)
+        self._glow_z = np.empty(self.glow_capacity, dtype=np.float32)
+        self._glow_color = np.empty(self.glow_capacity, dtype=np.uint32)
+        self._glow_count = 0
+
+        self._rng = np.random.default_rng(seed)
+        # 雪花按线程切片更新，每片使用自己的随机数生成器（Generator 不是线程安全的）
+        self._snow_rngs = [np.random.default_rng(child)
+                           for child in np.random.SeedSequence(seed).spawn(self.threads)]
+        self.draw_counts = [0, 0, 0, 0]  # 按 DRAW_* 索引
+        # 音乐联动：非雪花粒子的闪烁振幅倍数和辉光亮度倍数（在两帧之间设置）
+        self.flicker_gain = 1.0
+        self.glow_gain = 1.0
+
+    @property
+    def working_set_bytes(self) -> int:
+        """已分配的工作缓冲区总字节数（不含粒子数据本身）"""
+        # 只统计自己分配的数组，视图和同一数组的多个引用不重复计算
+        arrays = {id(value): value for value in vars(self).values()
+                  if isinstance(value, np.ndarray) and value.base is None}
+        scratch = sum(scratch.nbytes for scratch in self._scratch)
+        return (sum(array.nbytes for array in arrays.values()) + scratch +
+                self.fragment_capacity * (FRAGMENT_BYTES - 8))
+
+    def _stipple(self, count: int) -> np.ndarray:
+        """默认点画随机数"""
+        return self._rng.random(count)
+
+    # ------------------------------------------------------------------------
+    # 帧流程
+    # ------------------------------------------------------------------------
+
+    def begin(self, top: int = 0, bottom: Optional[int] = None, target: Optional[np.ndarray] = None,
+              track_rows: bool = False) -> None:
+        """
+        开始新的一帧：清空帧缓冲、深度缓冲和辉光记录
+
+        Args:
+            top, bottom: 只绘制 [top, bottom) 行（分带渲染），默认整帧
+            target: 该行范围的颜色缓冲（(bottom - top) * 宽度），默认使用自己的帧缓冲
+            track_rows: 是否统计每行的粒子中心数量（用于调整分带边界）
+        """
+        bottom = self.height if bottom is None else bottom
+        pixels = (bottom - top) * self.width
+        self.top, self.bottom = top, bottom
+        self._frame = target if target is not None else self.color[:pixels]
+        self._zbuf = self.depth[:pixels]
+
+        bg = self.config.BG_COLOR
+        self._frame.fill((bg[0] << 16) | (bg[1] << 8) | bg[2])
+        self._zbuf.fill(np.inf)
+        self._glow_count = 0
+        self.draw_counts = [0, 0, 0, 0]
+        self.row_counts = np.zeros(bottom - top, dtype=np.int64) if track_rows else None
+
+    def render(self, surface: pygame.Surface, rotating_layers: Sequence[np.ndarray],
+               static_layers: Sequence[np.ndarray], camera: Camera, time_seconds: float,
+               instance_sets: Sequence[InstanceSet] = ()) -> None:
+        """
+        渲染一帧：rotating_layers 使用相机的完整视图（随场景旋转），static_layers（雪花、火花）
+        和 instance_sets 使用只有俯仰和缩放的静态视图；视图矩阵每帧只计算一次
+        """
+        distance = self.config.VIEW_DISTANCE
+        view = camera.view(distance)
+        static_view = camera.static_view(distance)
+        self.begin()
+        for records in rotating_layers:
+            self.draw_records(records, time_seconds, view)
+        for instance_set in instance_sets:
+            self.draw_instances(instance_set, time_seconds, camera.yaw, static_view)
+        for records in static_layers:
+            self.draw_records(records, time_seconds, static_view)
+        self.finish(surface)
+
+    def draw_records(self, records: np.ndarray, time_seconds: float, view: Optional[View] = None,
+                     stipple: Optional[StippleSource] = None) -> None:
+        """
+        按块绘制一个粒子层
+
+        Args:
+            records: PARTICLE_DTYPE 结构化数组（可以是只读内存映射）
+            time_seconds: 动画时间（秒）
+            view: 视图矩阵（camera.View）；None 表示直接使用 x/y/z
+            stipple: 点画随机数来源（按块内顺序消耗）；None 使用内部随机数
+        """
+        stipple = stipple or self._stipple
+        for chunk, scratch in self._transformed(records, time_seconds, view):
+            self._rasterize(chunk, scratch, stipple)
+
+    def draw_instances(self, instance_set: InstanceSet, time_seconds: float, angle: float,
+                       static_view: View = IDENTITY) -> int:
+        """
+        绘制实例集合：每个实例复用同一份几何，只在块变换时套用自己的旋转、缩放和平移
+
+        实例位置固定（不随场景绕中心公转），各自绕自身Y轴旋转 angle + 相位，
+        模型变换与 static_view 组合成一个矩阵后在块变换中一次完成。
+        整个位于相机后方或屏幕左右之外的实例直接跳过；其余实例按投影后的大小抽稀，
+        缩放为 k、深度为 d 的实例每隔 ((d / VIEW_DISTANCE) / (k × detail))² 个粒子取一个，
+        屏幕上的粒子密度与位于中心、缩放为 1 的实例大致相同。
+
+        Returns:
+            实际绘制的实例数量
+        """
+        config = self.config
+        pivot_y = instance_set.pivot_y
+        # 俯仰时几何的高度也会改变深度
+        tilt = abs(static_view[9])
+        drawn = 0
+        for tx, tz, factor, phase in instance_set.instances.tolist():
+            translation = (tx, pivot_y * (1.0 - factor), tz)
+            center_x, _, center_z = transform_point(static_view, translation)
+            depth = center_z + config.VIEW_DISTANCE
+            reach = (instance_set.radius + tilt * instance_set.height) * factor
+            if depth + reach <= 20:
+                continue
+            if depth - reach > 20:
+                near_scale = config.FOV / (depth - reach)
+                screen_x = center_x * near_scale + int(config.VIRTUAL_WIDTH * 0.6)
+                if abs(screen_x - self.width / 2) > self.width / 2 + reach * near_scale:
+                    continue
+
+            relative = depth / (config.VIEW_DISTANCE * max(factor, 1e-3) * instance_set.detail)
+            skip = int(min(instance_set.max_skip, max(1.0, relative * relative)))
+            view = compose(static_view, rotation_y(angle + phase, factor, translation))
+            # 错开各实例的闪烁相位
+            instance_time = time_seconds + phase * 10.0
+            for records in instance_set.layers:
+                for chunk, scratch in self._transformed(records[::skip], instance_time, view):
+                    self._rasterize(chunk, scratch, self._stipple)
+            drawn += 1
+        return drawn
+
+    def transform_records(self, records: np.ndarray, time_seconds: float,
+                          view: Optional[View] = None) -> None:
+        """只执行数组阶段、不光栅化（用于测量数组阶段的线程扩展性）"""
+        for _ in self._transformed(records, time_seconds, view):
+            pass
+
+    def update_snow(self, snow: np.ndarray) -> None:
+        """更新雪花数组；粒子足够多且有线程池时按线程切片并行更新"""
+        if self.pool is None or len(snow) < MIN_PARALLEL_SNOW * 2:
+            update_snow_records(snow, self._snow_rngs[0])
+            return
+        bounds = np.linspace(0, len(snow), len(self._snow_rngs) + 1).astype(int)
+        futures = [self.pool.submit(update_snow_records, snow[start:end], rng)
+                   for start, end, rng in zip(bounds[:-1], bounds[1:], self._snow_rngs)]
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        """关闭线程池"""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def finish(self, surface: Optional[pygame.Surface] = None) -> None:
+        """合成辉光，并在给定表面时把整帧写入表面"""
+        self._flush_glows()
+        if surface is not None:
+            present_frame(surface, self._frame.reshape(self.height, self.width))
+
+    # ------------------------------------------------------------------------
+    # 块处理
+    # ------------------------------------------------------------------------
+
+    def _transformed(self, records: np.ndarray, time_seconds: float,
+                     view: Optional[View]) -> Iterator[Tuple[np.ndarray, ChunkScratch]]:
+        """
+        依次产出 (块, 已完成数组阶段的块缓冲)
+
+        有线程池时，后续块的数组阶段在调用方光栅化当前块的同时并行执行；
+        块缓冲在调用方处理完、生成器继续执行时才回收，不会被提前覆盖。
+        """
+        starts = range(0, len(records), self.chunk_size)
+        if self.pool is None:
+            scratch = self._scratch[0]
+            for start in starts:
+                chunk = records[start:start + self.chunk_size]
+                yield chunk, self._transform(chunk, scratch, time_seconds, view)
+            return
+
+        free = list(self._scratch)
+        pending = deque()
+        for start in starts:
+            if not free:
+                chunk, future = pending.popleft()
+                scratch = future.result()
+                yield chunk, scratch
+                free.append(scratch)
+            chunk = records[start:start + self.chunk_size]
+            pending.append((chunk, self.pool.submit(self._transform, chunk, free.pop(),
+                                                    time_seconds, view)))
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+    def _transform(self, chunk: np.ndarray, s: ChunkScratch, time_seconds: float,
+                   view: Optional[View]) -> ChunkScratch:
+        """块的数组阶段：视图变换、透视投影、剔除、雾化着色和闪烁（只写入 s，可在工作线程中执行）"""
+        config = self.config
+        s.bind(len(chunk))
+        x, y, z, scale, fog, size, tmp = s.x, s.y, s.z, s.scale, s.fog, s.size, s.tmp
+
+        # 视图变换：逐行乘加，系数为 0 的项跳过（只有偏航时与单纯绕Y轴旋转的运算量相同）
+        factor = 1.0
+        columns = (chunk["x"], chunk["y"], chunk["z"])
+        if view is None or view == IDENTITY:
+            np.copyto(x, columns[0])
+            np.copyto(z, columns[2])
+            np.copyto(y, columns[1])
+        else:
+            factor = scale_of(view)
+            _affine_row(x, columns, view[0:4], tmp)
+            _affine_row(z, columns, view[8:12], tmp)
+            _affine_row(y, columns, view[4:8], tmp)
+
+        # 剔除相机后方的粒子，透视投影
+        np.add(z, config.VIEW_DISTANCE, out=tmp)
+        np.greater(tmp, 20, out=s.visible)
+        np.maximum(tmp, 20, out=tmp)  # 被剔除的粒子避免除零
+        np.divide(config.FOV, tmp, out=scale)
+
+        np.multiply(x, scale, out=tmp)
+        np.add(tmp, int(config.VIRTUAL_WIDTH * 0.6), out=tmp)
+        np.copyto(s.sx, tmp, casting="unsafe")  # 向零取整，与 int() 一致
+        np.multiply(y, scale, out=tmp)
+        np.add(tmp, config.VIRTUAL_HEIGHT // 2 + config.SCENE_OFFSET_Y, out=tmp)
+        np.copyto(s.sy, tmp, casting="unsafe")
+
+        # 雾化
+        np.subtract(z, config.FOG_START_Z, out=fog)
+        np.multiply(fog, 1.0 / (config.FOG_END_Z - config.FOG_START_Z), out=fog)
+        np.clip(fog, 0.0, 1.0, out=fog)
+        self._shade(chunk, s)
+
+        # 闪烁：雪花粒子振幅 0.05，其他粒子 0.4 × flicker_gain
+        np.multiply(chunk["flicker_speed"], time_seconds, out=size)
+        np.add(size, chunk["flicker_offset"], out=size)
+        np.sin(size, out=size)
+        amplitude = 0.4 * self.flicker_gain
+        np.multiply(chunk["is_snow"], 0.05 - amplitude, out=tmp)
+        np.add(tmp, amplitude, out=tmp)
+        np.multiply(size, tmp, out=size)
+        np.add(size, 0.8, out=size)
+        np.multiply(size, chunk["size_base"], out=size)
+        np.multiply(size, scale, out=size)
+        if factor != 1.0:
+            np.multiply(size, factor, out=size)
+        return s
+
+    def _rasterize(self, chunk: np.ndarray, s: ChunkScratch, stipple: StippleSource) -> None:
+        """按大小分类并光栅化一个已完成数组阶段的块（访问共享的帧缓冲，只在调用线程中执行）"""
+        n = s.count
+        size, visible, small, mask = s.size, s.visible, s.small, s.mask
+
+        # 单像素：大小不超过 1.2；不超过 0.5 的按 60% 概率点画
+        np.less_equal(size, 0.5, out=small)
+        np.logical_and(small, visible, out=small)
+        stipple_candidates = np.flatnonzero(small)
+        np.less_equal(size, 1.2, out=mask)
+        np.logical_and(mask, visible, out=mask)
+        if len(stipple_candidates):
+            mask[stipple_candidates] = stipple(len(stipple_candidates)) < 0.6
+        pixel_ids = np.flatnonzero(mask)
+
+        # 圆形：大小超过 1.2
+        np.greater(size, 1.2, out=mask)
+        np.logical_and(mask, visible, out=mask)
+        circle_ids = np.flatnonzero(mask)
+
+        counts = self.draw_counts
+        if self.top == 0 and self.bottom == self.height:
+            counts[DRAW_PIXEL] += len(pixel_ids)
+            counts[DRAW_SKIPPED] += n - len(pixel_ids) - len(circle_ids)
+        else:
+            # 分带渲染时只统计中心落在本带内的粒子，各带合计即为整帧数量
+            rows = s.sy
+            np.greater_equal(rows, self.top, out=small)
+            np.less(rows, self.bottom, out=mask)
+            np.logical_and(small, mask, out=small)
+            drawn = int(np.count_nonzero(small[pixel_ids]))
+            counts[DRAW_PIXEL] += drawn
+            counts[DRAW_SKIPPED] += (int(np.count_nonzero(small)) - drawn -
+                                     int(np.count_nonzero(small[circle_ids])))
+            if self.row_counts is not None:
+                self.row_counts += np.bincount(rows[small] - self.top, minlength=len(self.row_counts))
+            circle_ids = self._cull_to_band(circle_ids, s)
+
+        self._raster_pixels(pixel_ids, s)
+        self._raster_circles(chunk, circle_ids, s)
+
+    def _cull_to_band(self, ids: np.ndarray, s: ChunkScratch) -> np.ndarray:
+        """剔除辉光范围也碰不到当前行范围的圆形粒子"""
+        if not len(ids):
+            return ids
+        reach = s.size[ids] * 1.4 + 1
+        rows = s.sy[ids]
+        return ids[(rows + reach >= self.top) & (rows - reach < self.bottom)]
+
+    def _shade(self, chunk: np.ndarray, s: ChunkScratch) -> None:
+        """按雾化系数向背景色插值，结果打包为 0x00RRGGBB"""
+        packed, channel, tmp, fog = s.packed, s.channel, s.tmp, s.fog
+        packed.fill(0)
+        for name, bg, shift in zip(("r", "g", "b"), self.config.BG_COLOR, (16, 8, 0)):
+            # c * (1 - f) + bg * f
+            np.subtract(bg, chunk[name], out=tmp, dtype=np.float32)
+            np.multiply(tmp, fog, out=tmp)
+            np.add(tmp, chunk[name], out=tmp)
+            np.copyto(channel, tmp, casting="unsafe")
+            np.left_shift(channel, shift, out=channel)
+            np.bitwise_or(packed, channel, out=packed)
+
+    def _raster_pixels(self, ids: np.ndarray, s: ChunkScratch) -> None:
+        """写入单像素片元"""
+        if not len(ids):
+            return
+        sx, sy = s.sx[ids], s.sy[ids]
+        inside = (sx >= 0) & (sx < self.width) & (sy >= self.top) & (sy < self.bottom)
+        ids = ids[inside]
+        self._resolve((sy[inside] - self.top) * self.width + sx[inside],
+                      s.z[ids], s.packed[ids])
+
+    def _raster_circles(self, chunk: np.ndarray, ids: np.ndarray, s: ChunkScratch) -> None:
+        """按半径分组展开圆形片元，并记录需要辉光的粒子"""
+        if not len(ids):
+            return
+        radii = s.size[ids].astype(np.int32)
+
+        # 辉光条件与参考路径一致：半径大于 3、不下落、雾化小于一半
+        glowing = (radii > 3) & (chunk["fall_speed"][ids] == 0) & (s.fog[ids] < 0.5)
+        glow_ids = ids[glowing]
+        if self.top == 0 and self.bottom == self.height:
+            self.draw_counts[DRAW_GLOW] += len(glow_ids)
+            self.draw_counts[DRAW_CIRCLE] += len(ids) - len(glow_ids)
+        else:
+            rows = s.sy[ids]
+            centered = (rows >= self.top) & (rows < self.bottom)
+            self.draw_counts[DRAW_GLOW] += int(np.count_nonzero(centered & glowing))
+            self.draw_counts[DRAW_CIRCLE] += int(np.count_nonzero(centered & ~glowing))
+        if len(glow_ids):
+            self._queue_glows(glow_ids, (radii[glowing] * 1.4).astype(np.int32), s)
+
+        for radius in np.unique(radii):
+            members = ids[radii == radius]
+            dx, dy = circle_stencil(int(radius))
+            self._raster_stencil(s.sx[members], s.sy[members], dx, dy,
+                                 s.z[members], s.packed[members])
+
+    def _expand(self, cx: np.ndarray, cy: np.ndarray, dx: np.ndarray, dy: np.ndarray):
+        """在片元缓冲中展开一批中心点的模板，返回 (屏幕内的像素索引, 片元对应的中心序号)"""
+        m, k = len(cx), len(dx)
+        fx = self._frag_x[:m * k].reshape(m, k)
+        fy = self._frag_y[:m * k].reshape(m, k)
+        np.add(cx[:, None], dx[None, :], out=fx)
+        np.add(cy[:, None], dy[None, :], out=fy)
+        fx, fy = fx.ravel(), fy.ravel()
+        inside = np.flatnonzero((fx >= 0) & (fx < self.width) & (fy >= self.top) & (fy < self.bottom))
+        return (fy[inside] - self.top) * self.width + fx[inside], inside // k
+
+    def _raster_stencil(self, cx: np.ndarray, cy: np.ndarray, dx: np.ndarray, dy: np.ndarray,
+                        depth: np.ndarray, packed: np.ndarray) -> None:
+        """分批展开模板并写入深度缓冲，每批片元数不超过片元缓冲容量"""
+        batch = max(1, self.fragment_capacity // len(dx))
+        for start in range(0, len(cx), batch):
+            end = start + batch
+            index, owner = self._expand(cx[start:end], cy[start:end], dx, dy)
+            self._resolve(index, depth[start:end][owner], packed[start:end][owner])
+
+    def _resolve(self, index: np.ndarray, depth: np.ndarray, packed: np.ndarray) -> None:
+        """深度测试：只保留比缓冲中更近的片元，同一像素的多个片元由最近者胜出"""
+        closer = depth < self._zbuf[index]
+        index, depth, packed = index[closer], depth[closer], packed[closer]
+        if not len(index):
+            return
+        # 由远到近排列（深度相同时保持绘制顺序），重复索引赋值时最后一个生效
+        order = np.argsort(-depth, kind="stable")
+        index = index[order]
+        self._zbuf[index] = depth[order]
+        self._frame[index] = packed[order]
+
+    # ------------------------------------------------------------------------
+    # 辉光
+    # ------------------------------------------------------------------------
+
+    def _queue_glows(self, ids: np.ndarray, radii: np.ndarray, s: ChunkScratch) -> None:
+        """记录辉光，记录满时按当前深度提前合成"""
+        start = 0
+        while start < len(ids):
+            if self._glow_count == self.glow_capacity:
+                self._flush_glows()
+            take = min(len(ids) - start, self.glow_capacity - self._glow_count)
+            part = ids[start:start + take]
+            slot = slice(self._glow_count, self._glow_count + take)
+            self._glow_x[slot] = s.sx[part]
+            self._glow_y[slot] = s.sy[part]
+            self._glow_r[slot] = radii[start:start + take]
+            self._glow_z[slot] = s.z[part]
+            self._glow_color[slot] = s.packed[part]
+            self._glow_count += take
+            start += take
+
+    def _flush_glows(self) -> None:
+        """
+        叠加合成辉光
+
+        参考路径中辉光叠加在之前绘制的（更远的）像素上，之后更近的粒子会覆盖它，
+        因此只有最终深度不比辉光粒子更近的像素才叠加该辉光。
+        """
+        count = self._glow_count
+        self._glow_count = 0
+        if not count:
+            return
+        if self.glow_gain != 1.0:
+            self._glow_color[:count] = scale_packed(self._glow_color[:count], self.glow_gain)
+        radii = self._glow_r[:count]
+        for radius in np.unique(radii):
+            members = np.flatnonzero(radii == radius)
+            dx, dy = glow_stencil(int(radius))
+            batch = max(1, self.fragment_capacity // len(dx))
+            for start in range(0, len(members), batch):
+                part = members[start:start + batch]
+                index, owner = self._expand(self._glow_x[part], self._glow_y[part], dx, dy)
+                behind = self._glow_z[part][owner] <= self._zbuf[index]
+                self._add_colors(index[behind], self._glow_color[part][owner[behind]])
+
+    def _add_colors(self, index: np.ndarray, packed: np.ndarray) -> None:
+        """将颜色饱和叠加到帧缓冲（同一像素的多个片元先求和）"""
+        if not len(index):
+            return
+        pixels, inverse = np.unique(index, return_inverse=True)
+        current = self._frame[pixels]
+        result = np.zeros(len(pixels), dtype=np.uint32)
+        for shift in (16, 8, 0):
+            added = np.bincount(inverse, weights=(packed >> shift) & 0xFF, minlength=len(pixels))
+            channel = np.minimum(((current >> shift) & 0xFF) + added, 255).astype(np.uint32)
+            result |= channel << shift
+        self._frame[pixels] = result
+
+
+def _affine_row(out: np.ndarray, columns: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                row: Sequence[float], tmp: np.ndarray) -> None:
+    """out = row[0]·x + row[1]·y + row[2]·z + row[3]，跳过为 0 的系数，系数为 1 时直接复制"""
+    started = False
+    for column, coefficient in zip(columns, row[:3]):
+        if coefficient == 0.0:
+            continue
+        if started:
+            np.multiply(column, coefficient, out=tmp)
+            np.add(out, tmp, out=out)
+        elif coefficient == 1.0:
+            np.copyto(out, column)
+        else:
+            np.multiply(column, coefficient, out=out)
+        started = True
+    if not started:
+        out.fill(row[3])
+    elif row[3]:
+        np.add(out, row[3], out=out)
+
+
+def scale_packed(packed: np.ndarray, gain: float) -> np.ndarray:
+    """将 0x00RRGGBB 颜色的各通道乘以 gain（截断取整，饱和到 255）"""
+    result = np.zeros(len(packed), dtype=np.uint32)
+    for shift in (16, 8, 0):
+        channel = np.minimum(((packed >> shift) & 0xFF) * gain, 255).astype(np.uint32)
+        result |= channel << shift
+    return result
+
+
+def present_frame(surface: pygame.Surface, frame: np.ndarray) -> None:
+    """把 (高, 宽) 的 0x00RRGGBB 帧缓冲写入表面"""
+    if surface.get_bitsize() == 32 and surface.get_shifts()[:3] == (16, 8, 0):
+        view = pygame.surfarray.pixels2d(surface)
+        view.T[...] = frame
+        del view  # 解锁表面
+    else:
+        rgb = np.empty((frame.shape[1], frame.shape[0], 3), dtype=np.uint8)
+        for channel, shift in enumerate((16, 8, 0)):
+            rgb[:, :, channel] = (frame.T >> shift) & 0xFF
+        pygame.surfarray.blit_array(surface, rgb)
+
+
+def measure_thread_scaling(config, rotating_layers: Sequence[np.ndarray], snow: np.ndarray,
+                           thread_counts: Sequence[int], frames: int = 10, chunk_size: int = 65536,
+                           memory_budget_mb: float = 256.0) -> List[Dict[str, float]]:
+    """
+    测量不同线程数下的整帧耗时和数组阶段耗时
+
+    每种线程数先渲染一帧预热（线程启动、圆形模板），再计时 frames 帧。
+    加速比和效率相对于列表中的第一个线程数计算：效率 = 加速比 × 基准线程数 / 线程数。
+
+    Returns:
+        每种线程数一项：threads、frame_ms、stage_ms、frame_speedup、stage_speedup、
+        frame_efficiency、stage_efficiency
+    """
+    surface = pygame.Surface((config.VIRTUAL_WIDTH, config.VIRTUAL_HEIGHT))
+    results = []
+    for threads in thread_counts:
+        renderer = StreamRenderer(config, chunk_size, memory_budget_mb, seed=0, threads=threads)
+        try:
+            renderer.render(surface, rotating_layers, [snow], Camera(), 0.0)
+            start = time.perf_counter()
+            for frame in range(frames):
+                renderer.render(surface, rotating_layers, [snow], Camera(yaw=frame * 0.01), frame / 60.0)
+            frame_ms = (time.perf_counter() - start) * 1000.0 / frames
+
+            start = time.perf_counter()
+            for frame in range(frames):
+                view = Camera(yaw=frame * 0.01).view(config.VIEW_DISTANCE)
+                for records in rotating_layers:
+                    renderer.transform_records(records, frame / 60.0, view)
+                renderer.transform_records(snow, frame / 60.0)
+            stage_ms = (time.perf_counter() - start) * 1000.0 / frames
+        finally:
+            renderer.close()
+        results.append({"threads": threads, "frame_ms": frame_ms, "stage_ms": stage_ms})
+
+    base = results[0]
+    for result in results:
+        for key in ("frame", "stage"):
+            speedup = base[f"{key}_ms"] / result[f"{key}_ms"]
+            result[f"{key}_speedup"] = speedup
+            result[f"{key}_efficiency"] = speedup * base["threads"] / result["threads"]
+    return results
+
+
+# ============================================================================
+# 多进程分带光栅化
+# ============================================================================
+
+# 每帧随任务发送给工作进程的渲染参数（运行时修改立即生效）
+RENDER_CONFIG_KEYS = ("VIRTUAL_WIDTH", "VIRTUAL_HEIGHT", "FOV", "VIEW_DISTANCE", "SCENE_OFFSET_Y",
+                      "FOG_START_Z", "FOG_END_Z", "BG_COLOR")
+
+# 工作进程内的状态：共享内存句柄、粒子层视图和渲染器
+_band_worker: Dict[str, object] = {}
+
+
+def _attach(name: str, shape: int, dtype) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """连接共享内存并返回 (句柄, 数组视图)"""
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray((shape,), dtype=dtype, buffer=shm.buf)
+
+
+def _band_worker_init(frame_name: str, layer_specs: List[tuple], snow_name: str, snow_capacity: int,
+                      dtype, config_values: Dict[str, object], chunk_size: int,
+                      memory_budget_mb: float) -> None:
+    """工作进程初始化：连接帧缓冲和粒子层共享内存，分配本进程的渲染器"""
+    config = SimpleNamespace(**config_values)
+    handles = []
+    shm, frame = _attach(frame_name, config.VIRTUAL_WIDTH * config.VIRTUAL_HEIGHT, np.uint32)
+    handles.append(shm)
+    layers = []
+    for name, count, radius, size_max in layer_specs:
+        shm, records = _attach(name, count, dtype)
+        handles.append(shm)
+        layers.append((records, radius, size_max))
+    shm, snow = _attach(snow_name, snow_capacity, dtype)
+    handles.append(shm)
+    _band_worker.update(
+        config=config, handles=handles, frame=frame, layers=layers, snow=snow,
+        renderer=StreamRenderer(config, chunk_size, memory_budget_mb, framebuffer=False),
+    )
+
+
+def layer_window(records: np.ndarray, radius: float, size_max: float, top: int, bottom: int,
+                 config, flicker_gain: float = 1.0, camera: Camera = Camera()) -> Tuple[int, int]:
+    """
+    按 y 排序的粒子层中可能落到 [top, bottom) 行的粒子范围
+
+    y 不随绕Y轴旋转改变，屏幕行只取决于 y 和透视比例，而透视比例的范围由
+    该层的最大水平半径决定，因此每个分带只需处理一段连续的粒子。
+    相机俯仰 p 时视图空间的 y' = cos(p)·y - sin(p)·z_rot（|z_rot| ≤ 半径），深度也随 y 变化，
+    两者都有界，范围放宽后仍是按 y 连续的一段；缩放只改变相机到中心的距离。
+    """
+    ys = records["y"]
+    if len(ys) == 0:
+        return 0, 0
+    cos_p, sin_p = math.cos(camera.pitch), abs(math.sin(camera.pitch))
+    distance = config.VIEW_DISTANCE / camera.zoom
+    reach = cos_p * radius + sin_p * max(abs(float(ys[0])), abs(float(ys[-1])))
+    scale_min = config.FOV / (distance + reach)
+    scale_max = config.FOV / max(20.0, distance - reach)
+    # 圆形和辉光的最大半径（闪烁使大小最多放大到 0.8 + 0.4 × 振幅倍数）
+    margin = size_max * scale_max * (0.8 + 0.4 * max(1.0, flicker_gain)) * 1.4 + 2
+    center_y = config.VIRTUAL_HEIGHT // 2 + config.SCENE_OFFSET_Y
+    low = top - margin - center_y
+    high = bottom + margin - center_y
+    y_low = (min(low / scale_min, low / scale_max) - sin_p * radius) / cos_p
+    y_high = (max(high / scale_min, high / scale_max) + sin_p * radius) / cos_p
+    return int(np.searchsorted(ys, y_low, "left")), int(np.searchsorted(ys, y_high, "right"))
+
+
+def _render_band(top: int, bottom: int, camera: Camera, time_seconds: float, snow_count: int,
+                 config_values: Dict[str, object],
+                 gains: Tuple[float, float] = (1.0, 1.0)) -> Tuple[List[int], np.ndarray]:
+    """进程池任务：把 [top, bottom) 行直接渲染到共享帧缓冲，返回绘制统计和每行粒子数"""
+    state = _band_worker
+    config = state["config"]
+    vars(config).update(config_values)
+    renderer = state["renderer"]
+    renderer.flicker_gain, renderer.glow_gain = gains
+    width = config.VIRTUAL_WIDTH
+    view = camera.view(config.VIEW_DISTANCE)
+    renderer.begin(top, bottom, state["frame"][top * width:bottom * width], track_rows=True)
+    for records, radius, size_max in state["layers"]:
+        start, end = layer_window(records, radius, size_max, top, bottom, config,
+                                  renderer.flicker_gain, camera)
+        renderer.draw_records(records[start:end], time_seconds, view)
+    renderer.draw_records(state["snow"][:snow_count], time_seconds, camera.static_view(config.VIEW_DISTANCE))
+    renderer.finish()
+    return renderer.draw_counts, renderer.row_counts
+
+
+class TiledRenderer:
+    """
+    多进程分带渲染
+
+    1920x1080 帧缓冲按行划分为若干水平带，每个带由进程池中的工作进程独立光栅化，
+    粒子数据和帧缓冲都在共享内存中，主进程只负责分派任务和呈现结果。
+    树的中部行粒子最密集，分带边界根据上一帧各行的粒子数量重新划分，使各带工作量接近。
+    """
+
+    def __init__(self, config, rotating_layers: Sequence[np.ndarray], snow_capacity: int,
+                 workers: int, bands_per_worker: int = 2, chunk_size: int = 65536,
+                 memory_budget_mb: float = 256.0, smoothing: float = 0.3):
+        """
+        初始化共享内存和进程池
+
+        Args:
+            config: 配置类
+            rotating_layers: 绕Y轴旋转的粒子层（结构化数组，会按 y 排序复制到共享内存）
+            snow_capacity: 静态层（雪花、火花）粒子数量上限
+            workers: 工作进程数
+            bands_per_worker: 每个进程平均分到的带数（多于 1 时可以吸收剩余的不均衡）
+            chunk_size: 工作进程内的分块大小
+            memory_budget_mb: 所有工作进程渲染缓冲的总内存上限（平均分给各进程）
+            smoothing: 每行工作量估计的指数平滑系数
+        """
+        self.config = config
+        self.width = config.VIRTUAL_WIDTH
+        self.height = config.VIRTUAL_HEIGHT
+        self.workers = workers
+        self.smoothing = smoothing
+        self.band_count = max(1, min(self.height, workers * bands_per_worker))
+        self.boundaries = np.linspace(0, self.height, self.band_count + 1).astype(int)
+        self.row_work: Optional[np.ndarray] = None
+        self.draw_counts = [0, 0, 0, 0]
+        self.flicker_gain = 1.0  # 转发给各工作进程的渲染器
+        self.glow_gain = 1.0
+        self._shms: List[shared_memory.SharedMemory] = []
+        self.pool: Optional[ProcessPoolExecutor] = None
+        # 内存预算平均分给各工作进程，在这里提前检查，避免进程池初始化时才失败
+        check_memory_budget(self.width * self.height, memory_budget_mb / workers, framebuffer=False)
+
+        try:
+            self._frame_shm = self._create(self.width * self.height * 4)
+            self.frame = np.ndarray((self.height, self.width), dtype=np.uint32, buffer=self._frame_shm.buf)
+
+            dtype = rotating_layers[0].dtype if rotating_layers else None
+            layer_specs = []
+            for records in rotating_layers:
+                shm, radius, size_max = self._share_sorted(records, chunk_size)
+                layer_specs.append((shm.name, len(records), radius, size_max))
+            self._snow_shm = self._create(max(1, snow_capacity) * dtype.itemsize)
+            self.snow = np.ndarray((max(1, snow_capacity),), dtype=dtype, buffer=self._snow_shm.buf)
+
+            config_values = {key: getattr(config, key) for key in RENDER_CONFIG_KEYS}
+            # 显式使用 spawn：创建时显示已经初始化、可能还有后台线程（热重载时就在后台线程中创建），
+            # fork 多线程进程可能死锁；工作进程需要的配置和共享内存名称都通过 initargs 传入
+            self.pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=get_context("spawn"), initializer=_band_worker_init,
+                initargs=(self._frame_shm.name, layer_specs, self._snow_shm.name, len(self.snow),
+                          dtype, config_values, chunk_size, memory_budget_mb / workers))
+        except Exception:
+            self.close()
+            raise
+
+    def _create(self, size: int) -> shared_memory.SharedMemory:
+        """创建共享内存并登记，close 时统一释放"""
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+        self._shms.append(shm)
+        return shm
+
+    def _share_sorted(self, records: np.ndarray, chunk_size: int):
+        """按 y 排序复制粒子层到共享内存，返回 (句柄, 最大水平半径, 最大基础大小)"""
+        shm = self._create(len(records) * records.dtype.itemsize)
+        shared = np.ndarray((len(records),), dtype=records.dtype, buffer=shm.buf)
+        order = np.argsort(records["y"], kind="stable")
+        radius_sq = 0.0
+        size_max = 0.0
+        for start in range(0, len(records), chunk_size):
+            part = records[order[start:start + chunk_size]]
+            shared[start:start + len(part)] = part
+            radius_sq = max(radius_sq, float(np.max(part["x"] ** 2 + part["z"] ** 2)))
+            size_max = max(size_max, float(np.max(part["size_base"])))
+        return shm, math.sqrt(radius_sq), size_max
+
+    def render(self, surface: pygame.Surface, static_layers: Sequence[np.ndarray], camera: Camera,
+               time_seconds: float) -> None:
+        """渲染一帧：静态层（雪花、火花）依次复制到共享内存，各带并行写入共享帧缓冲，然后呈现到表面"""
+        snow_count = 0
+        for records in static_layers:
+            count = min(len(records), len(self.snow) - snow_count)
+            self.snow[snow_count:snow_count + count] = records[:count]
+            snow_count += count
+        config_values = {key: getattr(self.config, key) for key in RENDER_CONFIG_KEYS}
+
+        bands = list(zip(self.boundaries[:-1], self.boundaries[1:]))
+        futures = [self.pool.submit(_render_band, int(top), int(bottom), camera, time_seconds,
+                                    snow_count, config_values, (self.flicker_gain, self.glow_gain))
+                   for top, bottom in bands]
+
+        rows = np.zeros(self.height, dtype=np.int64)
+        self.draw_counts = [0, 0, 0, 0]
+        for (top, bottom), future in zip(bands, futures):
+            counts, band_rows = future.result()
+            rows[top:bottom] = band_rows
+            for kind, count in enumerate(counts):
+                self.draw_counts[kind] += count
+
+        present_frame(surface, self.frame)
+        self._rebalance(rows)
+
+    def _rebalance(self, rows: np.ndarray) -> None:
+        """按平滑后的每行粒子数重新划分分带，使各带工作量接近"""
+        if self.row_work is None:
+            self.row_work = rows.astype(np.float64)
+        else:
+            self.row_work += (rows - self.row_work) * self.smoothing
+        # 清屏和呈现的固定开销按每行平均工作量的 5% 计入，空白行不会被并成一个超大的带
+        work = self.row_work + max(1.0, self.row_work.mean() * 0.05)
+        cumulative = np.cumsum(work)
+        targets = cumulative[-1] * np.arange(1, self.band_count) / self.band_count
+        cuts = np.searchsorted(cumulative, targets) + 1
+        # 每个带至少一行：cuts[i] - i 单调不减即保证边界严格递增
+        index = np.arange(self.band_count - 1)
+        cuts = np.clip(cuts - index, 1, self.height - self.band_count + 1)
+        cuts = np.maximum.accumulate(cuts) + index
+        self.boundaries = np.concatenate(([0], cuts, [self.height])).astype(int)
+
+    def close(self) -> None:
+        """关闭进程池并释放共享内存"""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self.frame = self.snow = None
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms = []
+
+
+# ============================================================================
+# 雪花
+# ============================================================================
+
+def update_snow_records(snow: np.ndarray, rng: np.random.Generator) -> None:
+    """更新雪花数组（可写的结构化数组），超出屏幕的雪花重置到顶部"""
+    y = snow["y"]
+    y += snow["fall_speed"]
+    reset = np.flatnonzero(y > 250)
+    if len(reset):
+        y[reset] = -500
+        snow["x"][reset] = rng.uniform(-500, 500, len(reset))
+        snow["z"][reset] = rng.uniform(-500, 500, len(reset))
+
+
+def layer_summary(layers: Dict[str, np.ndarray]) -> List[str]:
+    """各粒子层数量和数据大小的说明行"""
+    return [f"{name}: {len(records)} particles ({records.nbytes / (1024 * 1024):.1f} MB)"
+            for name, records in layers.items()]
@@ -6,10 +6,42 @@ import sys
 import os
 import math
 import random
-from typing import Tuple, List, Optional, Dict
+import argparse
+import time
+import json
+import hashlib
+import tracemalloc
+import copy
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import freeze_support, get_context, shared_memory
+from typing import Tuple, List, Optional, Dict, Callable, Sequence
 
 import pygame
 
+try:
+    import numpy as np
+    from large_scene import (StreamRenderer, TiledRenderer, InstanceSet, INSTANCE_DTYPE,
+                             update_snow_records, layer_summary, measure_thread_scaling)
+    from audio_envelope import AudioEnvelope
+    from sparkles import SparklePool
+except ImportError:  # NumPy 为可选依赖，缺失时相关优化自动关闭
+    np = None
+
+from camera import IDENTITY, Camera, View, inverse, transform_point
+from palette import BG_INDEX, FogPalette
+from config_file import ConfigWatcher, apply_config_values, config_values, load_config_file
+from metrics import FrameMetrics, MetricsExporter, current_rss_bytes, peak_rss_bytes
+from perf_log import RunLog, host_info, release_id
+from session_replay import (SessionRecorder, SessionReplay, config_digest, renderer_mismatches,
+                            frame_time_summary, format_summary)
+
+from profiling import (FrameProfiler, PerformanceHUD, SpanTracer, FrameRangeProfile,
+                       set_tracer, span,
+                       DRAW_SKIPPED, DRAW_PIXEL, DRAW_CIRCLE, DRAW_GLOW)
+
+# 进程启动时间（用于统计启动耗时）
+PROCESS_START = time.perf_counter()
+
 
 # Windows 特定配置
 if sys.platform == 'win32':
@@ -96,11 +128,43 @@ class Config:
     GROUND_PARTICLES = 12000
     SNOW_PARTICLES = 600
 
+    # 场景生成
+    # 固定随机种子：每次启动显示同一棵树（以前默认每次启动随机生成），这是磁盘缓存和打包内置的烘焙场景
+    # 能够命中的前提；None = 每次启动随机生成，不使用缓存和烘焙场景
+    SCENE_SEED = 20241225
+    SCENE_CACHE = True  # 将生成的粒子层缓存到磁盘，之后启动直接内存映射加载（需要 NumPy）
+    VECTORIZED_GENERATORS = True  # 使用 NumPy 批量生成粒子（统计分布与逐粒子生成器一致）
+    GENERATION_CHUNK_SIZE = 131072  # 分块生成的块大小（每块独立播种，修改后场景会变化）
+    GENERATION_WORKERS = None  # 并行生成的进程数；None = CPU 核心数，1 = 不使用进程池
+    PARALLEL_GENERATION_MIN_PARTICLES = 200000  # 待生成粒子总数达到该值才启用进程池
+
+    # 大场景模式（需要 NumPy）：粒子数据按块流式渲染，适合数百万粒子
+    LARGE_SCENE = False
+    LARGE_SCENE_CHUNK_SIZE = 65536  # 每块处理的粒子数量
+    LARGE_SCENE_MEMORY_MB = 256  # 渲染瞬时工作内存上限（帧缓冲、深度缓冲、块和片元缓冲）
+    RENDER_WORKERS = 1  # 大场景分带光栅化的进程数；1 = 在主进程中渲染，None = CPU 核心数
+    RENDER_BANDS_PER_WORKER = 2  # 每个进程平均分到的水平带数量
+    RENDER_THREADS = 1  # 单进程渲染时执行数组阶段（旋转、投影、雾化、闪烁、剔除、雪花）的线程数；None = CPU 核心数
+
+    # 森林模式：中心树之外，在地面上放置多棵共享同一份树几何的实例（需要 NumPy，使用大场景渲染）
+    FOREST_TREES = 0               # 实例数量（例如 20–200）；0 = 关闭
+    FOREST_RADIUS = (450, 1350)    # 实例到中心的距离范围（放在地面远离相机的一半）
+    FOREST_SCALE = (0.35, 0.8)     # 实例缩放范围
+    FOREST_DETAIL = 1.0            # 细节系数：越大远处的树保留的粒子越多
+
     # 渲染参数
     FOV = 500
     VIEW_DISTANCE = 650
     FOG_START_Z = 50.0
     FOG_END_Z = 700.0
+    SCENE_OFFSET_Y = 100  # 场景中心相对画面中心向下的偏移（虚拟像素）
+
+    # 8 位调色板渲染：粒子光栅化到「基础颜色 × 雾化等级」的 256 色表面，缩放后在 blit 到屏幕时展开颜色
+    # （只用于粒子渲染路径，辉光近似为放大的同色圆）。每像素字节数是 32 位表面的 1/4，但在软件 SDL 上
+    # 实测清屏、缩放和 blit 并不更快（1920x1080 -> 1280x720：0.58/1.30/0.55 ms，32 位为 0.41/1.50/0.26 ms），
+    # 收益只来自更简单的逐粒子绘制；目标集成显卡机器上尚未测量，默认关闭
+    INDEXED_RENDER = False
+    INDEXED_FOG_LEVELS = 12  # 每种基础颜色的雾化等级数（基础颜色数量 = 255 // 等级数）
 
     # 动画参数
     AUTO_ROTATION_SPEED = 0.003
@@ -109,6 +173,13 @@ class Config:
     IDLE_TIMEOUT_MS = 2000
     RESUME_SMOOTHNESS = 0.02
 
+    # 相机：垂直拖拽调整俯仰，滚轮缩放
+    PITCH_SENSITIVITY = 0.004      # 每像素垂直拖拽的俯仰角（弧度）
+    PITCH_LIMITS = (-0.3, 0.6)     # 俯仰角范围（正值 = 从上方俯视）
+    ZOOM_STEP = 1.1                # 滚轮每格的缩放倍数
+    ZOOM_LIMITS = (0.6, 2.0)       # 缩放范围
+    ZOOM_SMOOTHNESS = 0.2          # 每帧向目标缩放靠近的比例
+
     # 文本配置（列表格式：[(文本, 字号, 颜色), ...]）
     MESSAGE_LINES = [
         ("*Merry Christmas*", 70, (255, 250, 220)),      # 白色
@@ -122,31 +193,57 @@ class Config:
     TEXT_POSITION_Y = None  # None = 垂直居中
     LINE_SPACING = 15  # 行间距
     SHADOW_OFFSET = (2, 2)
+    FONT_CACHE = True  # 将字体查找结果缓存到磁盘，避免每次启动扫描系统字体
 
     # 音乐配置
     MUSIC_FILE = "music.mp3"
     DEFAULT_VOLUME = 0.5  # 默认音量 50%
 
+    # 音乐联动：闪烁幅度、辉光亮度和自动旋转速度随音乐起伏（按预先计算的响度包络查表，需要 NumPy）
+    AUDIO_REACTIVE = False
+    AUDIO_FLICKER_BOOST = 0.75   # 响度最大时闪烁振幅增加的比例
+    AUDIO_GLOW_BOOST = 1.0       # 低频最强时辉光亮度增加的比例
+    AUDIO_ROTATION_BOOST = 1.5   # 低频最强时自动旋转速度增加的比例
 
-# ============================================================================
-# 初始化
-# ============================================================================
+    # 点击火花：点击树（未被音量控件处理）时在点击处发射一簇金色和白色火花（需要 NumPy）
+    SPARKLES = True
+    SPARKLE_CAPACITY = 2048        # 粒子池容量（同时存在的火花上限，池满时新火花被丢弃）
+    SPARKLE_BURST = 150            # 每次点击发射的数量
+    SPARKLE_LIFETIME = (0.8, 1.6)  # 寿命范围（秒）
+    SPARKLE_COLORS = [GOLD, LIGHT_GOLD, WHITE]
 
-pygame.init()
-pygame.mixer.init()  # 初始化音频混音器
+    # 流水线主循环：下一帧的旋转、雪花和排序在工作线程中与本帧的绘制和呈现并行（输入延迟最多多一帧）
+    PIPELINED_LOOP = False
 
-# 根据配置决定是否全屏
-if Config.AUTO_FULLSCREEN:
-    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-    # 更新实际屏幕尺寸
-    Config.WIDTH, Config.HEIGHT = screen.get_size()
-else:
-    screen = pygame.display.set_mode((Config.WIDTH, Config.HEIGHT))
+    # 性能浮层
+    SHOW_PERF_HUD = False  # 启动时是否显示性能浮层
+    PERF_HUD_KEY = pygame.K_F3  # 切换性能浮层的按键
+    PERF_HUD_REFRESH_HZ = 4  # 浮层文本每秒刷新次数
 
-pygame.display.set_caption(Config.WINDOW_TITLE)
-clock = pygame.time.Clock()
+    # 运行指标导出（Prometheus 文本格式，只监听本机）
+    METRICS_PORT = None  # 例如 9109；None = 关闭
+    METRICS_SOCKET = None  # Unix 域套接字路径，设置后优先于端口
+
+    # 帧耗时回归日志：退出时把本次运行的摘要追加到本地日志，按大小轮转（见 perf_log.py）
+    PERF_LOG = None  # 日志路径；None = 关闭
+    PERF_LOG_MAX_BYTES = 256 * 1024  # 单个日志文件的大小上限
+    PERF_LOG_BACKUPS = 3  # 保留的轮转文件数量（总占用不超过 (PERF_LOG_BACKUPS + 1) × PERF_LOG_MAX_BYTES）
+
+    # 预览模式（屏保设置面板中的小窗口）：直接按窗口分辨率渲染，粒子数量按像素面积缩减，不播放音乐
+    PREVIEW_SIZE = (152, 112)
+    PREVIEW_FPS = 15
+    PREVIEW_DENSITY = 4.0  # 按面积缩减后的粒子数量倍数（缩小后大部分粒子只占一个像素，需要更多粒子保持轮廓）
+    PREVIEW_MIN_LAYER_PARTICLES = 40  # 每层粒子数量下限
+
+    # 外部配置文件（TOML / JSON，键名与本类属性相同），运行中修改会自动重载
+    CONFIG_FILE = None
+    CONFIG_WATCH_INTERVAL = 1.0  # 检查文件变化的间隔（秒）
+
+
+# ============================================================================
+# 初始化
+# ============================================================================
 
-# 加载背景音乐
 def get_resource_path(relative_path):
     """获取资源文件的绝对路径（支持打包后的环境）"""
     try:
@@ -168,9 +265,6 @@ def set_window_icon():
         print(f"Failed to load window icon: {error}")
 
 
-set_window_icon()
-
-
 def load_png_icon(relative_path: str, size: int) -> Optional[pygame.Surface]:
     """加载PNG图标并缩放为指定大小"""
     icon_path = get_resource_path(relative_path)
@@ -183,17 +277,39 @@ def load_png_icon(relative_path: str, size: int) -> Optional[pygame.Surface]:
         print(f"Failed to load PNG icon '{relative_path}': {error}")
         return None
 
-try:
-    music_path = get_resource_path(Config.MUSIC_FILE)
-    pygame.mixer.music.load(music_path)
-    pygame.mixer.music.set_volume(Config.DEFAULT_VOLUME)
-    pygame.mixer.music.play(-1)  # -1 表示循环播放
-    print(f"Background music loaded: {music_path}")
-except Exception as e:
-    print(f"Failed to load music: {e}")
 
-# 创建虚拟渲染表面（固定分辨率）
-virtual_surface = pygame.Surface((Config.VIRTUAL_WIDTH, Config.VIRTUAL_HEIGHT))
+# 是否支持预乘 alpha 混合（pygame 2.1.4+）
+PREMULTIPLIED_BLEND = hasattr(pygame.Surface, "premul_alpha")
+
+
+def blit_premultiplied(target: pygame.Surface, source: pygame.Surface,
+                       position: Tuple[int, int]) -> None:
+    """
+    把带透明度的图层合成到透明表面 target 上
+
+    支持时使用预乘 alpha，合成结果再以 BLEND_PREMULTIPLIED 叠加到背景，与逐层直接绘制一致；
+    否则退回普通 alpha 混合（半透明图层重叠处略有偏差）。
+    """
+    if not PREMULTIPLIED_BLEND:
+        target.blit(source, position)
+        return
+    # 先复制到普通透明表面再预乘：字体直接渲染出的表面做预乘混合时结果不正确
+    layer = pygame.Surface(source.get_size(), pygame.SRCALPHA)
+    layer.blit(source, (0, 0))
+    target.blit(layer.premul_alpha(), position, special_flags=pygame.BLEND_PREMULTIPLIED)
+
+
+def load_music() -> None:
+    """加载并循环播放背景音乐"""
+    try:
+        music_path = get_resource_path(Config.MUSIC_FILE)
+        pygame.mixer.music.load(music_path)
+        pygame.mixer.music.set_volume(Config.DEFAULT_VOLUME)
+        pygame.mixer.music.play(-1)  # -1 表示循环播放
+        print(f"Background music loaded: {music_path}")
+    except Exception as e:
+        print(f"Failed to load music: {e}")
+
 
 # 计算缩放和偏移以保持宽高比
 def calculate_scaling():
@@ -215,50 +331,171 @@ def calculate_scaling():
         # 拉伸填充整个屏幕，可能变形
         return Config.WIDTH, Config.HEIGHT, 0, 0
 
-scaled_width, scaled_height, offset_x, offset_y = calculate_scaling()
 
+# 窗口与渲染表面（由 init_display 创建，导入模块时不会打开窗口）
+screen: Optional[pygame.Surface] = None
+clock: Optional[pygame.time.Clock] = None
+virtual_surface: Optional[pygame.Surface] = None
+scaled_width, scaled_height, offset_x, offset_y = Config.WIDTH, Config.HEIGHT, 0, 0
 
-def load_font(size: int) -> pygame.font.Font:
-    """加载最佳可用字体（支持中文）"""
-    try:
-        # 优先尝试中文字体
-        font_candidates = [
-            ('times new roman', True),      # 英文
-            ('PingFang SC', True),      # macOS 中文
-            ('Hiragino Sans GB', True),  # macOS 中文
-            ('Microsoft YaHei', True),   # Windows 中文
-            ('SimHei', True),            # Windows 中文
-            ('STHeiti', True),           # 华文黑体
-            ('Arial', True),             # 英文备选
-        ]
-        
-        for font_name, bold in font_candidates:
+
+def init_display() -> None:
+    """初始化 pygame、窗口、背景音乐和虚拟渲染表面"""
+    global screen, clock, virtual_surface
+    global scaled_width, scaled_height, offset_x, offset_y
+
+    pygame.init()
+    pygame.mixer.init()  # 初始化音频混音器
+
+    # 根据配置决定是否全屏
+    if Config.AUTO_FULLSCREEN:
+        screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        # 更新实际屏幕尺寸
+        Config.WIDTH, Config.HEIGHT = screen.get_size()
+    else:
+        screen = pygame.display.set_mode((Config.WIDTH, Config.HEIGHT))
+
+    pygame.display.set_caption(Config.WINDOW_TITLE)
+    clock = pygame.time.Clock()
+
+    set_window_icon()
+    load_music()
+
+    # 创建虚拟渲染表面（固定分辨率）
+    virtual_surface = pygame.Surface((Config.VIRTUAL_WIDTH, Config.VIRTUAL_HEIGHT))
+    scaled_width, scaled_height, offset_x, offset_y = calculate_scaling()
+
+
+# 优先尝试中文字体
+FONT_CANDIDATES = [
+    ('times new roman', True),      # 英文
+    ('PingFang SC', True),      # macOS 中文
+    ('Hiragino Sans GB', True),  # macOS 中文
+    ('Microsoft YaHei', True),   # Windows 中文
+    ('SimHei', True),            # Windows 中文
+    ('STHeiti', True),           # 华文黑体
+    ('Arial', True),             # 英文备选
+]
+
+# 字体缓存：字号 -> Font（进程内），以及命中统计（命中, 未命中）
+_font_cache: Dict[int, pygame.font.Font] = {}
+font_cache_stats = [0, 0]
+_font_path: Optional[str] = None
+_font_path_resolved = False
+
+
+def font_cache_path() -> str:
+    """返回字体查找结果的磁盘缓存文件路径"""
+    return os.path.join(get_user_cache_dir(), "fonts.json")
+
+
+def resolve_font_path() -> Optional[str]:
+    """
+    按 FONT_CANDIDATES 顺序查找第一个可用字体文件，找不到时返回 None
+
+    match_font 在 Linux 上会扫描 fontconfig，较慢：结果在进程内只查找一次，
+    开启 Config.FONT_CACHE 时还会写入磁盘缓存（按候选字体列表记录，文件不存在时重新查找）。
+    「一个都没找到」也会缓存（记为 null），没有候选字体的机器不必每次启动重新扫描；
+    之后安装了字体时删除缓存文件即可重新查找。
+    """
+    global _font_path, _font_path_resolved
+    if _font_path_resolved:
+        return _font_path
+
+    cache_key = json.dumps(FONT_CANDIDATES)
+    cached = {}
+    if Config.FONT_CACHE:
+        try:
+            with open(font_cache_path(), "r", encoding="utf-8") as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError):
+            cached = {}
+    if not isinstance(cached, dict):
+        cached = {}
+    hit = cache_key in cached
+    font_path = cached.get(cache_key)
+    if font_path is not None and not os.path.exists(font_path):
+        hit = False
+
+    if not hit:
+        font_path = None
+        for font_name, bold in FONT_CANDIDATES:
             font_path = pygame.font.match_font(font_name, bold=bold)
             if font_path:
-                return pygame.font.Font(font_path, size)
-        
-        # 如果都没找到，使用系统默认
-        return pygame.font.SysFont(None, size)
+                break
+        if Config.FONT_CACHE:
+            try:
+                os.makedirs(os.path.dirname(font_cache_path()), exist_ok=True)
+                with open(font_cache_path(), "w", encoding="utf-8") as cache_file:
+                    json.dump({cache_key: font_path or None}, cache_file)
+            except OSError as error:
+                print(f"Failed to write font cache: {error}")
+
+    _font_path = font_path or None
+    _font_path_resolved = True
+    return _font_path
+
+
+def load_font(size: int) -> pygame.font.Font:
+    """加载最佳可用字体（支持中文），同一字号在进程内只加载一次"""
+    font = _font_cache.get(size)
+    if font is not None:
+        font_cache_stats[0] += 1
+        return font
+    font_cache_stats[1] += 1
+
+    try:
+        font_path = resolve_font_path()
+        if font_path:
+            font = pygame.font.Font(font_path, size)
+        else:
+            # 如果都没找到，使用 pygame 自带的默认字体（与 SysFont(None) 相同，但不扫描系统字体）
+            font = pygame.font.Font(None, size)
     except Exception:
-        return pygame.font.SysFont(None, size)
+        font = pygame.font.Font(None, size)
+    _font_cache[size] = font
+    return font
 
 # ============================================================================
 # 粒子系统
 # ============================================================================
 
+# 点画（亚像素粒子随机跳过）使用的独立随机数源，可通过 set_stipple_seed 固定结果
+_stipple_rng = random.Random()
+_stipple_random = _stipple_rng.random
+
+
+def set_stipple_seed(seed: Optional[int]) -> None:
+    """固定点画随机数种子，使同一场景的渲染结果可重复（None 恢复为随机）"""
+    _stipple_rng.seed(seed)
+
+
+# 音乐联动：非雪花粒子的闪烁振幅倍数和辉光亮度倍数（1.0 = 不联动）
+_flicker_gain = 1.0
+_glow_gain = 1.0
+
+
+def set_audio_gains(flicker_gain: float, glow_gain: float) -> None:
+    """设置音乐联动的闪烁和辉光倍数（在两帧之间调用）"""
+    global _flicker_gain, _glow_gain
+    _flicker_gain = flicker_gain
+    _glow_gain = glow_gain
+
+
 class Particle:
     """3D粒子类，包含位置、颜色和动画属性"""
 
-    def __init__(self, x: float, y: float, z: float, color: Tuple[int, int, int], size_base: float, is_snow: bool = False):
-        """初始化粒子的3D位置和视觉属性"""
+    def __init__(self, x: float, y: float, z: float, color: Tuple[int, int, int], size_base: float, is_snow: bool = False,
+                 rng=random):
+        """初始化粒子的3D位置和视觉属性（闪烁参数从 rng 中抽取，默认使用全局 random）"""
         self.x, self.y, self.z = x, y, z
         self.orig_x, self.orig_y, self.orig_z = x, y, z
         self.color = color
         self.size_base = size_base
         self.is_snow = is_snow  # 标记是否为雪花粒子
 
-        self.flicker_speed = random.uniform(2.0, 5.0)
-        self.flicker_offset = random.uniform(0, math.pi * 2)
+        self.flicker_speed = rng.uniform(2.0, 5.0)
+        self.flicker_offset = rng.uniform(0, math.pi * 2)
         self.fall_speed = 0.0
 
     def rotate_y(self, angle: float) -> None:
@@ -284,57 +521,167 @@ class Particle:
         """将3D位置投影到2D屏幕坐标"""
         center_offset_x = int(Config.VIRTUAL_WIDTH * 0.6)
         x_2d = int(self.x * scale + center_offset_x)
-        y_2d = int(self.y * scale + Config.VIRTUAL_HEIGHT // 2 + 100)
+        y_2d = int(self.y * scale + Config.VIRTUAL_HEIGHT // 2 + Config.SCENE_OFFSET_Y)
         return (x_2d, y_2d)
 
     def _draw_glow(self, surface: pygame.Surface, x: int, y: int, size: int, fog_factor: float, color: Tuple[int, int, int]) -> None:
-        """绘制粒子周围的辉光效果"""
-        if size > 3 and self.fall_speed == 0 and fog_factor < 0.5:
-            glow_radius = int(size * 1.4)
-            glow_surf = pygame.Surface((glow_radius * 2, glow_radius * 2), pygame.SRCALPHA)
-            glow_alpha = int(30 * (1 - fog_factor))
-            pygame.draw.circle(glow_surf, (*color, glow_alpha), (glow_radius, glow_radius), glow_radius)
-            surface.blit(glow_surf, (x - glow_radius, y - glow_radius), special_flags=pygame.BLEND_ADD)
-
-    def draw(self, surface: pygame.Surface, time_input: float) -> None:
-        """将粒子以3D投影方式渲染到屏幕"""
+        """绘制粒子周围的辉光效果（是否绘制由 _footprint 决定）"""
+        glow_radius = int(size * 1.4)
+        if _glow_gain != 1.0:
+            color = tuple(min(255, int(c * _glow_gain)) for c in color)
+        glow_surf = pygame.Surface((glow_radius * 2, glow_radius * 2), pygame.SRCALPHA)
+        glow_alpha = int(30 * (1 - fog_factor))
+        pygame.draw.circle(glow_surf, (*color, glow_alpha), (glow_radius, glow_radius), glow_radius)
+        surface.blit(glow_surf, (x - glow_radius, y - glow_radius), special_flags=pygame.BLEND_ADD)
+
+    def _footprint(self, time_input: float) -> Tuple[int, int, int, int, float]:
+        """
+        投影、雾化和闪烁：返回 (绘制方式 DRAW_*, 屏幕 x, 屏幕 y, 半径, 雾化比例)
+
+        draw 与 draw_indexed 共用，两条渲染路径的剔除、大小和绘制方式始终一致。
+        """
         # 提前剔除在相机后面的粒子
         if Config.VIEW_DISTANCE + self.z <= 20:
-            return
+            return DRAW_SKIPPED, 0, 0, 0, 0.0
 
         # 计算透视
         scale = Config.FOV / (Config.VIEW_DISTANCE + self.z)
         fog_factor = self._calculate_fog_factor()
-        final_color = self._apply_fog(fog_factor)
         x_2d, y_2d = self._project_to_2d(scale)
 
         # 带闪烁效果的动画大小
         flicker = math.sin(time_input * self.flicker_speed + self.flicker_offset)
         # 雪花粒子闪烁不明显（0.05），其他粒子正常闪烁（0.4）
-        flicker_amplitude = 0.05 if self.is_snow else 0.4
+        flicker_amplitude = 0.05 if self.is_snow else 0.4 * _flicker_gain
         current_size = self.size_base * scale * (0.8 + flicker_amplitude * flicker)
 
         # 根据大小选择渲染方式
         if current_size <= 1.2:
-            if current_size > 0.5 or random.random() < 0.6:
-                try:
-                    surface.set_at((x_2d, y_2d), final_color)
-                except IndexError:
-                    pass  # 粒子超出屏幕边界
-        else:
-            size = int(current_size)
-            pygame.draw.circle(surface, final_color, (x_2d, y_2d), size)
+            if current_size > 0.5 or _stipple_random() < 0.6:
+                return DRAW_PIXEL, x_2d, y_2d, 1, fog_factor
+            return DRAW_SKIPPED, x_2d, y_2d, 0, fog_factor
+
+        size = int(current_size)
+        if size > 3 and self.fall_speed == 0 and fog_factor < 0.5:
+            return DRAW_GLOW, x_2d, y_2d, size, fog_factor
+        return DRAW_CIRCLE, x_2d, y_2d, size, fog_factor
+
+    def draw(self, surface: pygame.Surface, time_input: float) -> int:
+        """将粒子以3D投影方式渲染到屏幕，返回绘制方式（DRAW_*）"""
+        kind, x_2d, y_2d, size, fog_factor = self._footprint(time_input)
+        if kind == DRAW_SKIPPED:
+            return kind
+        final_color = self._apply_fog(fog_factor)
+
+        if kind == DRAW_PIXEL:
+            try:
+                surface.set_at((x_2d, y_2d), final_color)
+            except IndexError:
+                pass  # 粒子超出屏幕边界
+            return kind
+
+        pygame.draw.circle(surface, final_color, (x_2d, y_2d), size)
+        if kind == DRAW_GLOW:
             self._draw_glow(surface, x_2d, y_2d, size, fog_factor, final_color)
+        return kind
+
+    def draw_indexed(self, surface: pygame.Surface, time_input: float, palette: FogPalette) -> int:
+        """
+        与 draw 相同的投影和大小，绘制到 8 位调色板表面：颜色直接写入调色板索引，不做逐像素颜色匹配
+
+        调色板表面无法加色混合，辉光近似为同色的放大圆（加色辉光在背景上接近粒子本身的颜色）。
+        """
+        kind, x_2d, y_2d, size, fog_factor = self._footprint(time_input)
+        if kind == DRAW_SKIPPED:
+            return kind
+        index = palette.index(self.color, fog_factor)
+
+        if kind == DRAW_PIXEL:
+            try:
+                surface.set_at((x_2d, y_2d), index)
+            except IndexError:
+                pass
+            return kind
+
+        pygame.draw.circle(surface, index, (x_2d, y_2d), int(size * 1.4) if kind == DRAW_GLOW else size)
+        return kind
+
+def draw_particles(surface: pygame.Surface, particles: List[Particle], time_seconds: float) -> None:
+    """参考渲染路径：按给定顺序逐个绘制粒子（调用方负责按深度排序）"""
+    for p in particles:
+        p.draw(surface, time_seconds)
+
+
+def scene_palette(particles: List[Particle]) -> FogPalette:
+    """由场景粒子（以及火花）的颜色建立 8 位渲染使用的调色板"""
+    colors = [p.color for p in particles]
+    if Config.SPARKLES:
+        colors.extend(tuple(color) for color in Config.SPARKLE_COLORS)
+    return FogPalette(colors, Config.BG_COLOR, Config.INDEXED_FOG_LEVELS)
+
+
+def draw_particles_indexed(surface: pygame.Surface, particles: List[Particle], time_seconds: float) -> None:
+    """8 位渲染路径：光栅化到调色板表面后展开到目标表面（调色板由本次的粒子颜色建立）"""
+    palette = scene_palette(particles)
+    indexed = pygame.Surface(surface.get_size(), 0, 8)
+    indexed.set_palette(palette.colors)
+    indexed.fill(BG_INDEX)
+    for p in particles:
+        p.draw_indexed(indexed, time_seconds, palette)
+    surface.blit(indexed, (0, 0))
+
+
+def _stipple_draws(count: int):
+    """按绘制顺序从点画随机数源取 count 个随机数"""
+    return np.fromiter((_stipple_random() for _ in range(count)), dtype=np.float64, count=count)
+
+
+def draw_particles_streamed(surface: pygame.Surface, particles: List[Particle], time_seconds: float) -> None:
+    """大场景渲染路径：将已排序粒子的当前位置打包为数组后按块流式光栅化"""
+    renderer = StreamRenderer(Config, Config.LARGE_SCENE_CHUNK_SIZE, Config.LARGE_SCENE_MEMORY_MB)
+    renderer.begin()
+    renderer.draw_records(particles_to_records(particles, current_position=True), time_seconds,
+                          stipple=_stipple_draws)
+    renderer.finish(surface)
+
+
+def draw_particles_tiled(surface: pygame.Surface, particles: List[Particle], time_seconds: float) -> None:
+    """多进程分带渲染路径：粒子的当前位置作为一个粒子层交给各工作进程（相机为单位变换）"""
+    renderer = TiledRenderer(Config, [particles_to_records(particles, current_position=True)], 1,
+                             max(2, Config.RENDER_WORKERS or 2), Config.RENDER_BANDS_PER_WORKER,
+                             Config.LARGE_SCENE_CHUNK_SIZE, Config.LARGE_SCENE_MEMORY_MB)
+    try:
+        renderer.render(surface, [], Camera(), time_seconds)
+    finally:
+        renderer.close()
+
+
+# 可用的粒子渲染路径，签名为 (surface, 按深度排序的粒子, 时间秒数)
+# 新的渲染路径应先注册到这里，并通过 golden_frames.py 与 "reference" 对比
+RENDERERS: Dict[str, Callable[[pygame.Surface, List[Particle], float], None]] = {
+    "reference": draw_particles,
+    "indexed": draw_particles_indexed,
+}
+if np is not None:
+    RENDERERS["stream"] = draw_particles_streamed
+    RENDERERS["tiled"] = draw_particles_tiled
 
 # ============================================================================
 # 粒子生成器
 # ============================================================================
 
-def generate_ragged_tree(num_particles: int) -> List[Particle]:
+# 地面圆盘的高度和半径
+GROUND_Y = 240
+GROUND_RADIUS = 1400
+# 树的高度和底部半径
+TREE_HEIGHT = 700
+TREE_BASE_RADIUS = 260
+
+def generate_ragged_tree(num_particles: int, rng=random) -> List[Particle]:
     """生成分层圣诞树的粒子"""
     particles = []
-    tree_height = 700
-    max_base_radius = 260
+    tree_height = TREE_HEIGHT
+    max_base_radius = TREE_BASE_RADIUS
     num_layers = 9
     num_branches = 8  # 每层的主要分支数
 
@@ -343,7 +690,7 @@ def generate_ragged_tree(num_particles: int) -> List[Particle]:
         h_norm = i / num_particles
         h_dist = math.pow(h_norm, 0.75)
         y = -tree_height * 0.58 + h_dist * tree_height
-        y += random.uniform(-4, 4)
+        y += rng.uniform(-4, 4)
 
         # 分层半径计算 - 调整使树更饱满
         cone_boundary_r = max_base_radius * h_dist
@@ -354,19 +701,19 @@ def generate_ragged_tree(num_particles: int) -> List[Particle]:
 
         # 带扰动的径向分布 - 使用更小的幂次让内部粒子更密集
         # 降低幂次让更多粒子聚集在内部
-        r_scatter = math.pow(random.random(), 0.15)  # 从0.25减小到0.15，让内部更密集
+        r_scatter = math.pow(rng.random(), 0.15)  # 从0.25减小到0.15，让内部更密集
         r = current_layer_max_r * r_scatter
-        turbulence_scale = random.uniform(0.9, 1.35)  # 稍微增大范围
-        if random.random() < 0.08:  # 从5%增加到8%
+        turbulence_scale = rng.uniform(0.9, 1.35)  # 稍微增大范围
+        if rng.random() < 0.08:  # 从5%增加到8%
             turbulence_scale = 1.6  # 从1.5增加到1.6
         r *= turbulence_scale
 
         # 树顶更窄
         if h_dist < 0.06:
-            r = random.uniform(0, 8 * (1 - h_dist))
+            r = rng.uniform(0, 8 * (1 - h_dist))
 
         # 螺旋角度分布
-        theta = random.uniform(0, math.pi * 2) + h_dist * math.pi * 12
+        theta = rng.uniform(0, math.pi * 2) + h_dist * math.pi * 12
 
         # 添加树枝状的径向扰动
         # 在特定角度方向上添加线性延伸，模拟树枝效果
@@ -377,19 +724,19 @@ def generate_ragged_tree(num_particles: int) -> List[Particle]:
         if branch_proximity < 0.4:  # 在分支方向的容差范围内
             branch_strength = 1.0 - (branch_proximity / 0.4)  # 越靠近分支中心，强度越大
             # 沿径向添加延伸扰动
-            branch_extension = branch_strength * random.uniform(0, 25) * (1 - h_dist * 0.3)
+            branch_extension = branch_strength * rng.uniform(0, 25) * (1 - h_dist * 0.3)
             r += branch_extension
 
             # 添加一些垂直方向的微小偏移，让树枝更自然
-            if random.random() < 0.3:
-                y += random.uniform(-8, 8) * branch_strength
+            if rng.random() < 0.3:
+                y += rng.uniform(-8, 8) * branch_strength
 
         x = r * math.cos(theta)
         z = r * math.sin(theta)
 
         # 颜色选择 - 从内到外由深到浅（粉紫→粉色→白色雪花+金色）
         # 大小和类型初始化
-        size = random.uniform(0.6, 2.0)
+        size = rng.uniform(0.6, 2.0)
         is_snow_particle = False
         is_gold_particle = False
 
@@ -397,96 +744,96 @@ def generate_ragged_tree(num_particles: int) -> List[Particle]:
         if h_dist < 0.06:
             color = Config.WHITE
             is_snow_particle = True
-            size = random.uniform(0.5, 1.2)  # 小雪花
+            size = rng.uniform(0.5, 1.2)  # 小雪花
         # 内部深色（粉紫色系）
         elif r_scatter < 0.45:
-            color = random.choice(Config.TREE_COLORS_INNER)
+            color = rng.choice(Config.TREE_COLORS_INNER)
             # 最内部进一步加深
             if r_scatter < 0.25:
                 color = tuple(max(0, int(c * 0.75)) for c in color)
             elif r_scatter < 0.35:
                 color = tuple(max(0, int(c * 0.85)) for c in color)
             # 在深色区域添加少量金色点缀
-            if random.random() < 0.015:
+            if rng.random() < 0.015:
                 color = Config.LIGHT_GOLD
                 is_gold_particle = True
             # 在深色区域添加少量白色雪花
-            elif random.random() < 0.03:
+            elif rng.random() < 0.03:
                 color = Config.WHITE
                 is_snow_particle = True
-                size = random.uniform(0.5, 1.0)  # 小雪花
+                size = rng.uniform(0.5, 1.0)  # 小雪花
         # 中间层过渡色
         elif r_scatter < 0.72:
-            color = random.choice(Config.TREE_COLORS_MID)
+            color = rng.choice(Config.TREE_COLORS_MID)
             # 在中间层添加金色点缀
-            if random.random() < 0.03:
-                color = Config.GOLD if random.random() < 0.6 else Config.LIGHT_GOLD
+            if rng.random() < 0.03:
+                color = Config.GOLD if rng.random() < 0.6 else Config.LIGHT_GOLD
                 is_gold_particle = True
             # 在中间层添加白色雪花
-            elif random.random() < 0.06:
+            elif rng.random() < 0.06:
                 color = Config.WHITE
                 is_snow_particle = True
-                size = random.uniform(0.5, 1.2)  # 小雪花
+                size = rng.uniform(0.5, 1.2)  # 小雪花
         # 外层亮色
         else:
             # 外层白色雪花效果
-            if random.random() < 0.58:
+            if rng.random() < 0.58:
                 color = Config.WHITE
                 is_snow_particle = True
-                size = random.uniform(0.4, 1.0)
+                size = rng.uniform(0.4, 1.0)
             # 外层金色装饰
-            elif random.random() < 0.04:
+            elif rng.random() < 0.04:
                 color = Config.GOLD
                 is_gold_particle = True
             else:
-                color = random.choice(Config.TREE_COLORS_OUTER)
+                color = rng.choice(Config.TREE_COLORS_OUTER)
                 # 最外层稍微提亮
                 if r_scatter > 0.88:
                     color = tuple(min(255, int(c * 1.12)) for c in color)
 
         # 最外层突出的雪花效果
         if turbulence_scale > 2.8:
-            if random.random() < 0.88:  # 88%是白色雪花
+            if rng.random() < 0.88:  # 88%是白色雪花
                 color = Config.WHITE
                 is_snow_particle = True
-                size = random.uniform(0.5, 1.1)
+                size = rng.uniform(0.5, 1.1)
             else:  # 12%是金色点缀
                 color = Config.GOLD
                 is_gold_particle = True
-                size = random.uniform(1.2, 2.5)
+                size = rng.uniform(1.2, 2.5)
 
         # 根据粒子类型调整大小
         if is_gold_particle:
             # 金色粒子偏大，作为装饰亮点
-            if random.random() < 0.3:  # 30%是大金色粒子
-                size = random.uniform(2.8, 4.2)
+            if rng.random() < 0.3:  # 30%是大金色粒子
+                size = rng.uniform(2.8, 4.2)
             else:
-                size = random.uniform(1.8, 3.0)
+                size = rng.uniform(1.8, 3.0)
         elif not is_snow_particle:
             # 其他彩色粒子根据亮度调整大小
             brightness = (color[0] * 0.299 + color[1] * 0.587 + color[2] * 0.114)
 
             if brightness > 180:  # 偏亮的彩色粒子
                 # 20%概率变成大粒子
-                if random.random() < 0.2:
-                    size = random.uniform(2.5, 4.0)
+                if rng.random() < 0.2:
+                    size = rng.uniform(2.5, 4.0)
                 else:
-                    size = random.uniform(1.2, 2.5)
+                    size = rng.uniform(1.2, 2.5)
             elif brightness > 120:  # 中等亮度
-                size = random.uniform(0.8, 2.2)
+                size = rng.uniform(0.8, 2.2)
             else:  # 深色粒子
-                size = random.uniform(0.6, 1.8)
+                size = rng.uniform(0.6, 1.8)
 
-        particles.append(Particle(x, y, z, color, size, is_snow=is_snow_particle))
+        particles.append(Particle(x, y, z, color, size, is_snow=is_snow_particle, rng=rng))
 
     # 在最外层增加额外的白色雪花层，模拟落在树上的雪
     num_snow_layer = int(num_particles * 0.4)  # 额外增加40%的雪花粒子
     for i in range(num_snow_layer):
         # 垂直分布
-        h_norm = random.random()
+        h_norm = rng.random()
         h_dist = math.pow(h_norm, 0.25)
         y = -tree_height * 0.58 + h_dist * tree_height
-        y += random.uniform(-6, 6)
+        y += rng.uniform(-6, 6)
 
         # 在树的最外层轮廓处生成雪花
         cone_boundary_r = max_base_radius * h_dist
@@ -495,46 +842,46 @@ def generate_ragged_tree(num_particles: int) -> List[Particle]:
         current_layer_max_r = cone_boundary_r * layer_profile_scale
 
         # 雪花在最外层表面
-        r_position = random.uniform(0.95, 1.15)
+        r_position = rng.uniform(0.95, 1.15)
         r = current_layer_max_r * r_position
 
         # 树顶更窄
         if h_dist < 0.06:
-            r = random.uniform(7, 12 * (1 - h_dist))
+            r = rng.uniform(7, 12 * (1 - h_dist))
 
         # 角度分布
-        theta = random.uniform(0, math.pi * 2) + h_dist * math.pi * 12
+        theta = rng.uniform(0, math.pi * 2) + h_dist * math.pi * 12
 
         # 添加树枝状扰动
         branch_angle = (theta % (math.pi * 2 / num_branches))
         branch_proximity = abs(branch_angle - math.pi / num_branches)
         if branch_proximity < 0.4:
             branch_strength = 1.0 - (branch_proximity / 0.4)
-            branch_extension = branch_strength * random.uniform(0, 30) * (1 - h_dist * 0.3)
+            branch_extension = branch_strength * rng.uniform(0, 30) * (1 - h_dist * 0.3)
             r += branch_extension
-            if random.random() < 0.4:
-                y += random.uniform(-10, 10) * branch_strength
+            if rng.random() < 0.4:
+                y += rng.uniform(-10, 10) * branch_strength
 
         x = r * math.cos(theta)
         z = r * math.sin(theta)
 
         # 白色雪花粒子
-        snow_size = random.uniform(0.8, 2.0)
-        particles.append(Particle(x, y, z, Config.WHITE, snow_size, is_snow=True))
+        snow_size = rng.uniform(0.8, 2.0)
+        particles.append(Particle(x, y, z, Config.WHITE, snow_size, is_snow=True, rng=rng))
 
     return particles
 
-def generate_bright_white_ground(num_particles: int) -> List[Particle]:
+def generate_bright_white_ground(num_particles: int, rng=random) -> List[Particle]:
     """生成波纹地面的粒子"""
     particles = []
-    ground_y = 240
-    max_dist = 1400
+    ground_y = GROUND_Y
+    max_dist = GROUND_RADIUS
 
     for _ in range(num_particles):
         # 径向分布 - 使用更平滑的分布减少边缘锐利感
-        angle = random.uniform(0, math.pi * 2)
+        angle = rng.uniform(0, math.pi * 2)
         # 使用更高的幂次(0.6)让边缘粒子分布更密集，减少锐利边缘
-        dist = math.pow(random.random(), 0.6) * max_dist
+        dist = math.pow(rng.random(), 0.6) * max_dist
         x = dist * math.cos(angle)
         z = dist * math.sin(angle)
 
@@ -552,29 +899,29 @@ def generate_bright_white_ground(num_particles: int) -> List[Particle]:
 
         # 边缘使用稍大的粒子填充空隙
         if dist > max_dist * 0.8:
-            size = random.uniform(1.0, 2.0)
+            size = rng.uniform(1.0, 2.0)
         else:
-            size = random.uniform(0.5, 1.5)
+            size = rng.uniform(0.5, 1.5)
 
-        particles.append(Particle(x, ground_y, z, color, size))
+        particles.append(Particle(x, ground_y, z, color, size, rng=rng))
 
     return particles
 
 
-def generate_snow(num_particles: int) -> List[Particle]:
+def generate_snow(num_particles: int, rng=random) -> List[Particle]:
     """生成飘落的雪花粒子"""
     particles = []
     for _ in range(num_particles):
-        x = random.uniform(-500, 1200)
-        y = random.uniform(-500, 500)
-        z = random.uniform(-500, 1200)
-        particle = Particle(x, y, z, Config.WHITE, random.uniform(0.8, 1.8))
-        particle.fall_speed = random.uniform(0.2, 1.8)
+        x = rng.uniform(-500, 1200)
+        y = rng.uniform(-500, 500)
+        z = rng.uniform(-500, 1200)
+        particle = Particle(x, y, z, Config.WHITE, rng.uniform(0.8, 1.8), rng=rng)
+        particle.fall_speed = rng.uniform(0.2, 1.8)
         particles.append(particle)
     return particles
 
 
-def generate_pillow_heart(num_particles: int) -> List[Particle]:
+def generate_pillow_heart(num_particles: int, rng=random) -> List[Particle]:
     """生成树顶的3D蓬松心形"""
     particles = []
     scale_base = 3.0
@@ -582,12 +929,12 @@ def generate_pillow_heart(num_particles: int) -> List[Particle]:
 
     for _ in range(num_particles):
         # 参数化心形曲线
-        t = random.uniform(0, math.pi * 2)
+        t = rng.uniform(0, math.pi * 2)
         x0 = 16 * math.sin(t)**3
         y0 = 13 * math.cos(t) - 5 * math.cos(2*t) - 2 * math.cos(3*t) - math.cos(4*t)
 
         # 径向填充
-        r = math.pow(random.random(), 0.2)
+        r = math.pow(rng.random(), 0.2)
 
         # 缩放位置
         scale = scale_base * r
@@ -597,44 +944,674 @@ def generate_pillow_heart(num_particles: int) -> List[Particle]:
         # 3D厚度实现蓬松效果
         max_thickness = 16.0
         z_thickness = max_thickness * math.pow(math.cos(r * math.pi / 2), 0.7)
-        z_side = 1 if random.random() > 0.5 else -1
-        p_z = z_thickness * z_side * random.uniform(0.9, 1.1)
+        z_side = 1 if rng.random() > 0.5 else -1
+        p_z = z_thickness * z_side * rng.uniform(0.9, 1.1)
 
         # 边缘平滑处理
         if r > 0.85:
-            edge_offset = random.uniform(-0.5, 0.5)
+            edge_offset = rng.uniform(-0.5, 0.5)
             p_x += edge_offset * math.cos(t)
             p_y += edge_offset * math.sin(t)
 
         # 颜色渐变（明亮的中心，粉色的边缘）+ 金色闪光点
-        sparkle_chance = random.random()
+        sparkle_chance = rng.random()
 
         is_snow_heart = False
 
         if sparkle_chance < 0.02:  # 金色大亮点
             color = Config.GOLD
-            size = random.uniform(2.5, 3.8)
+            size = rng.uniform(2.5, 3.8)
         elif sparkle_chance < 0.03:  # 金色小亮点
             color = Config.LIGHT_GOLD
-            size = random.uniform(1.8, 2.5)
+            size = rng.uniform(1.8, 2.5)
         elif r < 0.35:
             color = (255, 230, 230)  # 白色中心
-            size = random.uniform(1.0, 1.6)
+            size = rng.uniform(1.0, 1.6)
             is_snow_heart = True
         else:
             color = (255, 80, 110)  # 粉色边缘
             # 白色亮点
-            if random.random() < 0.25:
+            if rng.random() < 0.25:
                 color = Config.WHITE  # 随机亮点
-                size = random.uniform(0.6, 1.2)  # 更小的白色粒子
+                size = rng.uniform(0.6, 1.2)  # 更小的白色粒子
                 is_snow_heart = True
             else:
-                size = random.uniform(1.0, 1.6)
+                size = rng.uniform(1.0, 1.6)
 
-        particles.append(Particle(p_x, p_y, p_z, color, size, is_snow=is_snow_heart))
+        particles.append(Particle(p_x, p_y, p_z, color, size, is_snow=is_snow_heart, rng=rng))
 
     return particles
 
+# ============================================================================
+# 向量化粒子生成器（NumPy）
+# ============================================================================
+
+# 粒子记录格式：向量化生成器的输出与磁盘缓存共用（每个粒子 32 字节）
+PARTICLE_FIELDS = ("x", "y", "z", "size_base", "flicker_speed", "flicker_offset", "fall_speed",
+                   "r", "g", "b", "is_snow")
+PARTICLE_DTYPE = [
+    ("x", "<f4"), ("y", "<f4"), ("z", "<f4"),
+    ("size_base", "<f4"), ("flicker_speed", "<f4"), ("flicker_offset", "<f4"), ("fall_speed", "<f4"),
+    ("r", "u1"), ("g", "u1"), ("b", "u1"), ("is_snow", "u1"),
+]
+
+
+def _make_records(rng, x, y, z, colors, size, is_snow, fall_speed=0.0):
+    """组装结构化粒子数组，并按 Particle.__init__ 的分布生成闪烁参数"""
+    records = np.zeros(len(x), dtype=PARTICLE_DTYPE)
+    records["x"], records["y"], records["z"] = x, y, z
+    records["r"], records["g"], records["b"] = colors[:, 0], colors[:, 1], colors[:, 2]
+    records["size_base"] = size
+    records["is_snow"] = is_snow
+    records["flicker_speed"] = rng.uniform(2.0, 5.0, len(x))
+    records["flicker_offset"] = rng.uniform(0, math.pi * 2, len(x))
+    records["fall_speed"] = fall_speed
+    return records
+
+
+def _fill_uniform(rng, out, mask, low: float, high: float) -> None:
+    """只为掩码选中的元素抽取均匀分布随机数，避免为整个数组抽样"""
+    out[mask] = rng.uniform(low, high, np.count_nonzero(mask))
+
+
+def _tree_radius_profile(h_dist):
+    """树的分层半径轮廓（与 generate_ragged_tree 相同）"""
+    cone_boundary_r = TREE_BASE_RADIUS * h_dist
+    wave_factor = np.abs(np.sin(h_dist * math.pi * 9))
+    return cone_boundary_r * (0.35 + 0.65 * wave_factor)
+
+
+def _branch_strength(theta):
+    """树枝方向的延伸强度，不在分支容差范围内时为 0"""
+    num_branches = 8
+    branch_angle = np.mod(theta, math.pi * 2 / num_branches)
+    branch_proximity = np.abs(branch_angle - math.pi / num_branches)
+    return np.where(branch_proximity < 0.4, 1.0 - branch_proximity / 0.4, 0.0)
+
+
+def generate_ragged_tree_arrays(num_particles: int, rng):
+    """generate_ragged_tree 的向量化版本：批量抽样，用掩码表达分支逻辑"""
+    body = tree_body_arrays(rng, 0, num_particles, num_particles)
+    shell = tree_shell_arrays(rng, int(num_particles * 0.4))
+    return np.concatenate([body, shell])
+
+
+def tree_body_arrays(rng, start: int, count: int, total: int):
+    """
+    生成树主体中第 [start, start+count) 个粒子（共 total 个），可分块独立生成
+
+    Args:
+        rng: NumPy 随机数生成器
+        start: 起始粒子序号（决定高度分布）
+        count: 本块粒子数量
+        total: 树主体粒子总数
+    """
+    tree_height = TREE_HEIGHT
+    n = count
+    white = np.array(Config.WHITE, dtype=np.float64)
+
+    # 主体：垂直分布、分层半径、径向扰动
+    h_dist = np.power(np.arange(start, start + count) / total, 0.75)
+    y = -tree_height * 0.58 + h_dist * tree_height + rng.uniform(-4, 4, n)
+    r_scatter = np.power(rng.random(n), 0.15)
+    turbulence_scale = np.where(rng.random(n) < 0.08, 1.6, rng.uniform(0.9, 1.35, n))
+    r = _tree_radius_profile(h_dist) * r_scatter * turbulence_scale
+
+    top = h_dist < 0.06
+    r = np.where(top, rng.uniform(0, 8 * (1 - h_dist)), r)
+
+    theta = rng.uniform(0, math.pi * 2, n) + h_dist * math.pi * 12
+    strength = _branch_strength(theta)
+    r += strength * rng.uniform(0, 25, n) * (1 - h_dist * 0.3)
+    y += np.where((strength > 0) & (rng.random(n) < 0.3), rng.uniform(-8, 8, n) * strength, 0.0)
+
+    x = r * np.cos(theta)
+    z = r * np.sin(theta)
+
+    # 颜色与类型分层：顶部雪花 / 内部深色 / 中间过渡 / 外层亮色
+    inner = ~top & (r_scatter < 0.45)
+    mid = ~top & (r_scatter >= 0.45) & (r_scatter < 0.72)
+    outer = ~top & (r_scatter >= 0.72)
+    roll_a = rng.random(n)
+    roll_b = rng.random(n)
+
+    colors = np.empty((n, 3), dtype=np.float64)
+    size = rng.uniform(0.6, 2.0, n)
+    is_snow = np.zeros(n, dtype=bool)
+    is_gold = np.zeros(n, dtype=bool)
+
+    colors[top] = white
+    is_snow |= top
+    _fill_uniform(rng, size, top, 0.5, 1.2)
+
+    inner_palette = np.array(Config.TREE_COLORS_INNER, dtype=np.float64)
+    inner_colors = inner_palette[rng.integers(len(inner_palette), size=np.count_nonzero(inner))]
+    inner_scatter = r_scatter[inner]
+    darken = np.where(inner_scatter < 0.25, 0.75, np.where(inner_scatter < 0.35, 0.85, 1.0))
+    colors[inner] = np.floor(inner_colors * darken[:, None])
+    inner_gold = inner & (roll_a < 0.015)
+    inner_snow = inner & ~inner_gold & (roll_b < 0.03)
+    colors[inner_gold] = Config.LIGHT_GOLD
+    colors[inner_snow] = white
+    _fill_uniform(rng, size, inner_snow, 0.5, 1.0)
+
+    mid_palette = np.array(Config.TREE_COLORS_MID, dtype=np.float64)
+    colors[mid] = mid_palette[rng.integers(len(mid_palette), size=np.count_nonzero(mid))]
+    mid_gold = mid & (roll_a < 0.03)
+    mid_snow = mid & ~mid_gold & (roll_b < 0.06)
+    gold_choice = rng.random(np.count_nonzero(mid_gold)) < 0.6
+    colors[mid_gold] = np.where(gold_choice[:, None], Config.GOLD, Config.LIGHT_GOLD)
+    colors[mid_snow] = white
+    _fill_uniform(rng, size, mid_snow, 0.5, 1.2)
+
+    outer_palette = np.array(Config.TREE_COLORS_OUTER, dtype=np.float64)
+    outer_snow = outer & (roll_a < 0.58)
+    outer_gold = outer & ~outer_snow & (roll_b < 0.04)
+    outer_color = outer & ~outer_snow & ~outer_gold
+    outer_colors = outer_palette[rng.integers(len(outer_palette), size=np.count_nonzero(outer_color))]
+    brighten = np.where(r_scatter[outer_color] > 0.88, 1.12, 1.0)
+    colors[outer_color] = np.minimum(255, np.floor(outer_colors * brighten[:, None]))
+    colors[outer_snow] = white
+    colors[outer_gold] = Config.GOLD
+    _fill_uniform(rng, size, outer_snow, 0.4, 1.0)
+
+    is_snow |= inner_snow | mid_snow | outer_snow
+    is_gold |= inner_gold | mid_gold | outer_gold
+
+    # 最外层突出的雪花效果（与原逻辑一致）
+    protruding = turbulence_scale > 2.8
+    protruding_snow = protruding & (rng.random(n) < 0.88)
+    protruding_gold = protruding & ~protruding_snow
+    colors[protruding_snow] = white
+    colors[protruding_gold] = Config.GOLD
+    _fill_uniform(rng, size, protruding_snow, 0.5, 1.1)
+    _fill_uniform(rng, size, protruding_gold, 1.2, 2.5)
+    is_snow = (is_snow & ~protruding_gold) | protruding_snow
+    is_gold = (is_gold & ~protruding_snow) | protruding_gold
+
+    # 根据粒子类型调整大小：金色偏大，其他彩色粒子按亮度分档
+    big_roll = rng.random(n)
+    _fill_uniform(rng, size, is_gold & (big_roll < 0.3), 2.8, 4.2)
+    _fill_uniform(rng, size, is_gold & (big_roll >= 0.3), 1.8, 3.0)
+    colored = ~is_gold & ~is_snow
+    brightness = colors @ np.array([0.299, 0.587, 0.114])
+    bright = colored & (brightness > 180)
+    _fill_uniform(rng, size, bright & (big_roll < 0.2), 2.5, 4.0)
+    _fill_uniform(rng, size, bright & (big_roll >= 0.2), 1.2, 2.5)
+    _fill_uniform(rng, size, colored & (brightness > 120) & (brightness <= 180), 0.8, 2.2)
+    _fill_uniform(rng, size, colored & (brightness <= 120), 0.6, 1.8)
+
+    return _make_records(rng, x, y, z, colors.astype(np.uint8), size, is_snow)
+
+
+def tree_shell_arrays(rng, count: int):
+    """生成树最外层的白色雪花壳（树主体粒子数的40%），可分块独立生成"""
+    tree_height = TREE_HEIGHT
+    m = count
+    h_dist = np.power(rng.random(m), 0.25)
+    y = -tree_height * 0.58 + h_dist * tree_height + rng.uniform(-6, 6, m)
+    r = _tree_radius_profile(h_dist) * rng.uniform(0.95, 1.15, m)
+    # 与 random.uniform 相同的线性插值（上下界可以颠倒）
+    r = np.where(h_dist < 0.06, 7 + (12 * (1 - h_dist) - 7) * rng.random(m), r)
+    theta = rng.uniform(0, math.pi * 2, m) + h_dist * math.pi * 12
+    strength = _branch_strength(theta)
+    r += strength * rng.uniform(0, 30, m) * (1 - h_dist * 0.3)
+    y += np.where((strength > 0) & (rng.random(m) < 0.4), rng.uniform(-10, 10, m) * strength, 0.0)
+
+    shell_colors = np.broadcast_to(np.array(Config.WHITE, dtype=np.uint8), (m, 3))
+    return _make_records(rng, r * np.cos(theta), y, r * np.sin(theta), shell_colors,
+                         rng.uniform(0.8, 2.0, m), True)
+
+
+def generate_bright_white_ground_arrays(num_particles: int, rng):
+    """generate_bright_white_ground 的向量化版本"""
+    n = num_particles
+    max_dist = GROUND_RADIUS
+    angle = rng.uniform(0, math.pi * 2, n)
+    dist = np.power(rng.random(n), 0.6) * max_dist
+
+    # 波纹亮度（int() 向零截断）
+    brightness_offset = np.trunc(np.sin(dist / 60.0 - 2.0) * 12)
+    base = np.array(Config.GROUND_BASE_COLOR, dtype=np.float64) + np.array([0, 0, 5])
+    colors = np.clip(base + brightness_offset[:, None], 0, 255).astype(np.uint8)
+
+    size = np.where(dist > max_dist * 0.8, rng.uniform(1.0, 2.0, n), rng.uniform(0.5, 1.5, n))
+    return _make_records(rng, dist * np.cos(angle), np.full(n, float(GROUND_Y)), dist * np.sin(angle),
+                         colors, size, False)
+
+
+def generate_snow_arrays(num_particles: int, rng):
+    """generate_snow 的向量化版本"""
+    n = num_particles
+    white = np.broadcast_to(np.array(Config.WHITE, dtype=np.uint8), (n, 3))
+    return _make_records(rng, rng.uniform(-500, 1200, n), rng.uniform(-500, 500, n),
+                         rng.uniform(-500, 1200, n), white, rng.uniform(0.8, 1.8, n), False,
+                         fall_speed=rng.uniform(0.2, 1.8, n))
+
+
+def generate_pillow_heart_arrays(num_particles: int, rng):
+    """generate_pillow_heart 的向量化版本"""
+    n = num_particles
+    t = rng.uniform(0, math.pi * 2, n)
+    x0 = 16 * np.sin(t) ** 3
+    y0 = 13 * np.cos(t) - 5 * np.cos(2 * t) - 2 * np.cos(3 * t) - np.cos(4 * t)
+
+    r = np.power(rng.random(n), 0.2)
+    scale = 3.0 * r
+    p_x = x0 * scale
+    p_y = -y0 * scale - 465
+
+    z_thickness = 16.0 * np.power(np.cos(r * math.pi / 2), 0.7)
+    z_side = np.where(rng.random(n) > 0.5, 1.0, -1.0)
+    p_z = z_thickness * z_side * rng.uniform(0.9, 1.1, n)
+
+    # 边缘平滑处理
+    edge_offset = np.zeros(n)
+    _fill_uniform(rng, edge_offset, r > 0.85, -0.5, 0.5)
+    p_x += edge_offset * np.cos(t)
+    p_y += edge_offset * np.sin(t)
+
+    # 颜色分层：金色大亮点 / 金色小亮点 / 白色中心 / 粉色边缘（含白色亮点）
+    sparkle_chance = rng.random(n)
+    big_gold = sparkle_chance < 0.02
+    small_gold = ~big_gold & (sparkle_chance < 0.03)
+    center = ~big_gold & ~small_gold & (r < 0.35)
+    edge = ~big_gold & ~small_gold & ~center
+    edge_white = edge & (rng.random(n) < 0.25)
+
+    colors = np.empty((n, 3), dtype=np.uint8)
+    colors[big_gold] = Config.GOLD
+    colors[small_gold] = Config.LIGHT_GOLD
+    colors[center] = (255, 230, 230)
+    colors[edge] = (255, 80, 110)
+    colors[edge_white] = Config.WHITE
+
+    size = rng.uniform(1.0, 1.6, n)
+    _fill_uniform(rng, size, big_gold, 2.5, 3.8)
+    _fill_uniform(rng, size, small_gold, 1.8, 2.5)
+    _fill_uniform(rng, size, edge_white, 0.6, 1.2)
+
+    return _make_records(rng, p_x, p_y, p_z, colors, size, center | edge_white)
+
+
+# ============================================================================
+# 场景缓存
+# ============================================================================
+
+# 生成器逻辑变化时递增，使旧缓存失效
+SCENE_CACHE_VERSION = 3
+# 打包时预先烘焙的场景目录（见 build.spec）
+BAKED_SCENE_DIR = "scene_cache"
+
+SCENE_LAYERS = ("tree", "heart", "ground", "snow")
+LAYER_GENERATORS: Dict[str, Tuple[Callable[[int, random.Random], List[Particle]], str]] = {
+    "tree": (generate_ragged_tree, "TREE_PARTICLES"),
+    "heart": (generate_pillow_heart, "HEART_PARTICLES"),
+    "ground": (generate_bright_white_ground, "GROUND_PARTICLES"),
+    "snow": (generate_snow, "SNOW_PARTICLES"),
+}
+# 向量化生成的组成部分：部分名称 -> 生成函数 (rng, 起始序号, 数量, 总数)
+PART_GENERATORS = {
+    "tree_body": tree_body_arrays,
+    "tree_shell": lambda rng, start, count, total: tree_shell_arrays(rng, count),
+    "heart": lambda rng, start, count, total: generate_pillow_heart_arrays(count, rng),
+    "ground": lambda rng, start, count, total: generate_bright_white_ground_arrays(count, rng),
+    "snow": lambda rng, start, count, total: generate_snow_arrays(count, rng),
+}
+# 各粒子层生成时依赖的配置项（决定缓存键）
+LAYER_CONFIG_KEYS: Dict[str, Tuple[str, ...]] = {
+    "tree": ("TREE_PARTICLES", "TREE_COLORS_INNER", "TREE_COLORS_MID", "TREE_COLORS_OUTER",
+             "WHITE", "GOLD", "LIGHT_GOLD"),
+    "heart": ("HEART_PARTICLES", "WHITE", "GOLD", "LIGHT_GOLD"),
+    "ground": ("GROUND_PARTICLES", "GROUND_BASE_COLOR"),
+    "snow": ("SNOW_PARTICLES", "WHITE"),
+}
+
+# 缓存命中统计（命中, 未命中）
+scene_cache_stats = [0, 0]
+
+
+def use_vector_generators() -> bool:
+    """是否使用向量化生成器"""
+    return np is not None and Config.VECTORIZED_GENERATORS
+
+
+def scene_cache_key(layer: str) -> str:
+    """根据生成参数和随机种子计算粒子层的缓存键"""
+    params = {
+        "version": SCENE_CACHE_VERSION,
+        "seed": Config.SCENE_SEED,
+        "layer": layer,
+        "generator": "numpy" if use_vector_generators() else "python",
+        "chunk": Config.GENERATION_CHUNK_SIZE if use_vector_generators() else None,
+        "config": {key: getattr(Config, key) for key in LAYER_CONFIG_KEYS[layer]},
+    }
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def get_user_cache_dir() -> str:
+    """返回用户级缓存目录"""
+    if sys.platform == 'win32':
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(base, "christmas_tree")
+
+
+def get_scene_cache_dir() -> str:
+    """返回用户级场景缓存目录"""
+    return os.path.join(get_user_cache_dir(), "scenes")
+
+
+def particles_to_records(particles: List[Particle], current_position: bool = False):
+    """将粒子列表打包为结构化数组（默认使用旋转前的原始位置）"""
+    records = np.zeros(len(particles), dtype=PARTICLE_DTYPE)
+    for field in ("x", "y", "z"):
+        attribute = field if current_position else "orig_" + field
+        records[field] = [getattr(p, attribute) for p in particles]
+    for field in ("size_base", "flicker_speed", "flicker_offset", "fall_speed", "is_snow"):
+        records[field] = [getattr(p, field) for p in particles]
+    colors = np.array([p.color for p in particles], dtype=np.uint8).reshape(-1, 3)
+    records["r"], records["g"], records["b"] = colors[:, 0], colors[:, 1], colors[:, 2]
+    return records
+
+
+def particles_from_records(records) -> List[Particle]:
+    """从结构化数组（可以是内存映射）重建粒子列表，不消耗随机数"""
+    columns = [records[field].tolist() for field in PARTICLE_FIELDS]
+    color_cache: Dict[Tuple[int, int, int], Tuple[int, int, int]] = {}
+    particles = []
+    new_particle = Particle.__new__
+    for x, y, z, size_base, flicker_speed, flicker_offset, fall_speed, r, g, b, is_snow in zip(*columns):
+        p = new_particle(Particle)
+        p.x = p.orig_x = x
+        p.y = p.orig_y = y
+        p.z = p.orig_z = z
+        p.color = color_cache.setdefault((r, g, b), (r, g, b))  # 相同颜色共享元组
+        p.size_base = size_base
+        p.is_snow = bool(is_snow)
+        p.flicker_speed = flicker_speed
+        p.flicker_offset = flicker_offset
+        p.fall_speed = fall_speed
+        particles.append(p)
+    return particles
+
+
+def layer_seed(layer: str) -> Optional[int]:
+    """由 SCENE_SEED 派生的粒子层种子（各层互不影响）"""
+    if Config.SCENE_SEED is None:
+        return None
+    digest = hashlib.sha256(f"{Config.SCENE_SEED}:{layer}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def generate_layer(layer: str) -> List[Particle]:
+    """
+    生成单个粒子层（设置了 SCENE_SEED 时每层独立播种，结果可重复）
+
+    逐粒子生成器使用本层私有的 random.Random，不读写全局 random：热重载时在后台线程中生成，
+    主线程和流水线工作线程仍在用全局 random 更新雪花（回放时它还带着运行时种子）。
+    """
+    if use_vector_generators():
+        return particles_from_records(generate_layer_records(layer))
+    generator, count_key = LAYER_GENERATORS[layer]
+    return generator(getattr(Config, count_key), random.Random(layer_seed(layer)))
+
+
+def generate_layer_records(layer: str, base_seed: Optional[int] = None):
+    """在当前进程中逐块生成单个粒子层的结构化数组（需要 NumPy）"""
+    if not use_vector_generators():
+        return particles_to_records(generate_layer(layer))
+    if base_seed is None:
+        base_seed = _base_seed(layer)
+    total, jobs = layer_chunk_jobs(layer)
+    records = np.empty(total, dtype=PARTICLE_DTYPE)
+    for job in jobs:
+        offset, count = job[6], job[4]
+        records[offset:offset + count] = _generate_chunk(base_seed, job)
+    return records
+
+
+def _save_layer(path: str, records) -> None:
+    """原子写入粒子层缓存文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as cache_file:
+        np.save(cache_file, records)
+    os.replace(temp_path, path)
+
+
+def _load_cached_records(layer: str):
+    """从烘焙场景或用户缓存内存映射加载粒子层，未命中时返回 None"""
+    file_name = f"{layer}-{scene_cache_key(layer)}.npy"
+    cache_dir_path = os.path.join(get_scene_cache_dir(), file_name)
+    for path in (get_resource_path(os.path.join(BAKED_SCENE_DIR, file_name)), cache_dir_path):
+        if not os.path.exists(path):
+            continue
+        try:
+            records = np.load(path, mmap_mode='r')
+            scene_cache_stats[0] += 1
+            return records
+        except (OSError, ValueError) as error:
+            print(f"Failed to load scene cache '{path}': {error}")
+    return None
+
+
+def load_layer_records(layers: Sequence[str]) -> Dict[str, object]:
+    """
+    加载指定粒子层的结构化数组：优先使用缓存，未命中的层一起生成（可并行）并写入缓存
+
+    写入缓存后改为内存映射重新打开，生成时占用的内存随即释放，
+    大场景模式下常驻的粒子数据只是可回收的文件页。
+    """
+    use_cache = Config.SCENE_SEED is not None and Config.SCENE_CACHE
+    records: Dict[str, object] = {}
+    missing = []
+    for layer in layers:
+        cached = None
+        if use_cache:
+            with span(f"load_{layer}"):
+                cached = _load_cached_records(layer)
+        if cached is None:
+            missing.append(layer)
+        else:
+            records[layer] = cached
+
+    if missing:
+        with span("generate_scene"):
+            records.update(generate_scene_records(missing))
+        if use_cache:
+            for layer in missing:
+                scene_cache_stats[1] += 1
+                cache_path = os.path.join(get_scene_cache_dir(), f"{layer}-{scene_cache_key(layer)}.npy")
+                try:
+                    _save_layer(cache_path, records[layer])
+                    records[layer] = np.load(cache_path, mmap_mode='r')
+                except OSError as error:
+                    print(f"Failed to write scene cache '{cache_path}': {error}")
+    return records
+
+
+def load_layers(layers: Sequence[str]) -> Dict[str, List[Particle]]:
+    """加载指定粒子层的粒子列表"""
+    if np is None:
+        result = {}
+        for layer in layers:
+            with span(f"generate_{layer}"):
+                result[layer] = generate_layer(layer)
+        return result
+
+    records = load_layer_records(layers)
+
+    # 生成结果与缓存加载走同一转换路径，首次运行和之后的运行渲染结果一致
+    result = {}
+    for layer in layers:
+        with span(f"build_{layer}"):
+            result[layer] = particles_from_records(records[layer])
+    return result
+
+
+def load_scene() -> Dict[str, List[Particle]]:
+    """加载全部粒子层"""
+    return load_layers(SCENE_LAYERS)
+
+
+def generate_forest_instances(count: int):
+    """
+    在地面圆环远离相机的一半上随机放置森林实例（设置了 SCENE_SEED 时结果可重复）
+
+    实例不随场景公转，只放在中心树两侧和后方，不会遮挡中心树或贴近相机。
+    """
+    rng = np.random.default_rng(_base_seed("forest"))
+    inner, outer = Config.FOREST_RADIUS
+    # 按面积均匀分布
+    dist = np.sqrt(rng.uniform(inner * inner, outer * outer, count))
+    angle = rng.uniform(0, math.pi, count)
+    instances = np.empty(count, dtype=INSTANCE_DTYPE)
+    instances["x"] = dist * np.cos(angle)
+    instances["z"] = dist * np.sin(angle)
+    instances["scale"] = rng.uniform(*Config.FOREST_SCALE, count)
+    instances["phase"] = rng.uniform(0, math.pi * 2, count)
+    return instances
+
+
+def bake_scene(directory: str) -> None:
+    """将当前配置的场景烘焙到指定目录（供打包时内置）"""
+    if np is None:
+        raise SystemExit("Baking the scene requires NumPy")
+    if Config.SCENE_SEED is None:
+        raise SystemExit("Baking the scene requires Config.SCENE_SEED")
+    generated = generate_scene_records(SCENE_LAYERS)
+    for layer in SCENE_LAYERS:
+        path = os.path.join(directory, f"{layer}-{scene_cache_key(layer)}.npy")
+        _save_layer(path, generated[layer])
+        print(f"Baked {layer}: {len(generated[layer])} particles -> {path}")
+
+
+# ============================================================================
+# 并行场景生成
+# ============================================================================
+
+def layer_parts(layer: str) -> List[Tuple[str, int]]:
+    """粒子层的组成部分及各部分粒子数量"""
+    _, count_key = LAYER_GENERATORS[layer]
+    count = getattr(Config, count_key)
+    if layer == "tree":
+        return [("tree_body", count), ("tree_shell", int(count * 0.4))]
+    return [(layer, count)]
+
+
+def layer_chunk_jobs(layer: str) -> Tuple[int, List[tuple]]:
+    """
+    将粒子层划分为固定大小的生成块
+
+    块的划分只取决于粒子数量和 GENERATION_CHUNK_SIZE，与进程数无关，
+    因此同一种子在任意进程数下生成的结果完全一致。
+
+    Returns:
+        (粒子总数, [(部分序号, 部分名称, 块序号, 起始序号, 数量, 部分总数, 输出偏移), ...])
+    """
+    jobs = []
+    offset = 0
+    chunk_size = max(1, Config.GENERATION_CHUNK_SIZE)
+    for part_index, (part, total) in enumerate(layer_parts(layer)):
+        for chunk_index, start in enumerate(range(0, total, chunk_size)):
+            count = min(chunk_size, total - start)
+            jobs.append((part_index, part, chunk_index, start, count, total, offset))
+            offset += count
+    return offset, jobs
+
+
+def _base_seed(layer: str) -> int:
+    """粒子层的基础种子；未设置 SCENE_SEED 时随机选取"""
+    seed = layer_seed(layer)
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (1 << 63))
+    return seed
+
+
+def _generate_chunk(base_seed: int, job: tuple):
+    """用 (基础种子, 部分序号, 块序号) 独立播种并生成一个块"""
+    part_index, part, chunk_index, start, count, total, _ = job
+    rng = np.random.default_rng([base_seed, part_index, chunk_index])
+    return PART_GENERATORS[part](rng, start, count, total)
+
+
+def _generate_chunk_worker(shm_name: str, total: int, base_seed: int, job: tuple,
+                           config_values: Dict[str, object]) -> int:
+    """进程池任务：生成一个块并直接写入共享内存中的目标位置"""
+    # spawn 启动的子进程不会继承运行时修改过的配置
+    for key, value in config_values.items():
+        setattr(Config, key, value)
+    # 进程池子进程与主进程共用同一个资源跟踪器，共享内存由主进程统一释放
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        output = np.ndarray((total,), dtype=PARTICLE_DTYPE, buffer=shm.buf)
+        offset, count = job[6], job[4]
+        output[offset:offset + count] = _generate_chunk(base_seed, job)
+        del output
+    finally:
+        shm.close()
+    return job[4]
+
+
+def generate_scene_records(layers: Sequence[str]) -> Dict[str, object]:
+    """
+    生成多个粒子层的结构化数组
+
+    粒子总数较大时，所有层的生成块一起提交到进程池并发执行，
+    结果写入共享内存而不是通过 pickle 传回 Particle 列表。
+    """
+    if not use_vector_generators():
+        return {layer: generate_layer_records(layer) for layer in layers}
+
+    plans = {layer: (layer_chunk_jobs(layer), _base_seed(layer)) for layer in layers}
+    total_particles = sum(total for (total, _), _ in plans.values())
+    workers = Config.GENERATION_WORKERS or os.cpu_count() or 1
+    if workers <= 1 or total_particles < Config.PARALLEL_GENERATION_MIN_PARTICLES:
+        return {layer: generate_layer_records(layer, base_seed)
+                for layer, (_, base_seed) in plans.items()}
+
+    config_values = {key: getattr(Config, key)
+                     for keys in LAYER_CONFIG_KEYS.values() for key in keys}
+    config_values["GENERATION_CHUNK_SIZE"] = Config.GENERATION_CHUNK_SIZE
+    itemsize = np.dtype(PARTICLE_DTYPE).itemsize
+    buffers: Dict[str, shared_memory.SharedMemory] = {}
+    try:
+        tasks = []
+        for layer, ((total, jobs), base_seed) in plans.items():
+            buffers[layer] = shared_memory.SharedMemory(create=True, size=max(1, total * itemsize))
+            tasks.extend((buffers[layer].name, total, base_seed, job) for job in jobs)
+        # 大块优先提交，减少尾部等待
+        tasks.sort(key=lambda task: task[3][4], reverse=True)
+
+        # 显式使用 spawn：此时显示已经初始化，热重载时还在后台线程中，fork 多线程进程可能死锁
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=get_context("spawn")) as pool:
+            futures = [pool.submit(_generate_chunk_worker, *task, config_values) for task in tasks]
+            for future in futures:
+                future.result()
+
+        results = {}
+        for layer, ((total, _), _) in plans.items():
+            shared = np.ndarray((total,), dtype=PARTICLE_DTYPE, buffer=buffers[layer].buf)
+            results[layer] = shared.copy()
+            del shared
+        print(f"Generated {total_particles} particles with {workers} worker processes")
+        return results
+    except (OSError, RuntimeError) as error:
+        # 进程池不可用（例如受限环境），退回单进程生成，结果相同
+        print(f"Parallel generation failed, falling back to a single process: {error}")
+        return {layer: generate_layer_records(layer, base_seed)
+                for layer, (_, base_seed) in plans.items()}
+    finally:
+        for shm in buffers.values():
+            shm.close()
+            shm.unlink()
+
+
 # ============================================================================
 # 音量控制UI
 # ============================================================================
@@ -687,6 +1664,15 @@ class VolumeControl:
         self.color_bg = (15, 18, 25)
         self.color_border = (205, 205, 205)
 
+        # 外观缓存：视觉状态不变时每帧只做一次blit
+        self.container_width = self.width + self.icon_size + 30
+        self.origin = (self.icon_x - 15, self.y)
+        self._cached_key: Optional[tuple] = None
+        self._cached_surface: Optional[pygame.Surface] = None
+        self._tint_cache: Dict[tuple, pygame.Surface] = {}
+        self.cache_stats = [0, 0]       # 外观缓存（命中, 未命中）
+        self.tint_cache_stats = [0, 0]  # 图标着色缓存（命中, 未命中）
+
     def _get_knob_x(self) -> int:
         """计算滑块旋钮的X坐标"""
         track_start = self.x + self.track_left_padding
@@ -779,21 +1765,51 @@ class VolumeControl:
 
         self._apply_volume()
 
+    @property
+    def effective_volume(self) -> float:
+        """实际播放音量（静音时为 0）"""
+        return 0.0 if self.is_muted else self.volume
+
     def _apply_volume(self) -> None:
         """应用音量设置到pygame混音器"""
-        actual_volume = 0.0 if self.is_muted else self.volume
-        pygame.mixer.music.set_volume(actual_volume)
+        pygame.mixer.music.set_volume(self.effective_volume)
+
+    def _render_key(self) -> tuple:
+        """决定控件外观的视觉状态（音量按轨道像素量化）"""
+        return (self._get_icon_state(), self.is_muted, self.is_hovering, self.is_dragging,
+                int(self.volume * self.track_width))
+
+    def overlay(self) -> Tuple[pygame.Surface, Tuple[int, int], int]:
+        """本帧要绘制的 (表面, 位置, 混合标志)（视觉状态变化时才重新渲染）"""
+        key = self._render_key()
+        if key == self._cached_key:
+            self.cache_stats[0] += 1
+        else:
+            self.cache_stats[1] += 1
+            self._cached_surface = self._render()
+            self._cached_key = key
+        flags = pygame.BLEND_PREMULTIPLIED if PREMULTIPLIED_BLEND else 0
+        return self._cached_surface, self.origin, flags
 
     def draw(self, surface: pygame.Surface) -> None:
         """绘制音量控制UI"""
-        container_width = self.width + self.icon_size + 30
-        container_surface = pygame.Surface((container_width, self.height), pygame.SRCALPHA)
-        container_rect = pygame.Rect(0, 0, container_width, self.height)
+        image, origin, flags = self.overlay()
+        surface.blit(image, origin, special_flags=flags)
+
+    def _render(self) -> pygame.Surface:
+        """把容器、图标、轨道和旋钮合成到一张透明表面（坐标相对 self.origin）"""
+        origin_x, origin_y = self.origin
+        widget = pygame.Surface((self.container_width, self.height), pygame.SRCALPHA)
+
+        container_surface = pygame.Surface((self.container_width, self.height), pygame.SRCALPHA)
+        container_rect = pygame.Rect(0, 0, self.container_width, self.height)
         pygame.draw.rect(container_surface, (*self.color_bg, 100), container_rect, border_radius=12)
         pygame.draw.rect(container_surface, (*self.color_border, 110), container_rect, width=1, border_radius=12)
-        surface.blit(container_surface, (self.icon_x - 15, self.y))
+        blit_premultiplied(widget, container_surface, (0, 0))
 
-        self._draw_icon(surface)
+        png_icon = self._get_png_icon_surface()
+        if png_icon:
+            blit_premultiplied(widget, png_icon, (self.icon_x - origin_x, self.icon_y - origin_y))
 
         track_surface = pygame.Surface((self.track_width, self.slider_height + 10), pygame.SRCALPHA)
         track_top = (track_surface.get_height() - self.slider_height) // 2
@@ -807,7 +1823,9 @@ class VolumeControl:
             pygame.draw.rect(track_surface, (255, 255, 255, 70), fill_rect, border_radius=4)
 
         track_start = self.x + self.track_left_padding
-        surface.blit(track_surface, (track_start, self.slider_y - track_surface.get_height() // 2))
+        blit_premultiplied(widget, track_surface,
+                           (track_start - origin_x,
+                            self.slider_y - track_surface.get_height() // 2 - origin_y))
 
         knob_x = self._get_knob_x()
         knob_surface_size = self.knob_radius * 4
@@ -824,13 +1842,10 @@ class VolumeControl:
 
         pygame.draw.circle(knob_surface, knob_fill, knob_center, self.knob_radius)
         pygame.draw.circle(knob_surface, knob_border, knob_center, self.knob_radius, width=2)
-        surface.blit(knob_surface, (knob_x - knob_surface_size // 2, self.slider_y - knob_surface_size // 2))
-
-    def _draw_icon(self, surface: pygame.Surface) -> None:
-        """绘制音量/静音图标"""
-        png_icon = self._get_png_icon_surface()
-        if png_icon:
-            surface.blit(png_icon, (self.icon_x, self.icon_y))
+        blit_premultiplied(widget, knob_surface,
+                           (knob_x - knob_surface_size // 2 - origin_x,
+                            self.slider_y - knob_surface_size // 2 - origin_y))
+        return widget
 
     def _get_png_icon_surface(self) -> Optional[pygame.Surface]:
         """根据音量状态返回着色后的PNG图标"""
@@ -847,7 +1862,15 @@ class VolumeControl:
         if self.is_hovering or self.is_dragging:
             alpha = min(255, alpha + 40)
 
-        return self._tint_icon_surface(base_surface, tint_color, alpha)
+        key = (state, tint_color, alpha)
+        icon = self._tint_cache.get(key)
+        if icon is None:
+            self.tint_cache_stats[1] += 1
+            icon = self._tint_icon_surface(base_surface, tint_color, alpha)
+            self._tint_cache[key] = icon
+        else:
+            self.tint_cache_stats[0] += 1
+        return icon
 
     def _get_icon_state(self) -> str:
         """根据当前音量状态选择图标"""
@@ -911,17 +1934,44 @@ class MultiLineText:
             shadow_offset: 阴影偏移 (x, y)
             align: 文本对齐方式（"left"、"center"、"right"）
         """
-        self.lines = lines
         self.position_x = position_x
         self.line_spacing = line_spacing
         self.shadow_offset = shadow_offset
         self.align = align
 
-        # 预渲染所有文本表面
-        self.text_surfaces = []
-        self.shadow_surfaces = []
+        # 如果未指定则计算position_y
+        self.position_y = Config.VIRTUAL_HEIGHT // 2 if position_y is None else position_y
+
+        # 全部行及阴影预先合成到一张透明表面，每帧只做一次blit
+        self.lines: List[tuple] = []
+        self.surface: Optional[pygame.Surface] = None
+        self.origin = (0, 0)
+        self.set_lines(lines)
 
-        for line_data in lines:
+    def set_lines(self, lines: List[tuple]) -> None:
+        """设置文本内容，只有内容变化时才重新合成"""
+        if self.surface is not None and list(lines) == self.lines:
+            return
+        self.lines = list(lines)
+        self._composite()
+
+    def _layout(self, text_surf: pygame.Surface, current_y: int) -> Tuple[pygame.Rect, pygame.Rect]:
+        """根据对齐方式计算一行文本及其阴影的位置"""
+        centery = current_y + text_surf.get_height() // 2
+        dx, dy = self.shadow_offset
+        if self.align == "left":
+            text_rect = text_surf.get_rect(left=self.position_x, centery=centery)
+        elif self.align == "right":
+            text_rect = text_surf.get_rect(right=self.position_x, centery=centery)
+        else:  # center
+            text_rect = text_surf.get_rect(center=(self.position_x, centery))
+        return text_rect, text_rect.move(dx, dy)
+
+    def _composite(self) -> None:
+        """渲染所有行，并按原来的绘制顺序（先阴影后文本）合成到一张表面"""
+        text_surfaces = []
+        shadow_surfaces = []
+        for line_data in self.lines:
             if len(line_data) == 2:
                 # 旧格式兼容：(文本, 字号)
                 text, font_size = line_data
@@ -929,83 +1979,120 @@ class MultiLineText:
             else:
                 # 新格式：(文本, 字号, 颜色)
                 text, font_size, color = line_data
-            
+
             font = load_font(font_size)
-            text_surf = font.render(text, True, color)
-            shadow_surf = font.render(text, True, (0, 0, 0))
-            self.text_surfaces.append(text_surf)
-            self.shadow_surfaces.append(shadow_surf)
+            text_surfaces.append(font.render(text, True, color))
+            shadow_surfaces.append(font.render(text, True, (0, 0, 0)))
 
         # 计算总高度
-        self.total_height = sum(surf.get_height() for surf in self.text_surfaces)
-        self.total_height += line_spacing * (len(lines) - 1)
+        self.total_height = sum(surf.get_height() for surf in text_surfaces)
+        self.total_height += self.line_spacing * (len(self.lines) - 1)
 
-        # 如果未指定则计算position_y
-        self.position_y = Config.VIRTUAL_HEIGHT // 2 if position_y is None else position_y
-
-    def draw(self, surface: pygame.Surface) -> None:
-        """绘制所有文本行及其阴影"""
         # 从文本块顶部开始
         current_y = self.position_y - self.total_height // 2
-
-        for text_surf, shadow_surf in zip(self.text_surfaces, self.shadow_surfaces):
-            # 根据对齐方式定位
-            if self.align == "left":
-                text_rect = text_surf.get_rect(
-                    left=self.position_x,
-                    centery=current_y + text_surf.get_height() // 2
-                )
-                shadow_rect = shadow_surf.get_rect(
-                    left=self.position_x + self.shadow_offset[0],
-                    centery=current_y + text_surf.get_height() // 2 + self.shadow_offset[1]
-                )
-            elif self.align == "right":
-                text_rect = text_surf.get_rect(
-                    right=self.position_x,
-                    centery=current_y + text_surf.get_height() // 2
-                )
-                shadow_rect = shadow_surf.get_rect(
-                    right=self.position_x + self.shadow_offset[0],
-                    centery=current_y + text_surf.get_height() // 2 + self.shadow_offset[1]
-                )
-            else:  # center
-                text_rect = text_surf.get_rect(
-                    center=(self.position_x, current_y + text_surf.get_height() // 2)
-                )
-                shadow_rect = shadow_surf.get_rect(
-                    center=(self.position_x + self.shadow_offset[0],
-                           current_y + text_surf.get_height() // 2 + self.shadow_offset[1])
-                )
-
-            # 先绘制阴影，再绘制文本
-            surface.blit(shadow_surf, shadow_rect)
-            surface.blit(text_surf, text_rect)
-
+        placements = []
+        for text_surf, shadow_surf in zip(text_surfaces, shadow_surfaces):
+            text_rect, shadow_rect = self._layout(text_surf, current_y)
+            placements.append((shadow_surf, shadow_rect))
+            placements.append((text_surf, text_rect))
             # 移动到下一行
             current_y += text_surf.get_height() + self.line_spacing
 
+        if not placements:
+            self.surface = pygame.Surface((0, 0), pygame.SRCALPHA)
+            return
+        bounds = placements[0][1].unionall([rect for _, rect in placements[1:]])
+        self.origin = bounds.topleft
+        self.surface = pygame.Surface(bounds.size, pygame.SRCALPHA)
+        for surf, rect in placements:
+            blit_premultiplied(self.surface, surf, rect.move(-bounds.x, -bounds.y))
+
+    def overlay(self) -> Tuple[pygame.Surface, Tuple[int, int], int]:
+        """预先合成的文本块：(表面, 位置, 混合标志)"""
+        flags = pygame.BLEND_PREMULTIPLIED if PREMULTIPLIED_BLEND else 0
+        return self.surface, self.origin, flags
+
+    def draw(self, surface: pygame.Surface) -> None:
+        """绘制预先合成的文本块"""
+        image, origin, flags = self.overlay()
+        surface.blit(image, origin, special_flags=flags)
+
+
+class ScaledOverlay:
+    """
+    8 位渲染路径的界面浮层：浮层不参与 8 位场景，而是按屏幕缩放比例缩放后直接绘制到屏幕上，
+    源表面和缩放比例不变时复用上一次的缩放结果
+    """
+
+    def __init__(self):
+        self._source: Optional[pygame.Surface] = None
+        self._size: Optional[Tuple[int, int]] = None
+        self._scaled: Optional[pygame.Surface] = None
+
+    def draw(self, screen: pygame.Surface,
+             layer: Optional[Tuple[pygame.Surface, Tuple[int, int], int]]) -> None:
+        """把浮层 (表面, 虚拟坐标位置, 混合标志) 绘制到屏幕；layer 为 None 时不绘制"""
+        if layer is None:
+            return
+        source, origin, flags = layer
+        width, height = source.get_size()
+        if width == 0 or height == 0:
+            return
+        scale_x = scaled_width / Config.VIRTUAL_WIDTH
+        scale_y = scaled_height / Config.VIRTUAL_HEIGHT
+        size = (max(1, round(width * scale_x)), max(1, round(height * scale_y)))
+        if source is not self._source or size != self._size:
+            self._scaled = source if size == (width, height) else pygame.transform.smoothscale(source, size)
+            self._source, self._size = source, size
+        screen.blit(self._scaled, (offset_x + int(origin[0] * scale_x), offset_y + int(origin[1] * scale_y)),
+                    special_flags=flags)
+
 
 # ============================================================================
 # 主应用程序
 # ============================================================================
 
 class RotationController:
-    """管理鼠标交互旋转和自动旋转"""
+    """管理鼠标交互旋转、自动旋转，以及相机的俯仰和缩放"""
 
     def __init__(self):
         self.angle = 0.0
         self.velocity = 0.0
         self.is_dragging = False
         self.last_mouse_x = 0
+        self.last_mouse_y = 0
+        # 最近一次鼠标事件的坐标（由事件更新，回放时不依赖真实鼠标）
+        self.mouse_x = 0
+        self.mouse_y = 0
         self.last_interaction_time = 0
+        self.speed_scale = 1.0  # 自动旋转速度倍数（音乐联动）
+        self.pitch = 0.0
+        self.zoom = 1.0
+        self.target_zoom = 1.0
 
-    def handle_mouse_down(self, mouse_x: int, current_time: int) -> None:
+    @property
+    def camera(self) -> Camera:
+        """当前帧的相机状态"""
+        return Camera(self.angle, self.pitch, self.zoom)
+
+    def handle_mouse_down(self, mouse_pos: Tuple[int, int], current_time: int) -> None:
         """开始拖拽交互"""
         self.is_dragging = True
-        self.last_mouse_x = mouse_x
+        self.last_mouse_x, self.last_mouse_y = mouse_pos
+        self.mouse_x, self.mouse_y = mouse_pos
         self.last_interaction_time = current_time
         self.velocity = 0
 
+    def handle_mouse_motion(self, mouse_pos: Tuple[int, int]) -> None:
+        """记录鼠标移动后的坐标"""
+        self.mouse_x, self.mouse_y = mouse_pos
+
+    def handle_wheel(self, steps: int, current_time: int) -> None:
+        """滚轮缩放：向上滚动放大，每格 ZOOM_STEP 倍"""
+        low, high = Config.ZOOM_LIMITS
+        self.target_zoom = max(low, min(high, self.target_zoom * Config.ZOOM_STEP ** steps))
+        self.last_interaction_time = current_time
+
     def handle_mouse_up(self, current_time: int) -> None:
         """结束拖拽交互"""
         self.is_dragging = False
@@ -1013,11 +2100,15 @@ class RotationController:
 
     def update(self, current_time: int) -> None:
         """根据鼠标或自动旋转更新旋转状态"""
+        speed_scale = 1.0
         if self.is_dragging:
-            mouse_x, _ = pygame.mouse.get_pos()
-            delta_x = mouse_x - self.last_mouse_x
+            delta_x = self.mouse_x - self.last_mouse_x
             self.velocity = delta_x * Config.MOUSE_SENSITIVITY
-            self.last_mouse_x = mouse_x
+            # 向下拖拽抬高相机（俯视）
+            low, high = Config.PITCH_LIMITS
+            delta_y = self.mouse_y - self.last_mouse_y
+            self.pitch = max(low, min(high, self.pitch + delta_y * Config.PITCH_SENSITIVITY))
+            self.last_mouse_x, self.last_mouse_y = self.mouse_x, self.mouse_y
             self.last_interaction_time = current_time
         else:
             time_since_last_interact = current_time - self.last_interaction_time
@@ -1025,34 +2116,833 @@ class RotationController:
                 # 平滑恢复自动旋转
                 self.velocity = (self.velocity * (1 - Config.RESUME_SMOOTHNESS) +
                                 Config.AUTO_ROTATION_SPEED * Config.RESUME_SMOOTHNESS)
+                speed_scale = self.speed_scale
             else:
                 # 应用摩擦力
                 self.velocity *= Config.ROTATION_FRICTION
 
-        self.angle += self.velocity
+        self.angle += self.velocity * speed_scale
+        self.zoom += (self.target_zoom - self.zoom) * Config.ZOOM_SMOOTHNESS
+        if abs(self.target_zoom - self.zoom) < 1e-4:
+            self.zoom = self.target_zoom
+
+
+def apply_view(particles: List[Particle], view: View) -> None:
+    """
+    把视图矩阵套用到粒子的原始坐标（每帧对所有粒子一次性变换）
+
+    矩阵只在调用前计算一次，循环内只有乘加，没有逐粒子的三角函数。
+    """
+    m00, m01, m02, tx, m10, m11, m12, ty, m20, m21, m22, tz = view
+    if m01 == m10 == m12 == m21 == ty == 0.0 and m11 == 1.0:
+        # 没有俯仰：y 不变，运算量与只绕Y轴旋转相同
+        for p in particles:
+            x, z = p.orig_x, p.orig_z
+            p.x = m00 * x + m02 * z + tx
+            p.y = p.orig_y
+            p.z = m20 * x + m22 * z + tz
+        return
+    for p in particles:
+        x, y, z = p.orig_x, p.orig_y, p.orig_z
+        p.x = m00 * x + m01 * y + m02 * z + tx
+        p.y = m10 * x + m11 * y + m12 * z + ty
+        p.z = m20 * x + m21 * y + m22 * z + tz
+
+
+def update_snow(snow_particles: List[Particle], static_view: View = IDENTITY, steps: float = 1.0) -> None:
+    """
+    更新飘落的雪花位置（原始坐标），超出屏幕时重置，再套用静态视图
+
+    steps 为本帧相当于 Config.FPS 下的帧数（低帧率运行时大于 1，保持相同的下落速度）
+    """
+    for p in snow_particles:
+        p.orig_y += p.fall_speed * steps
+        if p.orig_y > 250:
+            p.orig_y = -500
+            p.orig_x = random.uniform(-500, 500)
+            p.orig_z = random.uniform(-500, 500)
+    apply_view(snow_particles, static_view)
 
 
-def update_snow(snow_particles: List[Particle]) -> None:
-    """更新飘落的雪花位置，超出屏幕时重置"""
-    for p in snow_particles:
-        p.y += p.fall_speed
-        if p.y > 250:
-            p.y = -500
-            p.x = random.uniform(-500, 500)
-            p.z = random.uniform(-500, 500)
+# ============================================================================
+# 点击火花
+# ============================================================================
+
+def tree_hit_point(virtual_pos: Tuple[int, int], camera: Camera = Camera()) -> Optional[Tuple[float, float, float]]:
+    """
+    把点击位置反投影到树上：落在树（含树顶心形）的锥形轮廓内时返回火花发射点（旋转后的场景坐标），否则返回 None
+
+    视线由相机的静态视图（俯仰、缩放）的逆变换转回旋转后的场景坐标。
+    先在树轴所在的平面（z = 0）上判断是否落在轮廓内，再沿视线移到锥面朝向相机的一侧，
+    使火花出现在树的表面而不是被前方的粒子挡住。
+    """
+    center_x = int(Config.VIRTUAL_WIDTH * 0.6)
+    center_y = Config.VIRTUAL_HEIGHT // 2 + Config.SCENE_OFFSET_Y
+    # 视图空间中相机位于 (0, 0, -VIEW_DISTANCE)，经过点击位置的视线方向为 direction
+    to_scene = inverse(camera.static_view(Config.VIEW_DISTANCE))
+    origin = transform_point(to_scene, (0.0, 0.0, -Config.VIEW_DISTANCE))
+    direction = ((virtual_pos[0] - center_x) / Config.FOV, (virtual_pos[1] - center_y) / Config.FOV, 1.0)
+    direction = tuple(a - b for a, b in zip(transform_point(to_scene, direction),
+                                            transform_point(to_scene, (0.0, 0.0, 0.0))))
+    if direction[2] <= 0:
+        return None
+    x = y = z = 0.0
+    for _ in range(3):
+        # 视线与场景中 z 平面的交点
+        t = (z - origin[2]) / direction[2]
+        x = origin[0] + direction[0] * t
+        y = origin[1] + direction[1] * t
+        h_dist = (y + TREE_HEIGHT * 0.58) / TREE_HEIGHT
+        if not -0.1 <= h_dist <= 1.0:
+            return None
+        radius = max(30.0, TREE_BASE_RADIUS * 1.1 * h_dist)
+        if abs(x) > radius:
+            return None
+        z = -math.sqrt(radius * radius - x * x)
+    return x, y, z
+
+
+def sync_sparkle_particles(pool: "SparklePool", particles: List[Particle],
+                           static_view: View = IDENTITY) -> List[Particle]:
+    """
+    把粒子池中存活的火花写入预先创建的 Particle 对象（与池槽位一一对应）并套用静态视图，
+    返回本帧需要绘制的对象，供参考渲染路径与其他粒子一起按深度排序
+    """
+    indices = np.flatnonzero(pool.alive)
+    visible = []
+    for index, (x, y, z, size, speed, offset, _, r, g, b, _) in zip(indices.tolist(),
+                                                                   pool.records[indices].tolist()):
+        p = particles[index]
+        p.orig_x, p.orig_y, p.orig_z = x, y, z
+        p.size_base = size
+        p.flicker_speed, p.flicker_offset = speed, offset
+        p.color = (r, g, b)
+        visible.append(p)
+    apply_view(visible, static_view)
+    return visible
+
+
+class FrameState:
+    """一帧的粒子状态（流水线双缓冲中的一份，粒子对象各自独立）"""
+
+    def __init__(self, rotating_objects: List[Particle], snow_particles: List[Particle]):
+        self.rotating = [copy.copy(p) for p in rotating_objects]
+        self.snow = [copy.copy(p) for p in snow_particles]
+        self.particles: List[Particle] = []  # 按深度排序后的绘制列表
+        self.camera = Camera()
+        self.time_seconds = 0.0
+
+
+class SimulationPipeline:
+    """
+    流水线模拟：在工作线程中计算下一帧的粒子状态
+
+    两份 FrameState 交替使用，主线程绘制其中一份时工作线程只写另一份；
+    雪花的连续状态是流水线自己的副本，只由工作线程修改，再复制到对应的 FrameState 中，
+    两个线程之间没有共享的可变对象。
+    """
+
+    def __init__(self, rotating_objects: List[Particle], snow_particles: Optional[List[Particle]] = None):
+        """
+        Args:
+            rotating_objects: 随场景旋转的粒子（复制到两份 FrameState 中）
+            snow_particles: 雪花初始状态（复制一份）；为 None 时在第一次 advance 之前用 take_snow 设置
+        """
+        self._states = [FrameState(rotating_objects, []), FrameState(rotating_objects, [])]
+        self._snow: List[Particle] = []  # 雪花模拟状态（只由工作线程修改）
+        if snow_particles is not None:
+            self.take_snow(snow_particles)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="simulate")
+        self._pending = None
+
+    def take_snow(self, snow_particles: List[Particle]) -> None:
+        """设置雪花模拟状态：复制一份由本流水线独占（只能在第一次 advance 之前调用）"""
+        self._snow = [copy.copy(p) for p in snow_particles]
+        for state in self._states:
+            state.snow = [copy.copy(p) for p in self._snow]
+
+    def snow_state(self) -> List[Particle]:
+        """雪花模拟状态（只在 close 之后读取，此时工作线程已不再修改）"""
+        return self._snow
+
+    def _simulate(self, state: FrameState, camera: Camera, time_seconds: float) -> FrameState:
+        """视图变换、更新雪花并排序，结果写入 state"""
+        with span("simulate"):
+            apply_view(state.rotating, camera.view(Config.VIEW_DISTANCE))
+            update_snow(self._snow, camera.static_view(Config.VIEW_DISTANCE))
+            for source, target in zip(self._snow, state.snow):
+                target.x, target.y, target.z = source.x, source.y, source.z
+            state.particles = state.rotating + state.snow
+            state.particles.sort(key=lambda p: p.z, reverse=True)
+            state.camera = camera
+            state.time_seconds = time_seconds
+        return state
+
+    def advance(self, camera: Camera, time_seconds: float) -> FrameState:
+        """
+        取出上一次提交的模拟结果用于绘制，并提交下一帧的模拟
+
+        本次的相机状态在下一次调用时才被绘制，因此输入延迟最多多一帧。
+        """
+        if self._pending is None:
+            front = self._simulate(self._states[0], camera, time_seconds)
+        else:
+            front = self._pending.result()
+        back = self._states[1] if front is self._states[0] else self._states[0]
+        self._pending = self._executor.submit(self._simulate, back, camera, time_seconds)
+        return front
+
+    def close(self) -> None:
+        """等待进行中的模拟并关闭工作线程"""
+        self._executor.shutdown(wait=True)
 
 
-def main() -> None:
+# ============================================================================
+# 配置热重载
+# ============================================================================
+
+# 只在启动时读取的配置项，运行中修改需要重启才能生效
+STARTUP_CONFIG_KEYS = (
+    "VIRTUAL_WIDTH", "VIRTUAL_HEIGHT", "WIDTH", "HEIGHT", "WINDOW_TITLE", "AUTO_FULLSCREEN",
+    "MAINTAIN_ASPECT_RATIO", "LARGE_SCENE", "LARGE_SCENE_CHUNK_SIZE", "LARGE_SCENE_MEMORY_MB",
+    "RENDER_WORKERS", "RENDER_BANDS_PER_WORKER", "RENDER_THREADS", "PIPELINED_LOOP",
+    "FOREST_TREES", "FOREST_RADIUS", "FOREST_SCALE", "FOREST_DETAIL",
+    "TEXT_POSITION_X_RATIO", "TEXT_POSITION_Y", "LINE_SPACING", "SHADOW_OFFSET", "FONT_CACHE",
+    "MUSIC_FILE", "DEFAULT_VOLUME", "PERF_HUD_KEY", "PERF_HUD_REFRESH_HZ",
+    "METRICS_PORT", "METRICS_SOCKET", "CONFIG_FILE", "CONFIG_WATCH_INTERVAL",
+    "PERF_LOG", "PERF_LOG_MAX_BYTES", "PERF_LOG_BACKUPS",
+    "PREVIEW_SIZE", "PREVIEW_FPS", "PREVIEW_DENSITY", "PREVIEW_MIN_LAYER_PARTICLES",
+    "INDEXED_RENDER", "INDEXED_FOG_LEVELS",
+)
+
+# 影响全部粒子层生成结果的配置项（其余按 LAYER_CONFIG_KEYS 对应到具体层）
+GENERATION_CONFIG_KEYS = ("SCENE_SEED", "VECTORIZED_GENERATORS", "GENERATION_CHUNK_SIZE")
+
+
+# 外部配置文件应用之前的 Config 值和文件中的键：热重载时文件中删去的键恢复为这些值
+_config_defaults: Dict[str, object] = {}
+_config_file_keys: List[str] = []
+
+
+def load_startup_config(path: str) -> None:
+    """启动时读取外部配置文件并写入 Config"""
+    if not _config_defaults:
+        _config_defaults.update(config_values(Config))
+    try:
+        values = load_config_file(path)
+        changed, _ = apply_config_values(Config, values)
+    except (OSError, ValueError) as error:
+        raise SystemExit(f"Failed to load config '{path}': {error}")
+    _config_file_keys[:] = list(values)
+    print(f"Loaded config {path}: {len(changed)} value(s) overridden")
+
+
+def affected_layers(changed: Sequence[str]) -> List[str]:
+    """返回受配置变化影响、需要重新生成的粒子层（FOG_* 等渲染时读取的配置不需要重建）"""
+    if any(key in GENERATION_CONFIG_KEYS for key in changed):
+        return list(SCENE_LAYERS)
+    return [layer for layer in SCENE_LAYERS
+            if any(key in LAYER_CONFIG_KEYS[layer] for key in changed)]
+
+
+class SceneReloader:
+    """
+    配置热重载：监视外部配置文件，变化时在帧之间写入 Config，
+    并在后台线程中只重建受影响的粒子层，完成后交给主循环一次性切换
+
+    重建进行中时不应用新的配置值（留到重建完成后），生成过程读取的 Config 始终一致。
+    """
+
+    def __init__(self, path: str, rebuild: Callable[[List[str]], object],
+                 interval: float = Config.CONFIG_WATCH_INTERVAL):
+        """
+        初始化热重载
+
+        Args:
+            path: 配置文件路径
+            rebuild: 在后台线程中调用，参数为需要重建的层，返回值原样交给主循环切换
+            interval: 检查文件变化的间隔（秒）
+        """
+        self.watcher = ConfigWatcher(path, interval)
+        self._rebuild = rebuild
+        # 文件中删去的键恢复为应用配置文件之前的值（没有经过 load_startup_config 时以当前值为准）
+        self._defaults = dict(_config_defaults) or config_values(Config)
+        self._file_keys = list(_config_file_keys)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene-reload")
+        self._future = None
+        self._pending: Optional[Dict[str, object]] = None
+        self.watcher.start()
+
+    def poll(self) -> Optional[object]:
+        """每帧在主线程调用，返回后台重建完成、可以切换的结果（没有时返回 None）"""
+        if self._future is not None:
+            if not self._future.done():
+                return None
+            future, self._future = self._future, None
+            try:
+                return future.result()
+            except Exception as error:
+                print(f"Scene rebuild failed: {error}")
+                return None
+
+        values = self.watcher.poll()
+        if values is not None:
+            self._pending = values
+        if self._pending is None:
+            return None
+        values, self._pending = self._pending, None
+
+        changed, skipped = apply_config_values(Config, values, skip=STARTUP_CONFIG_KEYS,
+                                               defaults=self._defaults, previous=self._file_keys)
+        self._file_keys = list(values)
+        if skipped:
+            print(f"Config keys take effect after restart: {', '.join(skipped)}")
+        if not changed:
+            return None
+        layers = affected_layers(changed)
+        print(f"Config reloaded: {', '.join(changed)}"
+              + (f"; rebuilding {', '.join(layers)}" if layers else ""))
+        if layers:
+            self._future = self._executor.submit(self._rebuild, layers)
+        return None
+
+    def close(self) -> None:
+        """停止监视并等待进行中的重建"""
+        self.watcher.stop()
+        self._executor.shutdown(wait=True)
+
+
+# ============================================================================
+# 内存诊断
+# ============================================================================
+
+def deep_sizeof(obj, seen: set) -> int:
+    """递归统计对象及其引用的Python对象大小（已统计过的共享对象不重复计算）"""
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, '__dict__'):
+            stack.append(vars(item))
+    return total
+
+
+def report_memory(project_tree: Optional[int] = None, project_ground: Optional[int] = None,
+                  budget_mb: Optional[float] = None) -> None:
+    """
+    输出每个粒子层的常驻内存、每帧临时分配和峰值RSS，并按粒子数量推算内存占用
+
+    Args:
+        project_tree: 推算时使用的 TREE_PARTICLES（默认使用当前配置）
+        project_ground: 推算时使用的 GROUND_PARTICLES（默认使用当前配置）
+        budget_mb: 内存预算（MB），给出时推算该预算下可容纳的最大粒子数
+    """
+    pygame.init()
+    baseline_rss = current_rss_bytes()
+    tracemalloc.start()
+
+    # 各粒子层常驻内存：tracemalloc 增量 + getsizeof 遍历
+    layers = [
+        ("tree", generate_ragged_tree, Config.TREE_PARTICLES),
+        ("heart", generate_pillow_heart, Config.HEART_PARTICLES),
+        ("ground", generate_bright_white_ground, Config.GROUND_PARTICLES),
+        ("snow", generate_snow, Config.SNOW_PARTICLES),
+    ]
+    seen: set = set()
+    generated: Dict[str, List[Particle]] = {}
+    layer_bytes: Dict[str, int] = {}
+    print(f"{'layer':<8}{'config':>10}{'particles':>11}{'traced':>14}{'getsizeof':>14}{'B/particle':>12}")
+    for name, generator, count in layers:
+        before = tracemalloc.get_traced_memory()[0]
+        particles = generator(count)
+        retained = tracemalloc.get_traced_memory()[0] - before
+        walked = deep_sizeof(particles, seen)
+        generated[name] = particles
+        layer_bytes[name] = retained
+        print(f"{name:<8}{count:>10}{len(particles):>11}{retained:>14,}{walked:>14,}"
+              f"{retained / max(1, len(particles)):>12.1f}")
+
+    before = tracemalloc.get_traced_memory()[0]
+    rotating_objects = generated["tree"] + generated["heart"] + generated["ground"]
+    rotating_list_bytes = tracemalloc.get_traced_memory()[0] - before
+    print(f"{'rotating':<8}{'':>10}{len(rotating_objects):>11}{rotating_list_bytes:>14,}")
+
+    # 每帧临时分配：旋转、雪花更新、拼接列表与排序
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    for p in rotating_objects:
+        p.rotate_y(0.5)
+    update_snow(generated["snow"])
+    all_particles = rotating_objects + generated["snow"]
+    all_particles.sort(key=lambda p: p.z, reverse=True)
+    frame_transient = tracemalloc.get_traced_memory()[1] - before
+    del all_particles
+
+    # SDL 表面不经过 tracemalloc，按像素格式计算
+    virtual_bytes = Config.VIRTUAL_WIDTH * Config.VIRTUAL_HEIGHT * 4
+    screen_width, screen_height = Config.WIDTH, Config.HEIGHT
+    if Config.AUTO_FULLSCREEN:
+        try:
+            screen_width, screen_height = pygame.display.get_desktop_sizes()[0]
+        except (pygame.error, IndexError):
+            pass
+    scaled_bytes = screen_width * screen_height * 4
+    surface_bytes = virtual_bytes + scaled_bytes * 2  # 虚拟表面 + 缩放副本 + 窗口表面
+
+    tracemalloc.stop()
+    total_particles = len(rotating_objects) + len(generated["snow"])
+    print(f"per-frame transient (list concat + sort): {frame_transient:,} B "
+          f"({frame_transient / total_particles:.1f} B/particle)")
+    print(f"surfaces (virtual + scaled + screen {screen_width}x{screen_height}): {surface_bytes:,} B")
+    if baseline_rss is not None:
+        print(f"baseline RSS before generation: {baseline_rss:,} B")
+    peak = peak_rss_bytes()
+    if peak is not None:
+        print(f"peak RSS (includes tracemalloc overhead): {peak:,} B")
+
+    # 按粒子数量线性推算
+    tree_per_config = layer_bytes["tree"] / Config.TREE_PARTICLES
+    ground_per_config = layer_bytes["ground"] / Config.GROUND_PARTICLES
+    tree_ratio = len(generated["tree"]) / Config.TREE_PARTICLES  # 含外层雪花
+    frame_per_particle = frame_transient / total_particles + 8  # 另含 rotating 列表指针
+    tree_cost = tree_per_config + tree_ratio * frame_per_particle
+    ground_cost = ground_per_config + frame_per_particle
+    fixed = ((baseline_rss or 0) + surface_bytes + layer_bytes["heart"] + layer_bytes["snow"]
+             + (Config.HEART_PARTICLES + Config.SNOW_PARTICLES) * frame_per_particle)
+
+    tree_count = project_tree if project_tree is not None else Config.TREE_PARTICLES
+    ground_count = project_ground if project_ground is not None else Config.GROUND_PARTICLES
+    projected = fixed + tree_count * tree_cost + ground_count * ground_cost
+    print(f"projected footprint for TREE_PARTICLES={tree_count}, GROUND_PARTICLES={ground_count}: "
+          f"{projected / 2**20:,.1f} MB")
+
+    if budget_mb is not None:
+        budget = budget_mb * 2**20
+        max_tree = int((budget - fixed - ground_count * ground_cost) / tree_cost)
+        max_ground = int((budget - fixed - tree_count * tree_cost) / ground_cost)
+        print(f"budget {budget_mb:,.0f} MB: max TREE_PARTICLES={max(0, max_tree):,} "
+              f"(GROUND_PARTICLES={ground_count}), max GROUND_PARTICLES={max(0, max_ground):,} "
+              f"(TREE_PARTICLES={tree_count})")
+
+
+def report_thread_scaling(thread_counts: Sequence[int], frames: int = 10) -> None:
+    """输出大场景在各线程数下的整帧和数组阶段耗时、加速比与扩展效率"""
+    if np is None:
+        raise SystemExit("Thread scaling measurement requires NumPy")
+    pygame.init()
+    records = load_layer_records(SCENE_LAYERS)
+    rotating_layers = [records[layer] for layer in ("tree", "heart", "ground")]
+    snow = np.array(records["snow"])
+    total = sum(len(layer) for layer in records.values())
+    print(f"Thread scaling: {total} particles, {frames} frames per thread count, "
+          f"{os.cpu_count()} CPU(s)")
+    print(f"{'threads':>7} {'frame ms':>9} {'speedup':>8} {'eff':>6} {'stages ms':>10} {'speedup':>8} {'eff':>6}")
+    for result in measure_thread_scaling(Config, rotating_layers, snow, thread_counts, frames,
+                                         Config.LARGE_SCENE_CHUNK_SIZE, Config.LARGE_SCENE_MEMORY_MB):
+        print(f"{result['threads']:>7} {result['frame_ms']:>9.1f} {result['frame_speedup']:>7.2f}x "
+              f"{result['frame_efficiency']:>6.0%} {result['stage_ms']:>10.1f} "
+              f"{result['stage_speedup']:>7.2f}x {result['stage_efficiency']:>6.0%}")
+    pygame.quit()
+
+
+# ============================================================================
+# 预览模式
+# ============================================================================
+
+def parse_size(text: str) -> Tuple[int, int]:
+    """解析 "宽x高" 形式的窗口尺寸"""
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got '{text}'")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"invalid size '{text}'")
+    return width, height
+
+
+def apply_preview_config(width: int, height: int) -> None:
+    """
+    把渲染配置换算到预览窗口：虚拟分辨率等于窗口尺寸，投影按高度等比缩小，
+    各层粒子数量按像素面积缩减（再乘以 PREVIEW_DENSITY）
+    """
+    scale = height / Config.VIRTUAL_HEIGHT
+    area_ratio = (width * height) / (Config.VIRTUAL_WIDTH * Config.VIRTUAL_HEIGHT) * Config.PREVIEW_DENSITY
+    Config.VIRTUAL_WIDTH, Config.VIRTUAL_HEIGHT = width, height
+    Config.WIDTH, Config.HEIGHT = width, height
+    Config.AUTO_FULLSCREEN = False
+    Config.FOV *= scale
+    Config.SCENE_OFFSET_Y = round(Config.SCENE_OFFSET_Y * scale)
+    for _, count_key in LAYER_GENERATORS.values():
+        count = getattr(Config, count_key)
+        setattr(Config, count_key, min(count, max(Config.PREVIEW_MIN_LAYER_PARTICLES, round(count * area_ratio))))
+    Config.SCENE_CACHE = False  # 预览场景很小，直接生成比读写缓存更快
+
+
+def _window_alive(window_id: Optional[int]) -> bool:
+    """宿主窗口（屏保设置面板）是否仍然存在"""
+    if window_id is None or sys.platform != 'win32':
+        return True
+    return bool(ctypes.windll.user32.IsWindow(window_id))
+
+
+def run_preview(size: Tuple[int, int] = Config.PREVIEW_SIZE, window_id: Optional[int] = None) -> None:
+    """
+    预览模式：在小窗口中持续播放低分辨率动画
+
+    只初始化显示模块（不打开音频、不加载字体和界面控件），按 PREVIEW_FPS 限帧，
+    用参考渲染路径直接绘制到窗口表面，没有虚拟表面缩放。
+
+    Args:
+        size: 窗口尺寸；嵌入宿主窗口时以宿主窗口的实际尺寸为准
+        window_id: 宿主窗口句柄（Windows 屏保 /p 参数），None 时打开独立窗口
+    """
+    if window_id is not None:
+        os.environ["SDL_WINDOWID"] = str(window_id)
+    pygame.display.init()
+    preview_screen = pygame.display.set_mode(size)
+    pygame.display.set_caption(Config.WINDOW_TITLE)
+    apply_preview_config(*preview_screen.get_size())
+
+    scene = load_scene()
+    snow_particles = scene["snow"]
+    rotating_objects = scene["tree"] + scene["heart"] + scene["ground"]
+    print(f"Preview {Config.VIRTUAL_WIDTH}x{Config.VIRTUAL_HEIGHT}: "
+          f"{len(rotating_objects) + len(snow_particles)} particles, "
+          f"ready in {(time.perf_counter() - PROCESS_START) * 1000:.0f} ms")
+
+    # 保持与全速运行时相同的旋转角速度和雪花下落速度
+    frame_steps = Config.FPS / Config.PREVIEW_FPS
+    angle_step = Config.AUTO_ROTATION_SPEED * frame_steps
+    angle = 0.0
+    preview_clock = pygame.time.Clock()
+    start_ticks = pygame.time.get_ticks()
+    last_check = start_ticks
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE and window_id is None:
+                running = False
+
+        current_time = pygame.time.get_ticks()
+        if current_time - last_check >= 1000:
+            last_check = current_time
+            running = running and _window_alive(window_id)
+
+        angle += angle_step
+        for p in rotating_objects:
+            p.rotate_y(angle)
+        update_snow(snow_particles, steps=frame_steps)
+        all_particles = rotating_objects + snow_particles
+        all_particles.sort(key=lambda p: p.z, reverse=True)
+
+        preview_screen.fill(Config.BG_COLOR)
+        draw_particles(preview_screen, all_particles, (current_time - start_ticks) / 1000.0)
+        pygame.display.flip()
+        preview_clock.tick(Config.PREVIEW_FPS)
+
+    pygame.quit()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    解析命令行参数
+
+    诊断相关参数也可以通过环境变量开启，便于在现场机器上直接使用：
+        XMAS_TRACE=trace.json          记录 Chrome Trace
+        XMAS_TRACE_BUFFER=200000       区间环形缓冲区容量
+        XMAS_PROFILE_FRAMES=300        对前N帧运行 cProfile
+        XMAS_PROFILE_OUTPUT=xmas.pstats
+        XMAS_METRICS_PORT=9109         本机 Prometheus 指标端口
+        XMAS_METRICS_SOCKET=/run/xmas.sock
+        XMAS_CONFIG=scene.toml         外部配置文件
+        XMAS_PERF_LOG=perf.jsonl       帧耗时回归日志
+        XMAS_RELEASE=2024.12           回归日志中记录的版本标识
+    """
+    # 先读取外部配置文件：下面各参数的默认值来自 Config
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config", default=os.environ.get("XMAS_CONFIG", Config.CONFIG_FILE))
+    config_path = config_parser.parse_known_args(argv)[0].config
+    if config_path:
+        load_startup_config(config_path)
+
+    parser = argparse.ArgumentParser(description=Config.WINDOW_TITLE)
+    parser.add_argument("--config", metavar="PATH", default=config_path,
+                        help="外部配置文件（TOML / JSON），运行中修改会自动重载")
+    parser.add_argument("--trace", metavar="PATH", default=os.environ.get("XMAS_TRACE"),
+                        help="记录各阶段耗时区间，退出时写出 Chrome Trace JSON")
+    parser.add_argument("--trace-buffer", metavar="N", type=int,
+                        default=int(os.environ.get("XMAS_TRACE_BUFFER", "200000")),
+                        help="区间环形缓冲区容量（默认 200000）")
+    parser.add_argument("--profile-frames", metavar="N", type=int,
+                        default=int(os.environ.get("XMAS_PROFILE_FRAMES", "0")),
+                        help="对前N帧运行 cProfile（0 表示关闭）")
+    parser.add_argument("--profile-output", metavar="PATH",
+                        default=os.environ.get("XMAS_PROFILE_OUTPUT", "xmas.pstats"),
+                        help="cProfile 结果输出路径（默认 xmas.pstats）")
+    parser.add_argument("--metrics-port", metavar="PORT", type=int,
+                        default=int(os.environ.get("XMAS_METRICS_PORT", Config.METRICS_PORT or 0)),
+                        help="在 127.0.0.1:PORT 提供 Prometheus 指标（0 表示关闭）")
+    parser.add_argument("--metrics-socket", metavar="PATH",
+                        default=os.environ.get("XMAS_METRICS_SOCKET", Config.METRICS_SOCKET),
+                        help="在 Unix 域套接字上提供 Prometheus 指标")
+    parser.add_argument("--perf-log", metavar="PATH", nargs="?",
+                        const=os.path.join(get_user_cache_dir(), "perf.jsonl"),
+                        default=os.environ.get("XMAS_PERF_LOG", Config.PERF_LOG),
+                        help="退出时把启动耗时、帧耗时分位数等摘要追加到回归日志（默认写入用户缓存目录）")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="输出各粒子层内存占用和推算结果后退出（不打开窗口）")
+    parser.add_argument("--project-tree", metavar="N", type=int,
+                        help="内存推算使用的 TREE_PARTICLES")
+    parser.add_argument("--project-ground", metavar="N", type=int,
+                        help="内存推算使用的 GROUND_PARTICLES")
+    parser.add_argument("--memory-budget-mb", metavar="MB", type=float,
+                        help="推算该内存预算下可容纳的最大粒子数")
+    parser.add_argument("--preview", metavar="WxH", nargs="?", type=parse_size,
+                        const=Config.PREVIEW_SIZE,
+                        help="预览模式：小窗口低分辨率渲染，不播放音乐（默认 %dx%d）" % Config.PREVIEW_SIZE)
+    parser.add_argument("--window-id", metavar="HWND", type=int,
+                        help="预览模式嵌入的宿主窗口句柄")
+    parser.add_argument("--record", metavar="PATH",
+                        help="把交互事件连同时间戳录制到会话文件")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="无窗口、以固定时间步长和种子回放会话文件，输出帧耗时统计后退出")
+    parser.add_argument("--replay-any-renderer", action="store_true",
+                        help="回放时允许使用与录制时不同的渲染参数（在同一会话上比较渲染路径）")
+    parser.add_argument("--replay-fps", metavar="N", type=int,
+                        help="回放的固定时间步长对应的帧率（默认使用录制时的帧率）")
+    parser.add_argument("--pipelined", action="store_true", default=Config.PIPELINED_LOOP,
+                        help="流水线主循环：模拟与绘制、呈现在两个线程中并行")
+    parser.add_argument("--indexed", action="store_true", default=Config.INDEXED_RENDER,
+                        help="8 位调色板渲染：粒子光栅化到 256 色表面，缩放后在呈现时展开颜色")
+    parser.add_argument("--audio-reactive", action="store_true", default=Config.AUDIO_REACTIVE,
+                        help="闪烁、辉光和旋转速度随音乐起伏（需要 NumPy）")
+    parser.add_argument("--large-scene", action="store_true", default=Config.LARGE_SCENE,
+                        help="大场景模式：粒子数组按块流式渲染（需要 NumPy）")
+    parser.add_argument("--render-workers", metavar="N", type=int, default=Config.RENDER_WORKERS,
+                        help="大场景分带光栅化的进程数（大于 1 时自动开启大场景模式）")
+    parser.add_argument("--render-threads", metavar="N", type=int, default=Config.RENDER_THREADS,
+                        help="大场景数组阶段的线程数")
+    parser.add_argument("--forest", metavar="N", type=int, default=Config.FOREST_TREES,
+                        help="森林模式：额外放置 N 棵共享几何的树（自动开启大场景模式）")
+    parser.add_argument("--thread-scaling", metavar="N", type=int, nargs="+",
+                        help="测量各线程数下大场景的帧耗时和扩展效率后退出（不打开窗口）")
+    parser.add_argument("--tree-particles", metavar="N", type=int, help="覆盖 TREE_PARTICLES")
+    parser.add_argument("--ground-particles", metavar="N", type=int, help="覆盖 GROUND_PARTICLES")
+    parser.add_argument("--bake-scene", metavar="DIR",
+                        help="将当前配置的场景烘焙到目录后退出（打包时使用）")
+    return parser.parse_args(argv)
+
+
+def apply_particle_overrides(args: argparse.Namespace) -> None:
+    """用命令行参数覆盖粒子数量配置"""
+    if args.tree_particles is not None:
+        Config.TREE_PARTICLES = args.tree_particles
+    if args.ground_particles is not None:
+        Config.GROUND_PARTICLES = args.ground_particles
+
+
+def session_settings(args: argparse.Namespace) -> Dict[str, object]:
+    """会话文件头中记录的场景与渲染设置"""
+    return {
+        "scene_seed": Config.SCENE_SEED,
+        "particles": {count_key: getattr(Config, count_key) for _, count_key in LAYER_GENERATORS.values()},
+        "config": args.config,
+        "config_digest": config_digest(args.config),
+        "renderer": session_renderer(args),
+    }
+
+
+def session_renderer(args: argparse.Namespace) -> Dict[str, object]:
+    """决定渲染路径的命令行参数"""
+    return {"large_scene": args.large_scene, "render_workers": args.render_workers,
+            "pipelined": args.pipelined, "forest": args.forest, "indexed": args.indexed}
+
+
+def apply_session_settings(replay: SessionReplay, args: argparse.Namespace) -> None:
+    """
+    回放前恢复录制时的场景种子和粒子数量；配置文件内容或渲染参数与录制时不同时拒绝回放
+    （渲染参数可以用 --replay-any-renderer 放开，用于在同一会话上比较渲染路径）
+    """
+    recorded = replay.settings
+    if recorded["config_digest"] != config_digest(args.config):
+        raise SystemExit(f"{replay.path} was recorded with config file {recorded['config'] or '(none)'}, "
+                         f"replay it with the same --config contents")
+    mismatches = renderer_mismatches(recorded["renderer"], session_renderer(args))
+    if mismatches and not args.replay_any_renderer:
+        raise SystemExit(f"{replay.path} was recorded with different renderer flags "
+                         f"({'; '.join(mismatches)}), pass the recorded flags or --replay-any-renderer")
+    Config.SCENE_SEED = recorded["scene_seed"]
+    for key, value in recorded["particles"].items():
+        setattr(Config, key, value)
+
+
+def main(args: Optional[argparse.Namespace] = None) -> None:
     """主应用程序循环"""
+    if args is None:
+        args = parse_args([])
+
+    # 会话回放：不打开真实窗口，窗口尺寸与录制时相同（事件坐标是窗口坐标）
+    replay = SessionReplay(args.replay, args.replay_fps) if args.replay else None
+    if replay is not None:
+        apply_session_settings(replay, args)
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        Config.AUTO_FULLSCREEN = False
+        Config.WIDTH, Config.HEIGHT = replay.screen_size
+        print(f"Replaying {len(replay.events)} events from {args.replay} at {replay.fps} FPS, seed {replay.seed}")
+    # 录制和回放使用同一个运行时随机数种子（雪花重生位置、点画）
+    if replay is not None:
+        runtime_seed = replay.seed
+    elif args.record:
+        runtime_seed = random.randrange(2 ** 31)
+        if Config.SCENE_SEED is None:
+            # 每次随机生成的场景无法回放：录制时选定场景种子，写入会话文件头
+            Config.SCENE_SEED = random.randrange(2 ** 31)
+    else:
+        runtime_seed = None
+
+    # 帧耗时回归日志：启动阶段从进程启动开始计时
+    run_log = (RunLog(args.perf_log, PROCESS_START, Config.PERF_LOG_MAX_BYTES, Config.PERF_LOG_BACKUPS,
+                      1000.0 / Config.FPS)
+               if args.perf_log else None)
+
+    init_display()
+    if run_log is not None:
+        run_log.mark_startup("display")
+
+    # 诊断：Chrome Trace 区间记录
+    tracer = SpanTracer(args.trace_buffer) if args.trace else None
+    set_tracer(tracer)
+
     print("Generating Particles...")
-    tree_particles = generate_ragged_tree(Config.TREE_PARTICLES)
-    heart_particles = generate_pillow_heart(Config.HEART_PARTICLES)
-    ground_particles = generate_bright_white_ground(Config.GROUND_PARTICLES)
-    snow_particles = generate_snow(Config.SNOW_PARTICLES)
+    render_workers = args.render_workers or os.cpu_count() or 1
+    sparkle_capacity = Config.SPARKLE_CAPACITY if Config.SPARKLES and np is not None else 0
+    wants_large_scene = args.large_scene or render_workers > 1 or args.forest > 0
+    large_scene = wants_large_scene and np is not None
+    if large_scene != wants_large_scene:
+        print("Large scene mode requires NumPy, using the particle renderer")
+    stream_renderer = None
+    tiled_renderer = None
+    instance_sets = []
+    if large_scene:
+        # 大场景：直接使用粒子数组（缓存为内存映射），不创建 Particle 对象
+        scene_records = load_layer_records(SCENE_LAYERS)
+        rotating_layers = [scene_records[layer] for layer in ("tree", "heart", "ground")]
+        snow_records = np.array(scene_records["snow"])  # 雪花位置每帧更新，需要可写副本
+        snow_rng = np.random.default_rng(runtime_seed)
+        layer_counts = {layer: len(records) for layer, records in scene_records.items()}
+        for line in layer_summary(scene_records):
+            print(f"  {line}")
+        if args.forest > 0:
+            # 森林：树和心形只保存一份，每个实例在块变换时套用自己的位置、缩放和旋转相位
+            instance_sets.append(InstanceSet([scene_records["tree"], scene_records["heart"]],
+                                             generate_forest_instances(args.forest),
+                                             pivot_y=GROUND_Y, detail=Config.FOREST_DETAIL))
+            print(f"Forest: {args.forest} trees sharing {instance_sets[0].particle_count} particles of geometry")
+            if render_workers > 1:
+                print("Forest mode renders in a single process")
+                render_workers = 1
+        if render_workers > 1:
+            try:
+                tiled_renderer = TiledRenderer(Config, rotating_layers, len(snow_records) + sparkle_capacity,
+                                               render_workers,
+                                               Config.RENDER_BANDS_PER_WORKER, Config.LARGE_SCENE_CHUNK_SIZE,
+                                               Config.LARGE_SCENE_MEMORY_MB)
+                print(f"Tiled rendering: {tiled_renderer.band_count} bands on {render_workers} processes "
+                      f"(render buffers {Config.LARGE_SCENE_MEMORY_MB} MB in total)")
+            except (OSError, ValueError) as error:
+                # 共享内存或进程池不可用时在主进程中渲染，画面相同
+                print(f"Tiled rendering unavailable, rendering in a single process: {error}")
+        if tiled_renderer is None:
+            render_threads = args.render_threads or os.cpu_count() or 1
+            try:
+                stream_renderer = StreamRenderer(Config, Config.LARGE_SCENE_CHUNK_SIZE,
+                                                 Config.LARGE_SCENE_MEMORY_MB, seed=runtime_seed,
+                                                 threads=render_threads)
+            except ValueError as error:
+                raise SystemExit(str(error))
+            print(f"Large scene mode: chunks of {stream_renderer.chunk_size} particles, "
+                  f"{render_threads} thread(s), "
+                  f"working set {stream_renderer.working_set_bytes / (1024 * 1024):.1f} MB "
+                  f"(budget {Config.LARGE_SCENE_MEMORY_MB} MB)")
+    else:
+        scene = load_scene()
+        snow_particles = scene["snow"]
+        rotating_objects = scene["tree"] + scene["heart"] + scene["ground"]
+        layer_counts = {layer: len(particles) for layer, particles in scene.items()}
+    pipeline = SimulationPipeline(rotating_objects, snow_particles) if args.pipelined and not large_scene else None
+
+    # 8 位调色板渲染：粒子写入 8 位表面，缩放后由呈现时的 blit 展开颜色，界面浮层直接画到屏幕上
+    palette = None
+    indexed_surface = None
+    indexed_scaled = None
+    overlays = [ScaledOverlay() for _ in range(3)]  # 文本、音量控制、性能浮层
+    if args.indexed and large_scene:
+        print("8-bit indexed rendering applies to the particle renderer only")
+    elif args.indexed:
+        palette = scene_palette(rotating_objects + snow_particles)
+        indexed_surface = pygame.Surface((Config.VIRTUAL_WIDTH, Config.VIRTUAL_HEIGHT), 0, 8)
+        indexed_surface.set_palette(palette.colors)
+        print(f"8-bit indexed rendering: {len(palette.base_colors)} base colors x "
+              f"{palette.fog_levels} fog levels")
+    if run_log is not None:
+        run_log.mark_startup("scene")
+
+    def rebuild_layers(layers: List[str]) -> Tuple[Dict[str, object], object]:
+        """
+        后台线程：重新生成指定粒子层，并预先创建切换时需要替换的渲染对象
+
+        Returns:
+            (新的粒子层, 替换用的 TiledRenderer / SimulationPipeline，不需要替换时为 None)
+        """
+        if large_scene:
+            records = load_layer_records(layers)
+            if "snow" in records:
+                records["snow"] = np.array(records["snow"])
+            replacement = None
+            if tiled_renderer is not None:
+                # 分带渲染进程持有共享内存中的粒子层，新建一组后再切换
+                merged = dict(scene_records, **records)
+                replacement = TiledRenderer(Config, [merged[layer] for layer in ("tree", "heart", "ground")],
+                                            len(merged["snow"]) + sparkle_capacity, render_workers,
+                                            Config.RENDER_BANDS_PER_WORKER, Config.LARGE_SCENE_CHUNK_SIZE,
+                                            Config.LARGE_SCENE_MEMORY_MB)
+            return records, replacement
+
+        loaded = load_layers(layers)
+        replacement = None
+        if pipeline is not None:
+            # 雪花没有重建时不能读取旧流水线正在模拟的雪花，切换时由主线程在 close 之后交接
+            merged = dict(scene, **loaded)
+            replacement = SimulationPipeline(merged["tree"] + merged["heart"] + merged["ground"],
+                                             loaded.get("snow"))
+        return loaded, replacement
+
+    # 外部配置热重载（受影响的粒子层在后台线程中重建，主循环在帧之间切换）
+    scene_reloader = SceneReloader(args.config, rebuild_layers) if args.config else None
 
-    rotating_objects = tree_particles + heart_particles + ground_particles
     rotation_controller = RotationController()
 
+    # 点击火花：固定容量的粒子池，参考渲染路径使用与槽位一一对应的预创建 Particle 对象
+    sparkle_pool = None
+    sparkle_particles: List[Particle] = []
+    if sparkle_capacity:
+        sparkle_pool = SparklePool(sparkle_capacity, PARTICLE_DTYPE, Config.SPARKLE_COLORS, Config.BG_COLOR,
+                                   Config.SPARKLE_LIFETIME, seed=runtime_seed)
+        if not large_scene:
+            sparkle_particles = [Particle(0.0, 0.0, 0.0, Config.WHITE, 1.0) for _ in range(sparkle_capacity)]
+
     # 创建多行文本渲染器（左对齐）
     # 使用虚拟分辨率进行布局
     text_pos_x = int(Config.VIRTUAL_WIDTH * Config.TEXT_POSITION_X_RATIO)
@@ -1071,75 +2961,385 @@ def main() -> None:
         height=40
     )
 
-    start_ticks = pygame.time.get_ticks()
-    running = True
+    # 音乐联动：包络在后台线程中解码计算（或读取缓存），加载完成前没有效果
+    audio_envelope = None
+    if args.audio_reactive:
+        if np is None:
+            print("Audio-reactive effects require NumPy")
+        elif pygame.mixer.get_init() is None:
+            print("Audio-reactive effects require the audio mixer")
+        else:
+            audio_envelope = AudioEnvelope(get_resource_path(Config.MUSIC_FILE),
+                                           os.path.join(get_user_cache_dir(), "audio"))
+            audio_envelope.start()
+
+    # 性能浮层（按 Config.PERF_HUD_KEY 切换）
+    profiler = FrameProfiler(tracer=tracer)
+    perf_hud = PerformanceHUD(profiler, Config.FPS, refresh_hz=Config.PERF_HUD_REFRESH_HZ)
+    if Config.SHOW_PERF_HUD:
+        perf_hud.toggle()
+    if sparkle_pool is not None:
+        perf_hud.register_pool("sparkles", sparkle_pool.stats)
+
+    # 运行指标导出（后台线程，抓取不会阻塞渲染循环）
+    frame_metrics = None
+    metrics_exporter = None
+    if args.metrics_port or args.metrics_socket:
+        frame_metrics = FrameMetrics(Config.FPS)
+        for layer, count in layer_counts.items():
+            frame_metrics.set_particle_count(layer, count)
+        frame_metrics.register_cache("scene", lambda: tuple(scene_cache_stats))
+        frame_metrics.register_cache("font", lambda: tuple(font_cache_stats))
+        frame_metrics.register_cache("volume_control", lambda: tuple(volume_control.cache_stats))
+        frame_metrics.register_cache("volume_icon", lambda: tuple(volume_control.tint_cache_stats))
+        if sparkle_pool is not None:
+            frame_metrics.register_pool("sparkles", sparkle_pool.stats)
+        try:
+            metrics_exporter = MetricsExporter(frame_metrics, port=args.metrics_port,
+                                               socket_path=args.metrics_socket)
+            metrics_exporter.start()
+        except OSError as error:
+            print(f"Failed to start metrics exporter: {error}")
+            frame_metrics = None
+
+    # 诊断：对前N帧运行 cProfile
+    frame_profile = None
+    if args.profile_frames > 0:
+        frame_profile = FrameRangeProfile(args.profile_frames, args.profile_output)
+        frame_profile.start()
+
+    recorder = None
+    if args.record:
+        recorder = SessionRecorder(args.record, screen.get_size(), Config.FPS, runtime_seed,
+                                   session_settings(args))
+    if runtime_seed is not None:
+        random.seed(runtime_seed)
+        set_stipple_seed(runtime_seed)
+
+    # 回归日志记录实际生效的渲染设置（命令行、配置文件和自动降级之后的结果）
+    quality = None
+    if run_log is not None:
+        if tiled_renderer is not None:
+            renderer = "tiled"
+        elif stream_renderer is not None:
+            renderer = "stream"
+        elif pipeline is not None:
+            renderer = "pipelined"
+        else:
+            renderer = "particles"
+        quality = {
+            "renderer": renderer,
+            "indexed": indexed_surface is not None,
+            "render_workers": tiled_renderer.workers if tiled_renderer is not None else 1,
+            "render_threads": stream_renderer.threads if stream_renderer is not None else 1,
+            "forest_trees": args.forest if large_scene else 0,
+            "forest_detail": Config.FOREST_DETAIL,
+            "virtual_size": [Config.VIRTUAL_WIDTH, Config.VIRTUAL_HEIGHT],
+            "window_size": list(screen.get_size()),
+            "fps": Config.FPS,
+            "sparkles": sparkle_capacity,
+            "audio_reactive": audio_envelope is not None,
+            "video_driver": pygame.display.get_driver(),
+        }
+        run_log.mark_startup("setup")
 
-    while running:
-        current_time = pygame.time.get_ticks()
+    # 回放时帧时间由帧序号决定（固定时间步长），与实际耗时无关
+    start_ticks = 0 if replay is not None else pygame.time.get_ticks()
+    previous_time = start_ticks
+    running = True
 
-        # 事件处理
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
+    try:
+        while running:
+            profiler.begin_frame()
+            if replay is not None:
+                current_time = replay.time_ms
+                if profiler.frame_count:
+                    replay.frame_times.append(profiler.last_frame_time)
+            else:
+                current_time = pygame.time.get_ticks()
+            if run_log is not None and profiler.frame_count:
+                run_log.record_frame(profiler.last_frame_time)
+            if frame_metrics is not None and profiler.frame_count:
+                if frame_metrics.startup_seconds is None:
+                    frame_metrics.startup_seconds = time.perf_counter() - PROCESS_START
+                frame_metrics.record_frame(profiler.last_frame_time)
+
+            # 配置热重载：切换后台重建完成的粒子层
+            if scene_reloader is not None:
+                update = scene_reloader.poll()
+                if update is not None:
+                    rebuilt, replacement = update
+                    if large_scene:
+                        scene_records.update(rebuilt)
+                        rotating_layers = [scene_records[layer] for layer in ("tree", "heart", "ground")]
+                        if "snow" in rebuilt:
+                            snow_records = scene_records["snow"]
+                        instance_sets = [InstanceSet([scene_records["tree"], scene_records["heart"]],
+                                                     instance_set.instances, instance_set.pivot_y,
+                                                     instance_set.detail, instance_set.max_skip)
+                                         for instance_set in instance_sets]
+                        if replacement is not None:
+                            tiled_renderer.close()
+                            tiled_renderer = replacement
+                    else:
+                        scene.update(rebuilt)
+                        snow_particles = scene["snow"]
+                        rotating_objects = scene["tree"] + scene["heart"] + scene["ground"]
+                        if replacement is not None:
+                            pipeline.close()
+                            if "snow" not in rebuilt:
+                                # 新流水线接着旧流水线的雪花状态模拟
+                                replacement.take_snow(pipeline.snow_state())
+                            pipeline = replacement
+                        if palette is not None:
+                            palette = None  # 颜色可能变化，下面重建调色板
+                    for layer, data in rebuilt.items():
+                        layer_counts[layer] = len(data)
+                        if frame_metrics is not None:
+                            frame_metrics.set_particle_count(layer, len(data))
+                    print(f"Swapped rebuilt layers: {', '.join(rebuilt)}")
+                if indexed_surface is not None and (palette is None or palette.bg_color != tuple(Config.BG_COLOR)):
+                    palette = scene_palette(rotating_objects + snow_particles)
+                    indexed_surface.set_palette(palette.colors)
+                    indexed_scaled = None
+                profiler.mark("reload")
+
+            # 事件处理
+            if replay is not None:
+                pygame.event.pump()
+                events = replay.next_events()
+                if replay.finished:
                     running = False
-            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                # 将实际屏幕坐标转换为虚拟坐标
-                virtual_x = int((event.pos[0] - offset_x) / scaled_width * Config.VIRTUAL_WIDTH)
-                virtual_y = int((event.pos[1] - offset_y) / scaled_height * Config.VIRTUAL_HEIGHT)
-                virtual_pos = (virtual_x, virtual_y)
-
-                # 先检查是否点击了音量控制
-                if not volume_control.handle_mouse_down(virtual_pos):
-                    # 如果没有点击音量控制，则处理旋转
-                    rotation_controller.handle_mouse_down(event.pos[0], current_time)
-            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
-                volume_control.handle_mouse_up()
-                rotation_controller.handle_mouse_up(current_time)
-            elif event.type == pygame.MOUSEMOTION:
-                # 将实际屏幕坐标转换为虚拟坐标
-                virtual_x = int((event.pos[0] - offset_x) / scaled_width * Config.VIRTUAL_WIDTH)
-                virtual_y = int((event.pos[1] - offset_y) / scaled_height * Config.VIRTUAL_HEIGHT)
-                virtual_pos = (virtual_x, virtual_y)
-                volume_control.handle_mouse_motion(virtual_pos)
-
-        # 更新旋转
-        rotation_controller.update(current_time)
-
-        # 旋转对象
-        for p in rotating_objects:
-            p.rotate_y(rotation_controller.angle)
-
-        # 更新雪花
-        update_snow(snow_particles)
-
-        # 准备渲染
-        time_seconds = (current_time - start_ticks) / 1000.0
-        all_particles = rotating_objects + snow_particles
-        all_particles.sort(key=lambda p: p.z, reverse=True)
-
-        # 渲染到虚拟表面（固定1920x1080）
-        virtual_surface.fill(Config.BG_COLOR)
-        for p in all_particles:
-            p.draw(virtual_surface, time_seconds)
-
-        # 绘制多行文本
-        multi_line_text.draw(virtual_surface)
-
-        # 绘制音量控制
-        volume_control.draw(virtual_surface)
-
-        # 缩放虚拟表面到实际屏幕
-        screen.fill((0, 0, 0))  # 黑色背景（letterbox）
-        scaled_surface = pygame.transform.scale(virtual_surface, (scaled_width, scaled_height))
-        screen.blit(scaled_surface, (offset_x, offset_y))
-
-        pygame.display.flip()
-        clock.tick(Config.FPS)
+            else:
+                events = pygame.event.get()
+            if recorder is not None:
+                recorder.record(current_time - start_ticks, events)
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        running = False
+                    elif event.key == Config.PERF_HUD_KEY:
+                        perf_hud.toggle()
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    # 将实际屏幕坐标转换为虚拟坐标
+                    virtual_x = int((event.pos[0] - offset_x) / scaled_width * Config.VIRTUAL_WIDTH)
+                    virtual_y = int((event.pos[1] - offset_y) / scaled_height * Config.VIRTUAL_HEIGHT)
+                    virtual_pos = (virtual_x, virtual_y)
+
+                    # 先检查是否点击了音量控制
+                    if not volume_control.handle_mouse_down(virtual_pos):
+                        # 如果没有点击音量控制，则处理旋转
+                        rotation_controller.handle_mouse_down(event.pos, current_time)
+                        # 点击到树时发射火花
+                        hit = (tree_hit_point(virtual_pos, rotation_controller.camera)
+                               if sparkle_pool is not None else None)
+                        if hit is not None:
+                            sparkle_pool.emit(hit, Config.SPARKLE_BURST)
+                elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                    volume_control.handle_mouse_up()
+                    rotation_controller.handle_mouse_up(current_time)
+                elif event.type == pygame.MOUSEMOTION:
+                    # 将实际屏幕坐标转换为虚拟坐标
+                    virtual_x = int((event.pos[0] - offset_x) / scaled_width * Config.VIRTUAL_WIDTH)
+                    virtual_y = int((event.pos[1] - offset_y) / scaled_height * Config.VIRTUAL_HEIGHT)
+                    virtual_pos = (virtual_x, virtual_y)
+                    volume_control.handle_mouse_motion(virtual_pos)
+                    rotation_controller.handle_mouse_motion(event.pos)
+                elif event.type == pygame.MOUSEWHEEL:
+                    rotation_controller.handle_wheel(event.y, current_time)
+            profiler.mark("events")
+
+            # 音乐联动：按播放位置查包络，效果强度随实际音量缩放
+            if audio_envelope is not None:
+                music_position = current_time - start_ticks if replay is not None else pygame.mixer.music.get_pos()
+                loudness, bass = audio_envelope.level(music_position)
+                volume = volume_control.effective_volume
+                flicker_gain = 1.0 + Config.AUDIO_FLICKER_BOOST * loudness * volume
+                glow_gain = 1.0 + Config.AUDIO_GLOW_BOOST * bass * volume
+                set_audio_gains(flicker_gain, glow_gain)
+                for renderer in (stream_renderer, tiled_renderer):
+                    if renderer is not None:
+                        renderer.flicker_gain, renderer.glow_gain = flicker_gain, glow_gain
+                rotation_controller.speed_scale = 1.0 + Config.AUDIO_ROTATION_BOOST * bass * volume
+
+            # 更新旋转和相机
+            rotation_controller.update(current_time)
+            camera = rotation_controller.camera
+            profiler.mark("controller")
+
+            # 点击火花：按本帧时间步长原地更新粒子池
+            if sparkle_pool is not None:
+                sparkle_pool.update(min(0.1, (current_time - previous_time) / 1000.0))
+                profiler.mark("sparkles")
+            previous_time = current_time
+
+            time_seconds = (current_time - start_ticks) / 1000.0
+            if large_scene:
+                # 大场景：旋转、投影、剔除和光栅化在块内一次完成，用深度缓冲代替排序
+                if stream_renderer is not None:
+                    stream_renderer.update_snow(snow_records)
+                else:
+                    update_snow_records(snow_records, snow_rng)
+                profiler.mark("snow")
+                # 火花与雪花一样使用当前位置，经同一深度缓冲与其他粒子合成
+                static_layers = [snow_records]
+                if sparkle_pool is not None and sparkle_pool.in_use:
+                    static_layers.append(sparkle_pool.records)
+                if tiled_renderer is not None:
+                    # 分带并行光栅化，主进程只等待结果并呈现
+                    tiled_renderer.render(virtual_surface, static_layers, camera, time_seconds)
+                    perf_hud.set_draw_counts(tiled_renderer.draw_counts)
+                else:
+                    stream_renderer.render(virtual_surface, rotating_layers, static_layers,
+                                           camera, time_seconds, instance_sets)
+                    perf_hud.set_draw_counts(stream_renderer.draw_counts)
+                profiler.mark("particles")
+            else:
+                if pipeline is not None:
+                    # 流水线：绘制上一轮在工作线程中算好的状态，同时提交本轮输入对应的下一帧
+                    frame_state = pipeline.advance(camera, time_seconds)
+                    all_particles = frame_state.particles
+                    time_seconds = frame_state.time_seconds
+                    profiler.mark("simulate")
+                    if sparkle_pool is not None and sparkle_pool.in_use:
+                        # 火花在主线程更新，并入工作线程排好序的列表（长的有序段排序接近线性）
+                        all_particles = all_particles + sync_sparkle_particles(
+                            sparkle_pool, sparkle_particles, frame_state.camera.static_view(Config.VIEW_DISTANCE))
+                        all_particles.sort(key=lambda p: p.z, reverse=True)
+                        profiler.mark("sort")
+                else:
+                    # 视图变换：旋转对象使用完整视图，雪花和火花只有俯仰和缩放
+                    static_view = camera.static_view(Config.VIEW_DISTANCE)
+                    apply_view(rotating_objects, camera.view(Config.VIEW_DISTANCE))
+                    profiler.mark("rotate")
+
+                    # 更新雪花
+                    update_snow(snow_particles, static_view)
+                    profiler.mark("snow")
+
+                    # 准备渲染
+                    all_particles = rotating_objects + snow_particles
+                    if sparkle_pool is not None and sparkle_pool.in_use:
+                        all_particles += sync_sparkle_particles(sparkle_pool, sparkle_particles, static_view)
+                    all_particles.sort(key=lambda p: p.z, reverse=True)
+                    profiler.mark("sort")
+
+                if indexed_surface is not None:
+                    # 渲染到 8 位表面：清屏和光栅化只写入调色板索引
+                    indexed_surface.fill(BG_INDEX)
+                    draw_counts = [0, 0, 0, 0]
+                    for p in all_particles:
+                        draw_counts[p.draw_indexed(indexed_surface, time_seconds, palette)] += 1
+                    perf_hud.set_draw_counts(draw_counts)
+                else:
+                    # 渲染到虚拟表面（固定1920x1080）
+                    virtual_surface.fill(Config.BG_COLOR)
+                    if perf_hud.visible:
+                        # 浮层可见时才统计各绘制方式的粒子数量
+                        draw_counts = [0, 0, 0, 0]
+                        for p in all_particles:
+                            draw_counts[p.draw(virtual_surface, time_seconds)] += 1
+                        perf_hud.set_draw_counts(draw_counts)
+                    else:
+                        draw_particles(virtual_surface, all_particles, time_seconds)
+                profiler.mark("particles")
+
+            # 界面浮层（8 位渲染时不画进场景，在呈现阶段缩放后直接画到屏幕上）
+            # 绘制多行文本
+            multi_line_text.set_lines(Config.MESSAGE_LINES)
+            if indexed_surface is None:
+                multi_line_text.draw(virtual_surface)
+            profiler.mark("text")
+
+            # 绘制音量控制
+            if indexed_surface is None:
+                volume_control.draw(virtual_surface)
+            profiler.mark("volume")
+
+            # 绘制性能浮层
+            perf_hud.update(current_time)
+            if indexed_surface is None:
+                perf_hud.draw(virtual_surface)
+            profiler.mark("hud")
+
+            # 缩放虚拟表面到实际屏幕
+            screen.fill((0, 0, 0))  # 黑色背景（letterbox）
+            if indexed_surface is not None:
+                # 在 8 位下缩放，调色板展开与写入屏幕在同一次 blit 中完成
+                frame_surface = indexed_surface
+                if (scaled_width, scaled_height) != indexed_surface.get_size():
+                    if indexed_scaled is None or indexed_scaled.get_size() != (scaled_width, scaled_height):
+                        indexed_scaled = pygame.Surface((scaled_width, scaled_height), 0, 8)
+                        indexed_scaled.set_palette(palette.colors)
+                    pygame.transform.scale(indexed_surface, (scaled_width, scaled_height), indexed_scaled)
+                    frame_surface = indexed_scaled
+                screen.blit(frame_surface, (offset_x, offset_y))
+                layers = (multi_line_text.overlay(), volume_control.overlay(), perf_hud.overlay())
+                for overlay, layer in zip(overlays, layers):
+                    overlay.draw(screen, layer)
+            else:
+                scaled_surface = pygame.transform.scale(virtual_surface, (scaled_width, scaled_height))
+                screen.blit(scaled_surface, (offset_x, offset_y))
+
+            pygame.display.flip()
+            profiler.mark("present")
+            if run_log is not None:
+                run_log.end_frame(profiler.elapsed)
+            if replay is None:
+                clock.tick(Config.FPS)
+            if frame_profile is not None:
+                frame_profile.on_frame()
+    finally:
+        if frame_profile is not None:
+            frame_profile.stop()
+        if recorder is not None:
+            recorder.close()
+        if replay is not None:
+            budget_ms = 1000.0 / Config.FPS
+            print(f"Replay of {args.replay}:")
+            for line in format_summary(frame_time_summary(replay.frame_times, budget_ms), budget_ms):
+                print(f"  {line}")
+        if run_log is not None:
+            error_type = sys.exc_info()[0]
+            run_log.close(dict(layer_counts), quality or {},
+                          release_id(os.path.dirname(os.path.abspath(__file__))),
+                          host_info(pygame=pygame.version.ver,
+                                    sdl=".".join(str(part) for part in pygame.get_sdl_version())),
+                          replay=args.replay, exit_status="ok" if error_type is None else error_type.__name__)
+        if tracer is not None:
+            tracer.dump(args.trace)
+            set_tracer(None)
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+        if scene_reloader is not None:
+            scene_reloader.close()
+        if pipeline is not None:
+            pipeline.close()
+        if tiled_renderer is not None:
+            tiled_renderer.close()
+        if stream_renderer is not None:
+            stream_renderer.close()
+        if large_scene:
+            peak = peak_rss_bytes()
+            if peak is not None:
+                print(f"Large scene peak RSS: {peak / (1024 * 1024):.1f} MB")
 
     pygame.quit()
 
 
 if __name__ == "__main__":
-    main()
+    freeze_support()  # 打包后的程序使用进程池时需要
+    cli_args = parse_args()
+    apply_particle_overrides(cli_args)
+    if cli_args.bake_scene:
+        bake_scene(cli_args.bake_scene)
+    elif cli_args.memory_report:
+        report_memory(cli_args.project_tree, cli_args.project_ground, cli_args.memory_budget_mb)
+    elif cli_args.thread_scaling:
+        report_thread_scaling(cli_args.thread_scaling)
+    elif cli_args.preview:
+        run_preview(cli_args.preview, cli_args.window_id)
+    else:
+        main(cli_args)
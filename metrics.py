@@ -0,0 +1,239 @@
+"""
+运行指标导出
+在后台线程中通过本地 HTTP 端口或 Unix 域套接字提供 Prometheus 文本格式指标，
+抓取过程只读取快照数据，不会阻塞渲染循环
+"""
+import numbers
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+# ============================================================================
+# 进程内存
+# ============================================================================
+
+def current_rss_bytes() -> Optional[int]:
+    """返回当前常驻内存（字节），平台不支持时返回 None"""
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """返回进程峰值常驻内存（字节），平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# ============================================================================
+# 指标存储
+# ============================================================================
+
+def format_sample(value: float) -> str:
+    """样本值的文本形式：整数原样输出（大计数器不丢精度），浮点数用 repr 保留全部有效位"""
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    return repr(float(value))
+
+
+class FrameMetrics:
+    """渲染循环写入、导出线程读取的指标快照"""
+
+    def __init__(self, target_fps: int, history: int = 600, drop_threshold: float = 1.5):
+        """
+        初始化指标存储
+
+        Args:
+            target_fps: 目标帧率（Config.FPS）
+            history: 用于计算分位数的帧时间样本数量
+            drop_threshold: 帧时间超过帧预算的多少倍视为掉帧
+        """
+        self.target_fps = target_fps
+        self.drop_threshold_ms = 1000.0 / target_fps * drop_threshold
+        self.frame_times: Deque[float] = deque(maxlen=history)  # 毫秒
+        self.frames_total = 0
+        self.dropped_frames = 0
+        self.startup_seconds: Optional[float] = None
+        self.particle_counts: Dict[str, int] = {}
+        self._caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+        self._pools: Dict[str, Callable[[], Tuple[int, int, int]]] = {}
+
+    def record_frame(self, frame_ms: float) -> None:
+        """记录一帧的帧时间（由渲染循环调用，只做追加和计数）"""
+        self.frame_times.append(frame_ms)
+        self.frames_total += 1
+        if frame_ms > self.drop_threshold_ms:
+            self.dropped_frames += 1
+
+    def set_particle_count(self, layer: str, count: int) -> None:
+        """设置某个粒子层的粒子数量"""
+        self.particle_counts[layer] = count
+
+    def register_cache(self, name: str, stats: Callable[[], Tuple[int, int]]) -> None:
+        """注册缓存统计回调，回调返回 (命中次数, 未命中次数)"""
+        self._caches[name] = stats
+
+    def register_pool(self, name: str, stats: Callable[[], Tuple[int, int, int]]) -> None:
+        """注册固定容量对象池的统计回调，回调返回 (使用中数量, 容量, 累计丢弃数量)"""
+        self._pools[name] = stats
+
+    def render_prometheus(self) -> str:
+        """生成 Prometheus 文本格式的指标"""
+        samples = sorted(list(self.frame_times))
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, values: List[Tuple[str, float]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                lines.append(f"{name}{labels} {format_sample(value)}")
+
+        if samples:
+            quantiles = []
+            for q in (0.5, 0.9, 0.99):
+                index = min(len(samples) - 1, int(q * len(samples)))
+                quantiles.append((f'{{quantile="{q}"}}', samples[index] / 1000.0))
+            metric("xmas_frame_time_seconds", "summary",
+                   "Frame time over the most recent frames.", quantiles)
+            lines.append(f"xmas_frame_time_seconds_sum {format_sample(sum(samples) / 1000.0)}")
+            lines.append(f"xmas_frame_time_seconds_count {len(samples)}")
+            achieved = 1000.0 * len(samples) / sum(samples) if sum(samples) > 0 else 0.0
+            metric("xmas_fps", "gauge", "Achieved frames per second.", [("", achieved)])
+
+        metric("xmas_target_fps", "gauge", "Configured frame rate (Config.FPS).",
+               [("", self.target_fps)])
+        metric("xmas_frames_total", "counter", "Frames rendered since start.",
+               [("", self.frames_total)])
+        metric("xmas_dropped_frames_total", "counter",
+               "Frames that exceeded the frame budget by the drop threshold.",
+               [("", self.dropped_frames)])
+
+        if self.particle_counts:
+            metric("xmas_particles", "gauge", "Particles per layer.",
+                   [(f'{{layer="{layer}"}}', count)
+                    for layer, count in list(self.particle_counts.items())])
+
+        cache_stats = [(name, stats()) for name, stats in list(self._caches.items())]
+        if cache_stats:
+            metric("xmas_cache_hits_total", "counter", "Cache hits.",
+                   [(f'{{cache="{name}"}}', hits) for name, (hits, _) in cache_stats])
+            metric("xmas_cache_misses_total", "counter", "Cache misses.",
+                   [(f'{{cache="{name}"}}', misses) for name, (_, misses) in cache_stats])
+            metric("xmas_cache_hit_ratio", "gauge", "Cache hit ratio.",
+                   [(f'{{cache="{name}"}}', hits / (hits + misses) if hits + misses else 0.0)
+                    for name, (hits, misses) in cache_stats])
+
+        pool_stats = [(name, stats()) for name, stats in list(self._pools.items())]
+        if pool_stats:
+            metric("xmas_pool_in_use", "gauge", "Occupied slots in fixed-capacity pools.",
+                   [(f'{{pool="{name}"}}', in_use) for name, (in_use, _, _) in pool_stats])
+            metric("xmas_pool_capacity", "gauge", "Capacity of fixed-capacity pools.",
+                   [(f'{{pool="{name}"}}', capacity) for name, (_, capacity, _) in pool_stats])
+            metric("xmas_pool_dropped_total", "counter", "Items dropped because the pool was full.",
+                   [(f'{{pool="{name}"}}', dropped) for name, (_, _, dropped) in pool_stats])
+
+        rss = current_rss_bytes()
+        if rss is not None:
+            metric("xmas_resident_memory_bytes", "gauge", "Resident set size.", [("", rss)])
+        peak = peak_rss_bytes()
+        if peak is not None:
+            metric("xmas_peak_resident_memory_bytes", "gauge", "Peak resident set size.",
+                   [("", peak)])
+
+        if self.startup_seconds is not None:
+            metric("xmas_startup_seconds", "gauge",
+                   "Time from process start to the first rendered frame.",
+                   [("", self.startup_seconds)])
+
+        return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# 导出服务
+# ============================================================================
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """返回指标文本的HTTP处理器"""
+
+    def do_GET(self) -> None:
+        """任意路径都返回完整指标"""
+        body = self.server.metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        """Unix 域套接字没有客户端地址"""
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        """不输出访问日志"""
+
+
+if hasattr(socket, "AF_UNIX"):
+    class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+        """监听 Unix 域套接字的HTTP服务（可用 curl --unix-socket 抓取）"""
+
+        daemon_threads = True
+
+
+class MetricsExporter:
+    """在守护线程中运行的指标导出服务"""
+
+    def __init__(self, metrics: FrameMetrics, port: Optional[int] = None,
+                 socket_path: Optional[str] = None):
+        """
+        初始化导出服务（只监听本机）
+
+        Args:
+            metrics: 指标存储
+            port: 本机 HTTP 端口（127.0.0.1）
+            socket_path: Unix 域套接字路径，与 port 二选一
+        """
+        if socket_path:
+            if not hasattr(socket, "AF_UNIX"):
+                raise OSError("Unix domain sockets are not supported on this platform")
+            # 只清理上次运行遗留的套接字，路径写错指向普通文件时拒绝启动而不是删除它
+            if os.path.lexists(socket_path):
+                if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                    raise OSError(f"{socket_path} exists and is not a socket")
+                os.unlink(socket_path)
+            self.server = _UnixHTTPServer(socket_path, _MetricsHandler)
+            self.address = socket_path
+        else:
+            self.server = ThreadingHTTPServer(("127.0.0.1", port or 0), _MetricsHandler)
+            self.server.daemon_threads = True
+            self.address = f"http://127.0.0.1:{self.server.server_address[1]}/metrics"
+        self.socket_path = socket_path
+        self.server.metrics = metrics
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        name="metrics-exporter", daemon=True)
+
+    def start(self) -> None:
+        """启动后台线程"""
+        self._thread.start()
+        print(f"Metrics exporter listening: {self.address}")
+
+    def stop(self) -> None:
+        """停止服务并清理套接字文件"""
+        self.server.shutdown()
+        self.server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
@@ -0,0 +1,117 @@
+"""
+8 位调色板渲染
+场景只有几十种基础颜色，每种颜色按雾化程度向背景色过渡，因此可以用
+「基础颜色 × 雾化等级」构成的 256 色调色板表示整帧：清屏、光栅化和缩放只处理 1 字节的像素，
+调色板展开为屏幕颜色由 SDL 在最后一次 blit 中完成
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+Color = Tuple[int, int, int]
+
+# 背景色固定使用 0 号索引（清屏时直接填充 0）
+BG_INDEX = 0
+PALETTE_SIZE = 256
+# 未登记颜色的缓存上限（例如逐帧淡出的火花颜色）
+MAX_LOOSE_COLORS = 4096
+
+
+def _distance(a: Color, b: Color) -> int:
+    """RGB 欧氏距离的平方"""
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+def _mix(color: Color, bg_color: Color, fog: float) -> Color:
+    """按雾化比例把颜色混合到背景色（与 Particle._apply_fog 相同的取整方式）"""
+    return tuple(int(c * (1 - fog) + b * fog) for c, b in zip(color, bg_color))
+
+
+def cluster_colors(weights: Dict[Color, int], count: int, iterations: int = 8) -> List[Color]:
+    """
+    把带权重（粒子数量）的颜色聚成最多 count 种代表色
+
+    先按最远点选取初始中心（从数量最多的颜色开始），再做几轮加权 k-means；
+    颜色种类不超过 count 时原样返回。
+    """
+    colors = sorted(weights, key=lambda color: -weights[color])
+    if len(colors) <= count:
+        return colors
+    centers = [colors[0]]
+    nearest = {color: _distance(color, centers[0]) for color in colors}
+    while len(centers) < count:
+        farthest = max(colors, key=lambda color: nearest[color])
+        centers.append(farthest)
+        for color in colors:
+            nearest[color] = min(nearest[color], _distance(color, farthest))
+
+    for _ in range(iterations):
+        sums = [[0, 0, 0, 0] for _ in centers]
+        for color in colors:
+            best = min(range(len(centers)), key=lambda i: _distance(color, centers[i]))
+            weight = weights[color]
+            total = sums[best]
+            for channel in range(3):
+                total[channel] += color[channel] * weight
+            total[3] += weight
+        updated = [tuple(int(round(total[channel] / total[3])) for channel in range(3)) if total[3] else center
+                   for center, total in zip(centers, sums)]
+        if updated == centers:
+            break
+        centers = updated
+    return centers
+
+
+class FogPalette:
+    """「基础颜色 × 雾化等级」调色板，以及从粒子颜色和雾化比例到调色板索引的查找"""
+
+    def __init__(self, colors: Iterable[Color], bg_color: Color, fog_levels: int = 12):
+        """
+        根据场景中出现的颜色建立调色板
+
+        Args:
+            colors: 场景中各粒子的颜色（可以重复，出现次数作为聚类权重）
+            bg_color: 背景色（雾化的终点，也是 0 号索引）
+            fog_levels: 每种基础颜色的雾化等级数（含未雾化和完全雾化两端）
+        """
+        weights = Counter(colors)
+        self.bg_color = tuple(bg_color)
+        self.fog_levels = max(2, fog_levels)
+        self._steps = self.fog_levels - 1
+        base_count = max(1, (PALETTE_SIZE - 1) // self.fog_levels)
+        self.base_colors = cluster_colors(weights, base_count)
+
+        self.colors: List[Color] = [self.bg_color]
+        for base in self.base_colors:
+            for level in range(self.fog_levels):
+                self.colors.append(_mix(base, self.bg_color, level / self._steps))
+
+        # 场景颜色 -> 所属基础颜色第 0 级（未雾化）的索引
+        self._base_index: Dict[Color, int] = {color: self._nearest_base(color) for color in weights}
+        # 未登记颜色 -> (基础颜色索引, 自身已有的雾化比例)
+        self._loose: Dict[Color, Tuple[int, float]] = {}
+
+    def _nearest_base(self, color: Color) -> int:
+        """最接近的基础颜色第 0 级的索引"""
+        best = min(range(len(self.base_colors)), key=lambda i: _distance(color, self.base_colors[i]))
+        return 1 + best * self.fog_levels
+
+    def _nearest_entry(self, color: Color) -> Tuple[int, float]:
+        """最接近的调色板项，拆分为 (基础颜色索引, 该项的雾化比例)"""
+        best = min(range(1, len(self.colors)), key=lambda i: _distance(color, self.colors[i]))
+        level = (best - 1) % self.fog_levels
+        return best - level, level / self._steps
+
+    def index(self, color: Color, fog_factor: float) -> int:
+        """颜色 color 雾化 fog_factor 后对应的调色板索引"""
+        base = self._base_index.get(color)
+        if base is not None:
+            return base + int(fog_factor * self._steps + 0.5)
+        # 不在场景中的颜色（淡出的火花）：先找最接近的调色板项，再在它已有的雾化上叠加
+        entry = self._loose.get(color)
+        if entry is None:
+            if len(self._loose) >= MAX_LOOSE_COLORS:
+                self._loose.clear()
+            entry = self._loose[color] = self._nearest_entry(color)
+        base, fog = entry
+        combined = 1.0 - (1.0 - fog) * (1.0 - fog_factor)
+        return base + int(combined * self._steps + 0.5)
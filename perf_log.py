@@ -0,0 +1,420 @@
+"""
+帧耗时回归日志
+退出时把本次运行的摘要（启动各阶段耗时、帧耗时分位数、渲染质量设置、粒子数量、主机信息）
+追加到本地 JSON Lines 日志，日志按大小轮转，占用的磁盘空间有上限；
+命令行工具比较两份日志或按版本列出趋势，用于分批升级展示机后找出变慢的机器和版本
+
+使用方法：
+  python main.py --perf-log                                 # 写入用户缓存目录下的 perf.jsonl
+  python perf_log.py trend perf.jsonl                       # 按版本列出趋势
+  python perf_log.py diff before.jsonl after.jsonl          # 按主机比较两份日志
+"""
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# 日志格式变化时递增（读取时跳过其他版本的记录）
+LOG_VERSION = 1
+
+# 帧耗时直方图：0.25 ms 一档，超过 1 秒的帧计入最后一档（最大值单独精确记录）
+HISTOGRAM_BUCKET_MS = 0.25
+HISTOGRAM_BUCKETS = 4000
+
+
+# ============================================================================
+# 运行期间收集
+# ============================================================================
+
+class FrameTimeHistogram:
+    """固定大小的帧耗时直方图：长时间运行的展示机也只占用固定内存"""
+
+    def __init__(self, budget_ms: float):
+        """
+        Args:
+            budget_ms: 帧时间预算（毫秒），超出的帧在记录时精确计数，不受分档宽度影响
+        """
+        self.budget_ms = budget_ms
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.over_budget = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value_ms: float) -> None:
+        """记录一帧的耗时（毫秒）"""
+        bucket = min(HISTOGRAM_BUCKETS - 1, int(value_ms / HISTOGRAM_BUCKET_MS))
+        self.counts[bucket] += 1
+        self.count += 1
+        if value_ms > self.budget_ms:
+            self.over_budget += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, fraction: float) -> float:
+        """百分位数（最近秩法，取所在档的上沿，不超过最大值）"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(self.max, (bucket + 1) * HISTOGRAM_BUCKET_MS), 3)
+        return round(self.max, 3)
+
+    def summary(self) -> Dict[str, float]:
+        """与 session_replay.frame_time_summary 相同字段的汇总"""
+        return {
+            "frames": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 3),
+            "over_budget": self.over_budget,
+        }
+
+
+class RunLog:
+    """收集一次运行的启动阶段耗时和帧耗时，退出时追加到回归日志"""
+
+    def __init__(self, path: str, origin: float, max_bytes: int, backups: int, budget_ms: float):
+        """
+        开始记录
+
+        Args:
+            path: 日志路径（JSON Lines，每行一次运行）
+            origin: 启动计时的起点（time.perf_counter() 的值，通常是进程启动时间）
+            max_bytes: 单个日志文件的大小上限，超过后轮转
+            backups: 保留的轮转文件数量（path.1 ... path.N）
+            budget_ms: 帧时间预算（目标帧率对应的毫秒数）
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.started = time.time()
+        self.startup: Dict[str, float] = {}  # 启动阶段 -> 耗时（毫秒），按发生顺序
+        self.frame_times = FrameTimeHistogram(budget_ms)  # 完整帧时间（含帧率限制等待）
+        self.work_times = FrameTimeHistogram(budget_ms)   # 帧开始到呈现完成（不含等待）
+        self._last_mark = origin
+
+    def mark_startup(self, phase: str) -> None:
+        """结束一个启动阶段：记录自上一个阶段结束以来的耗时"""
+        now = time.perf_counter()
+        self.startup[phase] = round((now - self._last_mark) * 1000.0, 1)
+        self._last_mark = now
+
+    def record_frame(self, frame_ms: float) -> None:
+        """记录上一帧的完整帧时间"""
+        self.frame_times.add(frame_ms)
+
+    def end_frame(self, work_ms: float) -> None:
+        """记录本帧呈现完成时的工作耗时；第一帧同时结束 first_frame 启动阶段"""
+        if not self.work_times.count:
+            self.mark_startup("first_frame")
+        self.work_times.add(work_ms)
+
+    def close(self, particles: Dict[str, int], quality: Dict[str, object],
+              release: str, host: Dict[str, object], replay: Optional[str] = None,
+              exit_status: str = "ok") -> None:
+        """
+        把本次运行的摘要追加到日志（写入失败只打印提示，不影响退出）
+
+        Args:
+            particles: 各粒子层的粒子数量
+            quality: 本次运行实际生效的渲染设置
+            release: 版本标识（见 release_id）
+            host: 主机信息（见 host_info）
+            replay: 回放的会话文件（正常运行为 None）
+            exit_status: "ok" 或导致退出的异常类型名
+        """
+        startup = dict(self.startup)
+        startup["total"] = round(sum(self.startup.values()), 1)
+        entry = {
+            "version": LOG_VERSION,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "duration_s": round(time.time() - self.started, 1),
+            "release": release,
+            "host": host,
+            "replay": replay,
+            "exit": exit_status,
+            "startup_ms": startup,
+            "frame_ms": self.frame_times.summary(),
+            "work_ms": self.work_times.summary(),
+            "quality": quality,
+            "particles": particles,
+        }
+        try:
+            append_entry(self.path, entry, self.max_bytes, self.backups)
+            print(f"Appended run summary to {self.path}")
+        except OSError as error:
+            print(f"Failed to write performance log {self.path}: {error}")
+
+
+def host_info(**extra: object) -> Dict[str, object]:
+    """主机信息（主机名、系统、CPU、Python 版本），extra 中的字段一并记录"""
+    info: Dict[str, object] = {
+        "name": platform.node(),
+        "os": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+    info.update(extra)
+    return info
+
+
+def release_id(program_dir: str) -> str:
+    """
+    版本标识：环境变量 XMAS_RELEASE，未设置时使用程序内容的摘要
+
+    打包后的程序对可执行文件求摘要；源码运行时对 program_dir 下所有模块（*.py，按文件名排序，
+    文件名和内容一起计入）求摘要，任何一个模块改动都会得到新的标识，同一构建在所有机器上相同。
+    """
+    release = os.environ.get("XMAS_RELEASE")
+    if release:
+        return release
+    if getattr(sys, "frozen", False):
+        targets = [sys.executable]
+    else:
+        targets = sorted(glob.glob(os.path.join(program_dir, "*.py")))
+    if not targets:
+        return "unknown"
+    digest = hashlib.sha1()
+    try:
+        for target in targets:
+            digest.update(os.path.basename(target).encode("utf-8") + b"\0")
+            with open(target, "rb") as program:
+                for block in iter(lambda: program.read(1 << 20), b""):
+                    digest.update(block)
+    except OSError:
+        return "unknown"
+    return "build-" + digest.hexdigest()[:10]
+
+
+# ============================================================================
+# 日志文件与轮转
+# ============================================================================
+
+def rotate_logs(path: str, backups: int) -> None:
+    """path -> path.1 -> ... -> path.N，最旧的文件被覆盖（backups 为 0 时直接删除 path）"""
+    if backups <= 0:
+        os.remove(path)
+        return
+    for number in range(backups - 1, 0, -1):
+        older = f"{path}.{number}"
+        if os.path.exists(older):
+            os.replace(older, f"{path}.{number + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def append_entry(path: str, entry: Dict[str, object], max_bytes: int, backups: int) -> None:
+    """追加一条记录；写入后会超过 max_bytes 时先轮转（总占用不超过 (backups + 1) × max_bytes）"""
+    line = json.dumps(entry, separators=(",", ":")) + "\n"
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    if size and size + len(line) > max_bytes:
+        rotate_logs(path, backups)
+    with open(path, "a", encoding="utf-8") as log_file:
+        log_file.write(line)
+
+
+def log_files(path: str) -> List[str]:
+    """日志及其轮转文件，从旧到新排列"""
+    directory = os.path.dirname(path) or "."
+    pattern = re.compile(re.escape(os.path.basename(path)) + r"\.(\d+)$")
+    rotated = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            rotated.append((int(match.group(1)), os.path.join(directory, name)))
+    files = [name for _, name in sorted(rotated, reverse=True)]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_entries(path: str) -> List[Dict[str, object]]:
+    """读取日志（含轮转文件）中的全部记录，跳过损坏的行（例如断电时写了一半）和其他版本的记录"""
+    entries = []
+    for name in log_files(path):
+        with open(name, "r", encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get("version") == LOG_VERSION:
+                    entries.append(entry)
+    return entries
+
+
+# ============================================================================
+# 比较与趋势
+# ============================================================================
+
+# 对比指标：名称 -> 从一条记录中取值
+METRICS: Dict[str, Callable[[Dict], float]] = {
+    "work_p50": lambda entry: entry["work_ms"]["p50_ms"],
+    "work_p95": lambda entry: entry["work_ms"]["p95_ms"],
+    "work_p99": lambda entry: entry["work_ms"]["p99_ms"],
+    "frame_p95": lambda entry: entry["frame_ms"]["p95_ms"],
+    "late_pct": lambda entry: 100.0 * entry["frame_ms"]["over_budget"] / max(1, entry["frame_ms"]["frames"]),
+    "startup_ms": lambda entry: entry["startup_ms"]["total"],
+}
+
+# 分组方式：名称 -> 从一条记录中取分组键
+GROUPS: Dict[str, Callable[[Dict], str]] = {
+    "host": lambda entry: entry["host"]["name"],
+    "release": lambda entry: entry["release"],
+    "renderer": lambda entry: entry["quality"].get("renderer", "?"),
+    "all": lambda entry: "(all)",
+}
+
+
+def usable_entries(entries: Sequence[Dict], include_replays: bool = False,
+                   host: Optional[str] = None) -> List[Dict]:
+    """参与统计的记录：有帧数据的运行（默认不含回放），可按主机筛选"""
+    return [entry for entry in entries
+            if entry["work_ms"]["frames"] > 0
+            and (include_replays or not entry.get("replay"))
+            and (host is None or entry["host"]["name"] == host)]
+
+
+def group_entries(entries: Sequence[Dict], group: str) -> Dict[str, List[Dict]]:
+    """按分组键归类，分组按首次出现的顺序排列（日志按时间追加，即按时间先后）"""
+    key_of = GROUPS[group]
+    groups: Dict[str, List[Dict]] = {}
+    for entry in entries:
+        groups.setdefault(key_of(entry), []).append(entry)
+    return groups
+
+
+def median_metric(entries: Sequence[Dict], metric: str) -> float:
+    """一组运行中某项指标的中位数（单次运行的偶发卡顿不影响结果）"""
+    return statistics.median(METRICS[metric](entry) for entry in entries)
+
+
+def format_table(header: Sequence[str], rows: Sequence[Sequence[str]]) -> List[str]:
+    """左列左对齐、其余右对齐的文本表格"""
+    widths = [max(len(str(row[column])) for row in [header, *rows]) for column in range(len(header))]
+    lines = []
+    for row in [header, *rows]:
+        cells = [str(cell).ljust(widths[0]) if column == 0 else str(cell).rjust(widths[column])
+                 for column, cell in enumerate(row)]
+        lines.append("  ".join(cells).rstrip())
+    return lines
+
+
+def trend(entries: Sequence[Dict], group: str) -> List[str]:
+    """每个分组一行：运行次数、主机数量和各项指标的中位数"""
+    header = [group, "runs", "hosts", *METRICS]
+    rows = []
+    for key, members in group_entries(entries, group).items():
+        hosts = len({entry["host"]["name"] for entry in members})
+        rows.append([key, len(members), hosts,
+                     *(f"{median_metric(members, metric):.1f}" for metric in METRICS)])
+    return format_table(header, rows)
+
+
+def diff(old: Sequence[Dict], new: Sequence[Dict], group: str, metric: str,
+         threshold_pct: float) -> Tuple[List[str], int]:
+    """
+    比较两份日志：每个共同分组一行，指标中位数的变化超过 threshold_pct 时标记为变慢
+
+    Returns:
+        (报告行, 变慢的分组数量)
+    """
+    old_groups = group_entries(old, group)
+    new_groups = group_entries(new, group)
+    rows = []
+    regressions = 0
+    for key, members in new_groups.items():
+        if key not in old_groups:
+            continue
+        before = median_metric(old_groups[key], metric)
+        after = median_metric(members, metric)
+        change = (after - before) / before * 100.0 if before else 0.0
+        slower = change > threshold_pct
+        regressions += slower
+        rows.append([key, len(old_groups[key]), len(members), f"{before:.1f}", f"{after:.1f}",
+                     f"{change:+.1f}%", "SLOWER" if slower else ""])
+    lines = format_table([group, "old runs", "new runs", f"old {metric}", f"new {metric}", "change", ""],
+                         rows)
+    unmatched = len(set(old_groups) ^ set(new_groups))
+    if unmatched:
+        lines.append(f"{unmatched} {group} group(s) present in only one log")
+    return lines, regressions
+
+
+# ============================================================================
+# 命令行入口
+# ============================================================================
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    # 两个子命令共用的筛选参数（写在子命令之后）
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--replays", action="store_true", help="统计时包含会话回放的记录")
+    filters.add_argument("--host", help="只统计指定主机的记录")
+
+    parser = argparse.ArgumentParser(description="Compare frame-time regression logs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    trend_parser = commands.add_parser("trend", parents=[filters],
+                                       help="按分组（默认按版本）列出各项指标的中位数")
+    trend_parser.add_argument("logs", nargs="+", help="日志文件（自动包含轮转文件）")
+    trend_parser.add_argument("--by", choices=sorted(GROUPS), default="release")
+
+    diff_parser = commands.add_parser("diff", parents=[filters], help="比较两份日志，变慢的分组以退出码 1 报告")
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+    diff_parser.add_argument("--by", choices=sorted(GROUPS), default="host")
+    diff_parser.add_argument("--metric", choices=sorted(METRICS), default="work_p95")
+    diff_parser.add_argument("--threshold", type=float, default=10.0,
+                             help="视为变慢的变化百分比（默认 10）")
+    return parser.parse_args()
+
+
+def main_cli() -> int:
+    """运行比较或趋势报告，返回进程退出码"""
+    args = parse_args()
+    if args.command == "trend":
+        entries = [entry for path in args.logs for entry in read_entries(path)]
+        entries = usable_entries(entries, args.replays, args.host)
+        if not entries:
+            print("No runs with frame data")
+            return 1
+        for line in trend(entries, args.by):
+            print(line)
+        return 0
+
+    old = usable_entries(read_entries(args.old), args.replays, args.host)
+    new = usable_entries(read_entries(args.new), args.replays, args.host)
+    lines, regressions = diff(old, new, args.by, args.metric, args.threshold)
+    for line in lines:
+        print(line)
+    if regressions:
+        print(f"{regressions} {args.by} group(s) slower by more than {args.threshold:g}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,386 @@
+"""
+性能分析工具
+帧阶段计时、可切换的性能浮层（HUD）、Chrome Trace 区间记录与 cProfile 采样
+"""
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pygame
+
+
+# 粒子绘制方式（Particle.draw 的返回值）
+DRAW_SKIPPED = 0   # 被剔除或点画时随机跳过
+DRAW_PIXEL = 1     # 单像素
+DRAW_CIRCLE = 2    # 圆形
+DRAW_GLOW = 3      # 圆形 + 辉光
+
+
+# ============================================================================
+# Chrome Trace 区间记录
+# ============================================================================
+
+class SpanTracer:
+    """用有界环形缓冲区记录耗时区间，并导出为 Chrome Trace Event JSON"""
+
+    def __init__(self, capacity: int = 200000):
+        """
+        初始化区间记录器
+
+        Args:
+            capacity: 最多保留的区间数量，超出后丢弃最旧的记录
+        """
+        self.spans: Deque[Tuple[str, str, float, float, int]] = deque(maxlen=capacity)
+        self.origin = time.perf_counter()
+
+    def add(self, name: str, start: float, end: float, category: str = "frame") -> None:
+        """记录一个区间（start/end 为 time.perf_counter() 的返回值）"""
+        self.spans.append((name, category, start, end, threading.get_ident()))
+
+    def dump(self, path: str) -> None:
+        """将缓冲区写出为 Chrome Trace Event JSON（可用 Perfetto 或 chrome://tracing 打开）"""
+        pid = os.getpid()
+        thread_ids: Dict[int, int] = {}
+        events = []
+        for name, category, start, end, ident in self.spans:
+            tid = thread_ids.setdefault(ident, len(thread_ids) + 1)
+            events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 3),
+                "dur": round((end - start) * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+            })
+        for ident, tid in thread_ids.items():
+            thread = next((t for t in threading.enumerate() if t.ident == ident), None)
+            events.append({
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": thread.name if thread else f"thread-{tid}"},
+            })
+
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+        print(f"Trace written: {path} ({len(self.spans)} spans)")
+
+
+# 当前启用的区间记录器（None 表示未启用）
+_active_tracer: Optional[SpanTracer] = None
+
+
+def set_tracer(tracer: Optional[SpanTracer]) -> None:
+    """设置全局区间记录器，传入 None 关闭记录"""
+    global _active_tracer
+    _active_tracer = tracer
+
+
+def get_tracer() -> Optional[SpanTracer]:
+    """返回当前启用的区间记录器"""
+    return _active_tracer
+
+
+@contextmanager
+def _traced_span(tracer: SpanTracer, name: str, category: str) -> Iterator[None]:
+    """记录 with 块耗时的上下文管理器"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.add(name, start, time.perf_counter(), category)
+
+
+class _NullSpan:
+    """未启用记录时使用的空上下文管理器"""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, category: str = "app"):
+    """
+    记录一段代码的耗时区间
+
+    未启用记录时返回共享的空上下文管理器，开销只有一次属性检查。
+    """
+    tracer = _active_tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return _traced_span(tracer, name, category)
+
+
+# ============================================================================
+# cProfile 采样
+# ============================================================================
+
+class FrameRangeProfile:
+    """在前N帧运行 cProfile，结束后写出 .pstats 文件"""
+
+    def __init__(self, frames: int, output_path: str):
+        """
+        初始化帧范围采样
+
+        Args:
+            frames: 采样的帧数
+            output_path: .pstats 输出路径
+        """
+        self.frames = frames
+        self.output_path = output_path
+        self._profile = cProfile.Profile()
+        self._frame = 0
+        self.active = False
+
+    def start(self) -> None:
+        """开始采样"""
+        self._profile.enable()
+        self.active = True
+
+    def on_frame(self) -> None:
+        """每帧结束时调用，达到帧数后自动停止并写出结果"""
+        if not self.active:
+            return
+        self._frame += 1
+        if self._frame >= self.frames:
+            self.stop()
+
+    def stop(self) -> None:
+        """停止采样并写出 .pstats"""
+        if not self.active:
+            return
+        self._profile.disable()
+        self.active = False
+        self._profile.dump_stats(self.output_path)
+        print(f"cProfile stats written: {self.output_path} ({self._frame} frames)")
+
+
+# ============================================================================
+# 帧阶段计时
+# ============================================================================
+
+class FrameProfiler:
+    """记录每帧各阶段耗时及帧时间历史"""
+
+    def __init__(self, history: int = 240, smoothing: float = 0.1,
+                 tracer: Optional[SpanTracer] = None):
+        """
+        初始化帧计时器
+
+        Args:
+            history: 保留的帧时间样本数量
+            smoothing: 阶段耗时指数平滑系数（越大越灵敏）
+            tracer: 可选的区间记录器，启用后每个阶段和每帧都会记录为区间
+        """
+        self.smoothing = smoothing
+        self.tracer = tracer
+        self.frame_times: Deque[float] = deque(maxlen=history)  # 毫秒
+        self.stage_order: List[str] = []
+        self.stage_last: Dict[str, float] = {}  # 最近一帧的阶段耗时（毫秒）
+        self.stage_avg: Dict[str, float] = {}   # 平滑后的阶段耗时（毫秒）
+        self.frame_count = 0
+        self._frame_start = 0.0
+        self._last_mark = 0.0
+
+    def begin_frame(self) -> None:
+        """开始新的一帧，并记录上一帧的完整帧时间"""
+        now = time.perf_counter()
+        if self._frame_start:
+            self.frame_times.append((now - self._frame_start) * 1000.0)
+            self.frame_count += 1
+            if self.tracer is not None:
+                self.tracer.add("frame", self._frame_start, now)
+        self._frame_start = now
+        self._last_mark = now
+
+    def mark(self, stage: str) -> None:
+        """结束一个阶段：记录自上一个标记以来的耗时"""
+        now = time.perf_counter()
+        duration = (now - self._last_mark) * 1000.0
+        if self.tracer is not None:
+            self.tracer.add(stage, self._last_mark, now, "stage")
+        self._last_mark = now
+
+        previous = self.stage_avg.get(stage)
+        if previous is None:
+            self.stage_order.append(stage)
+            self.stage_avg[stage] = duration
+        else:
+            self.stage_avg[stage] = previous + (duration - previous) * self.smoothing
+        self.stage_last[stage] = duration
+
+    def skip(self) -> None:
+        """丢弃自上一个标记以来的时间（不计入任何阶段，例如等待垂直同步）"""
+        self._last_mark = time.perf_counter()
+
+    @property
+    def last_frame_time(self) -> float:
+        """最近一帧的帧时间（毫秒）"""
+        return self.frame_times[-1] if self.frame_times else 0.0
+
+    @property
+    def elapsed(self) -> float:
+        """本帧开始以来经过的时间（毫秒）"""
+        return (time.perf_counter() - self._frame_start) * 1000.0
+
+    def average_frame_time(self, samples: int = 60) -> float:
+        """最近若干帧的平均帧时间（毫秒）"""
+        if not self.frame_times:
+            return 0.0
+        recent = list(self.frame_times)[-samples:]
+        return sum(recent) / len(recent)
+
+    def work_time(self) -> float:
+        """平滑后的各阶段耗时总和（毫秒），即不含帧率限制等待的工作时间"""
+        return sum(self.stage_avg.values())
+
+
+# ============================================================================
+# 性能浮层
+# ============================================================================
+
+class PerformanceHUD:
+    """显示FPS、帧时间曲线、阶段耗时和粒子绘制统计的浮层"""
+
+    def __init__(self, profiler: FrameProfiler, target_fps: int,
+                 refresh_hz: float = 4.0, position: Tuple[int, int] = (16, 16)):
+        """
+        初始化性能浮层
+
+        Args:
+            profiler: 数据来源的帧计时器
+            target_fps: 目标帧率（用于绘制帧预算参考线）
+            refresh_hz: 浮层内容每秒重绘次数，其余帧只做一次blit
+            position: 浮层左上角位置
+        """
+        self.profiler = profiler
+        self.target_fps = target_fps
+        self.refresh_interval_ms = 1000.0 / refresh_hz
+        self.position = position
+        self.visible = False
+
+        self.draw_counts: Sequence[int] = (0, 0, 0, 0)
+        self._pools: Dict[str, Callable[[], Tuple[int, int, int]]] = {}
+        self._font: Optional[pygame.font.Font] = None
+        self._surface: Optional[pygame.Surface] = None
+        self._last_refresh = -self.refresh_interval_ms
+
+        # 布局参数
+        self.width = 300
+        self.line_height = 16
+        self.graph_height = 60
+        self.padding = 8
+
+    def toggle(self) -> None:
+        """切换浮层显示状态"""
+        self.visible = not self.visible
+        # 重新显示时立即刷新内容
+        self._last_refresh = -self.refresh_interval_ms
+
+    def register_pool(self, name: str, stats: Callable[[], Tuple[int, int, int]]) -> None:
+        """注册固定容量对象池，浮层显示 (使用中数量, 容量, 累计丢弃数量)"""
+        self._pools[name] = stats
+
+    def set_draw_counts(self, counts: Sequence[int]) -> None:
+        """更新本帧各绘制方式的粒子数量（按 DRAW_* 索引）"""
+        self.draw_counts = counts
+
+    def update(self, current_time: int) -> None:
+        """按刷新频率重绘浮层内容"""
+        if not self.visible:
+            return
+        if current_time - self._last_refresh < self.refresh_interval_ms:
+            return
+        self._last_refresh = current_time
+        self._surface = self._render()
+
+    def overlay(self) -> Optional[Tuple[pygame.Surface, Tuple[int, int], int]]:
+        """缓存的浮层：(表面, 位置, 混合标志)，隐藏时返回 None"""
+        if self.visible and self._surface is not None:
+            return self._surface, self.position, 0
+        return None
+
+    def draw(self, surface: pygame.Surface) -> None:
+        """将缓存的浮层绘制到目标表面"""
+        if self.visible and self._surface is not None:
+            surface.blit(self._surface, self.position)
+
+    def _get_font(self) -> pygame.font.Font:
+        """懒加载等宽字体，避免影响启动时间"""
+        if self._font is None:
+            self._font = pygame.font.SysFont('monospace', 14)
+        return self._font
+
+    def _build_lines(self) -> List[str]:
+        """生成浮层文本行"""
+        profiler = self.profiler
+        avg_frame = profiler.average_frame_time()
+        fps = 1000.0 / avg_frame if avg_frame > 0 else 0.0
+
+        lines = [
+            f"FPS {fps:5.1f} / {self.target_fps}",
+            f"frame {avg_frame:5.2f} ms  work {profiler.work_time():5.2f} ms",
+        ]
+        for stage in profiler.stage_order:
+            lines.append(f"  {stage:<10}{profiler.stage_avg[stage]:6.2f} ms")
+
+        pixels = self.draw_counts[DRAW_PIXEL]
+        glows = self.draw_counts[DRAW_GLOW]
+        circles = self.draw_counts[DRAW_CIRCLE] + glows
+        lines.append(f"pixels {pixels}  circles {circles}  glows {glows}")
+        for name, stats in self._pools.items():
+            in_use, capacity, dropped = stats()
+            lines.append(f"{name} {in_use}/{capacity}  dropped {dropped}")
+        return lines
+
+    def _render(self) -> pygame.Surface:
+        """渲染浮层（文本 + 帧时间曲线）到一张半透明表面"""
+        font = self._get_font()
+        lines = self._build_lines()
+        height = self.padding * 3 + len(lines) * self.line_height + self.graph_height
+
+        hud_surface = pygame.Surface((self.width, height), pygame.SRCALPHA)
+        hud_surface.fill((0, 0, 0, 170))
+
+        y = self.padding
+        for line in lines:
+            hud_surface.blit(font.render(line, True, (220, 255, 220)), (self.padding, y))
+            y += self.line_height
+
+        self._draw_graph(hud_surface, pygame.Rect(
+            self.padding, y + self.padding,
+            self.width - self.padding * 2, self.graph_height
+        ))
+        return hud_surface
+
+    def _draw_graph(self, surface: pygame.Surface, rect: pygame.Rect) -> None:
+        """绘制帧时间曲线，纵轴上限为两倍帧预算"""
+        pygame.draw.rect(surface, (255, 255, 255, 30), rect)
+
+        budget_ms = 1000.0 / self.target_fps
+        max_ms = budget_ms * 2
+        budget_y = rect.bottom - int(rect.height * 0.5)
+        pygame.draw.line(surface, (255, 200, 80, 160), (rect.left, budget_y), (rect.right - 1, budget_y))
+
+        samples = list(self.profiler.frame_times)[-rect.width:]
+        if len(samples) < 2:
+            return
+
+        points = []
+        start_x = rect.right - len(samples)
+        for i, frame_ms in enumerate(samples):
+            ratio = min(frame_ms, max_ms) / max_ms
+            points.append((start_x + i, rect.bottom - 1 - int(ratio * (rect.height - 1))))
+        pygame.draw.lines(surface, (120, 255, 140), False, points)
@@ -1,6 +1,8 @@
 """
 Windows 屏保包装器
 处理 Windows 屏保的命令行参数
+
+其他平台上可以用 `python screensaver.py /p` 或 `python main.py --preview` 在独立小窗口中运行预览模式
 """
 import sys
 import os
@@ -8,7 +10,7 @@ import os
 # Windows 屏保命令行参数：
 # /s - 运行屏保
 # /c - 显示配置对话框
-# /p <hwnd> - 在预览窗口中显示
+# /p <hwnd> - 在预览窗口中显示（也可能写作 /p:<hwnd>）
 # 无参数 - 当作 /c 处理
 
 def main():
@@ -23,10 +25,8 @@ def main():
             # 配置对话框（可选实现）
             show_config_dialog()
         elif arg.startswith('/p'):
-            # 预览模式（在小窗口中显示）
-            # 这个模式比较复杂，通常可以忽略
-            print("预览模式暂不支持")
-            sys.exit(0)
+            # 预览模式（在设置面板的小窗口中显示）
+            run_preview(parse_window_id(sys.argv[1:]))
         else:
             # 默认运行屏保
             run_screensaver()
@@ -47,6 +47,22 @@ def run_screensaver():
     main.main()
 
 
+def parse_window_id(args):
+    """从 /p <hwnd> 或 /p:<hwnd> 中取出宿主窗口句柄，没有时返回 None"""
+    value = args[0][2:].lstrip(':') or (args[1] if len(args) > 1 else '')
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def run_preview(window_id):
+    """运行预览模式（低分辨率、无音乐，设置面板关闭时退出）"""
+    import main
+
+    main.run_preview(window_id=window_id)
+
+
 def show_config_dialog():
     """显示配置对话框（简单实现）"""
     import tkinter as tk
@@ -0,0 +1,191 @@
+"""
+交互会话录制与回放
+把主循环收到的 pygame 事件连同时间戳录制到 JSON Lines 文件，
+回放时不打开窗口、以固定时间步长和固定随机种子重放同一组输入，并统计帧耗时，
+把真实用户遇到的卡顿变成可重复的性能测试
+"""
+import hashlib
+import json
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pygame
+
+
+# 文件格式变化时递增
+SESSION_VERSION = 2
+
+# 录制的事件类型（按 pygame 常量名保存，与 pygame 版本无关）
+RECORDED_EVENTS = ("QUIT", "KEYDOWN", "KEYUP", "MOUSEBUTTONDOWN", "MOUSEBUTTONUP",
+                   "MOUSEMOTION", "MOUSEWHEEL")
+# 录制的事件属性（不存在的属性跳过）
+EVENT_ATTRIBUTES = ("pos", "rel", "buttons", "button", "key", "mod", "unicode", "scancode",
+                    "x", "y", "flipped")
+
+_RECORDED_TYPES = {getattr(pygame, name): name for name in RECORDED_EVENTS}
+
+
+# ============================================================================
+# 录制
+# ============================================================================
+
+class SessionRecorder:
+    """把每帧收到的事件按帧时间戳写入会话文件"""
+
+    def __init__(self, path: str, screen_size: Tuple[int, int], fps: int, seed: int,
+                 settings: Dict[str, object]):
+        """
+        创建会话文件并写入文件头
+
+        Args:
+            path: 输出路径（JSON Lines，第一行为文件头，之后每行一个事件）
+            screen_size: 窗口尺寸（事件坐标是窗口坐标，回放时使用相同尺寸）
+            fps: 录制时的目标帧率（回放的固定时间步长）
+            seed: 运行时随机数种子（雪花重生位置、点画等）
+            settings: 决定场景和渲染路径的设置（场景种子、粒子数量、配置文件摘要、渲染参数）
+        """
+        self.path = path
+        self.event_count = 0
+        self._file = open(path, "w", encoding="utf-8")
+        header = {"version": SESSION_VERSION, "screen_size": list(screen_size), "fps": fps, "seed": seed,
+                  "settings": settings}
+        self._file.write(json.dumps(header) + "\n")
+
+    def record(self, time_ms: int, events: Sequence[pygame.event.Event]) -> None:
+        """记录一帧收到的事件（time_ms 为自主循环开始以来的毫秒数）"""
+        for event in events:
+            name = _RECORDED_TYPES.get(event.type)
+            if name is None:
+                continue
+            entry: Dict[str, object] = {"t": time_ms, "type": name}
+            for attribute in EVENT_ATTRIBUTES:
+                if hasattr(event, attribute):
+                    entry[attribute] = getattr(event, attribute)
+            self._file.write(json.dumps(entry) + "\n")
+            self.event_count += 1
+
+    def close(self) -> None:
+        """关闭会话文件"""
+        self._file.close()
+        print(f"Recorded {self.event_count} events to {self.path}")
+
+
+# ============================================================================
+# 回放
+# ============================================================================
+
+class SessionReplay:
+    """按固定时间步长逐帧取出录制的事件，并收集每帧耗时"""
+
+    def __init__(self, path: str, fps: Optional[int] = None):
+        """
+        读取会话文件
+
+        Args:
+            path: 会话文件路径
+            fps: 回放时间步长对应的帧率，None = 使用录制时的帧率
+        """
+        with open(path, "r", encoding="utf-8") as session_file:
+            lines = [line for line in session_file if line.strip()]
+        if not lines:
+            raise ValueError(f"{path}: empty session file")
+        header = json.loads(lines[0])
+        if header.get("version") != SESSION_VERSION:
+            raise ValueError(f"{path}: unsupported session version {header.get('version')}")
+        self.path = path
+        self.screen_size: Tuple[int, int] = tuple(header["screen_size"])
+        self.seed: int = header["seed"]
+        self.settings: Dict[str, object] = header["settings"]
+        self.fps: int = fps or header["fps"]
+        self.step_ms = 1000.0 / self.fps
+        self.events: List[Dict[str, object]] = [json.loads(line) for line in lines[1:]]
+        self.end_ms = self.events[-1]["t"] if self.events else 0
+        self.frame = 0
+        self.frame_times: List[float] = []  # 毫秒
+        self._next = 0
+
+    @property
+    def time_ms(self) -> int:
+        """当前帧的模拟时间（毫秒），与真实耗时无关"""
+        return int(round(self.frame * self.step_ms))
+
+    @property
+    def finished(self) -> bool:
+        """全部事件都已回放"""
+        return self._next >= len(self.events) and self.time_ms >= self.end_ms
+
+    def next_events(self) -> List[pygame.event.Event]:
+        """取出时间戳不晚于当前帧模拟时间的事件，并前进一帧"""
+        now = self.time_ms
+        events = []
+        while self._next < len(self.events) and self.events[self._next]["t"] <= now:
+            entry = self.events[self._next]
+            self._next += 1
+            attributes = {key: tuple(value) if isinstance(value, list) else value
+                          for key, value in entry.items() if key not in ("t", "type")}
+            events.append(pygame.event.Event(getattr(pygame, entry["type"]), attributes))
+        self.frame += 1
+        return events
+
+
+def config_digest(path: Optional[str]) -> Optional[str]:
+    """配置文件内容的摘要（录制和回放的机器上路径可能不同，按内容比较）；没有配置文件时返回 None"""
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as config_file:
+            return hashlib.sha1(config_file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def renderer_mismatches(recorded: Dict[str, object], current: Dict[str, object]) -> List[str]:
+    """录制时与当前不同的渲染参数，格式为 "--参数: 录制值 -> 当前值" """
+    return [f"--{name.replace('_', '-')}: {value} -> {current.get(name)}"
+            for name, value in recorded.items() if current.get(name) != value]
+
+
+# ============================================================================
+# 帧耗时统计
+# ============================================================================
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """已排序序列的百分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def frame_time_summary(frame_times: Sequence[float], budget_ms: float) -> Dict[str, float]:
+    """
+    汇总帧耗时
+
+    Args:
+        frame_times: 每帧耗时（毫秒）
+        budget_ms: 帧时间预算（目标帧率对应的毫秒数）
+
+    Returns:
+        帧数、平均值、各百分位数、最大值和超出预算的帧数
+    """
+    ordered = sorted(frame_times)
+    count = len(ordered)
+    return {
+        "frames": count,
+        "mean_ms": sum(ordered) / count if count else 0.0,
+        "p50_ms": percentile(ordered, 0.50),
+        "p95_ms": percentile(ordered, 0.95),
+        "p99_ms": percentile(ordered, 0.99),
+        "max_ms": ordered[-1] if count else 0.0,
+        "over_budget": sum(1 for value in ordered if value > budget_ms),
+    }
+
+
+def format_summary(summary: Dict[str, float], budget_ms: float) -> List[str]:
+    """把帧耗时汇总格式化为报告行"""
+    return [
+        f"Frames: {summary['frames']}",
+        f"Mean: {summary['mean_ms']:.2f} ms  p50: {summary['p50_ms']:.2f} ms  "
+        f"p95: {summary['p95_ms']:.2f} ms  p99: {summary['p99_ms']:.2f} ms  max: {summary['max_ms']:.2f} ms",
+        f"Over {budget_ms:.1f} ms budget: {summary['over_budget']} frame(s)",
+    ]
@@ -0,0 +1,138 @@
+"""
+点击火花
+固定容量的粒子池：所有状态保存在启动时分配的数组中，发射只写入空闲槽位，
+更新按整个数组原地计算，连续点击不会在帧内分配内存或使池增长
+"""
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+# 空闲槽位的深度：位于相机后方，两条渲染路径都会直接剔除
+HIDDEN_Z = -1.0e6
+
+
+class SparklePool:
+    """固定容量的火花粒子池（粒子位置使用旋转后的场景坐标，不随场景旋转）"""
+
+    def __init__(self, capacity: int, dtype, colors: Sequence[Tuple[int, int, int]],
+                 bg_color: Tuple[int, int, int], lifetime: Tuple[float, float] = (0.8, 1.6),
+                 speed: Tuple[float, float] = (60.0, 220.0), gravity: float = 260.0,
+                 drag: float = 1.5, seed=None):
+        """
+        预先分配粒子池
+
+        Args:
+            capacity: 同时存在的火花数量上限
+            dtype: 粒子记录格式（main.PARTICLE_DTYPE），records 可直接交给大场景渲染器
+            colors: 火花颜色，发射时随机选择
+            bg_color: 背景色（火花随寿命淡出到背景色）
+            lifetime: 寿命范围（秒）
+            speed: 初速度范围（场景单位/秒）
+            gravity: 重力加速度（向下为正）
+            drag: 速度阻尼系数（每秒）
+            seed: 随机数种子
+        """
+        self.capacity = capacity
+        self.lifetime = lifetime
+        self.speed = speed
+        self.gravity = gravity
+        self.drag = drag
+        self.colors = np.array(colors, dtype=np.float32)
+        self.bg_color = np.array(bg_color, dtype=np.float32)
+
+        self.records = np.zeros(capacity, dtype=dtype)
+        self.records["z"] = HIDDEN_Z
+        self.velocity = np.zeros((capacity, 3), dtype=np.float32)
+        self.age = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)
+        self.base_color = np.zeros((capacity, 3), dtype=np.float32)
+        self.base_size = np.zeros(capacity, dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        # 更新时复用的临时数组
+        self._fade = np.empty(capacity, dtype=np.float32)
+        self._tmp = np.empty(capacity, dtype=np.float32)
+        self._color = np.empty((capacity, 3), dtype=np.float32)
+        self._dead = np.empty(capacity, dtype=bool)
+
+        self._rng = np.random.default_rng(seed)
+        self.in_use = 0
+        self.emitted = 0
+        self.dropped = 0
+
+    def emit(self, position: Tuple[float, float, float], count: int) -> int:
+        """
+        在 position 发射一簇火花
+
+        占用任意空闲槽位（寿命随机，空闲槽位不一定连续），空闲槽位不足时
+        只有超出的部分丢弃并计入 dropped，不会覆盖正在显示的火花。
+
+        Returns:
+            实际发射的数量
+        """
+        free = np.flatnonzero(~self.alive)
+        emitted = min(count, len(free))
+        self.dropped += count - emitted
+        if emitted == 0:
+            return 0
+        slots = free[:emitted]
+        rng = self._rng
+
+        # 随机方向（偏向上方）的初速度
+        direction = rng.normal(size=(emitted, 3)).astype(np.float32)
+        direction[:, 1] -= 0.8
+        direction /= np.maximum(np.linalg.norm(direction, axis=1, keepdims=True), 1e-6)
+        self.velocity[slots] = direction * rng.uniform(*self.speed, size=(emitted, 1))
+
+        records = self.records
+        records["x"][slots], records["y"][slots], records["z"][slots] = position
+        records["flicker_speed"][slots] = rng.uniform(6.0, 12.0, emitted)
+        records["flicker_offset"][slots] = rng.uniform(0, np.pi * 2, emitted)
+        records["fall_speed"][slots] = 0.0
+        records["is_snow"][slots] = 0
+        self.base_color[slots] = self.colors[rng.integers(0, len(self.colors), emitted)]
+        self.base_size[slots] = rng.uniform(1.5, 3.5, emitted)
+        self.age[slots] = 0.0
+        self.life[slots] = rng.uniform(*self.lifetime, emitted)
+        self.alive[slots] = True
+
+        self.in_use += emitted
+        self.emitted += emitted
+        return emitted
+
+    def update(self, dt: float) -> None:
+        """推进 dt 秒：积分运动、按寿命淡出和缩小，到期的槽位移到相机后方"""
+        if self.in_use == 0:
+            return
+        alive = self.alive
+        records = self.records
+
+        np.add(self.age, dt, out=self.age, where=alive)
+        np.less(self.age, self.life, out=alive)
+        np.logical_not(alive, out=self._dead)
+        self.in_use = int(np.count_nonzero(alive))
+
+        self.velocity[:, 1] += self.gravity * dt
+        self.velocity *= max(0.0, 1.0 - self.drag * dt)
+        for axis, field in enumerate(("x", "y", "z")):
+            np.multiply(self.velocity[:, axis], dt, out=self._tmp)
+            np.add(records[field], self._tmp, out=records[field])
+
+        # 颜色从原色线性过渡到背景色，大小缩小到 30%
+        np.divide(self.age, np.maximum(self.life, 1e-6, out=self._tmp), out=self._fade)
+        np.clip(self._fade, 0.0, 1.0, out=self._fade)
+        np.subtract(self.bg_color, self.base_color, out=self._color)
+        self._color *= self._fade[:, None]
+        self._color += self.base_color
+        for channel, field in enumerate(("r", "g", "b")):
+            np.copyto(records[field], self._color[:, channel], casting="unsafe")
+        np.multiply(self._fade, -0.7, out=self._tmp)
+        self._tmp += 1.0
+        np.multiply(self.base_size, self._tmp, out=records["size_base"])
+
+        np.copyto(records["z"], HIDDEN_Z, where=self._dead)
+
+    def stats(self) -> Tuple[int, int, int]:
+        """(使用中的槽位, 容量, 累计丢弃数量)"""
+        return self.in_use, self.capacity, self.dropped
@@ -0,0 +1,57 @@
+"""metrics 指标文本与导出服务的测试（在仓库根目录运行：python -m pytest tests）"""
+
+import os
+import socket
+import tempfile
+import unittest
+
+from metrics import FrameMetrics, MetricsExporter, format_sample
+
+
+def sample_line(text: str, name: str) -> str:
+    """返回某个无标签指标的样本行"""
+    return next(line for line in text.splitlines() if line.startswith(name + " "))
+
+
+class RenderPrometheusTest(unittest.TestCase):
+
+    def test_large_counters_keep_every_digit(self):
+        metrics = FrameMetrics(target_fps=60)
+        metrics.frames_total = 1234567
+        metrics.dropped_frames = 1000001
+        text = metrics.render_prometheus()
+        self.assertEqual(sample_line(text, "xmas_frames_total"), "xmas_frames_total 1234567")
+        self.assertEqual(sample_line(text, "xmas_dropped_frames_total"),
+                         "xmas_dropped_frames_total 1000001")
+
+    def test_floats_round_trip(self):
+        self.assertEqual(float(format_sample(0.016754321987)), 0.016754321987)
+        self.assertEqual(format_sample(60), "60")
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix domain sockets not supported")
+class SocketPathTest(unittest.TestCase):
+
+    def test_regular_file_is_not_removed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "config.json")
+            with open(path, "w") as file:
+                file.write("{}")
+            with self.assertRaises(OSError):
+                MetricsExporter(FrameMetrics(target_fps=60), socket_path=path)
+            self.assertTrue(os.path.isfile(path))
+
+    def test_stale_socket_is_replaced(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.sock")
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(path)
+            stale.close()
+            exporter = MetricsExporter(FrameMetrics(target_fps=60), socket_path=path)
+            exporter.start()
+            exporter.stop()
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""perf_log 帧耗时直方图与命令行参数的测试（在仓库根目录运行：python -m pytest tests）"""
+
+import sys
+import unittest
+from unittest import mock
+
+import perf_log
+from perf_log import FrameTimeHistogram
+
+
+class FrameTimeHistogramTest(unittest.TestCase):
+
+    def test_over_budget_is_exact_at_the_boundary(self):
+        """60 FPS 预算（16.667 ms）与预算同档的帧按实际值计数"""
+        histogram = FrameTimeHistogram(1000.0 / 60)
+        for value in (16.6, 16.66, 16.7, 16.74, 10.0, 33.4):
+            histogram.add(value)
+        self.assertEqual(histogram.summary()["over_budget"], 3)
+
+    def test_percentiles_are_rounded(self):
+        histogram = FrameTimeHistogram(1000.0 / 60)
+        histogram.add(18.254614999932528)
+        summary = histogram.summary()
+        self.assertEqual(summary["p99_ms"], 18.255)
+        self.assertEqual(summary["max_ms"], 18.255)
+
+
+class ParseArgsTest(unittest.TestCase):
+
+    def test_filters_after_subcommand(self):
+        argv = ["perf_log.py", "trend", "perf.jsonl", "--replays", "--host", "kiosk-1"]
+        with mock.patch.object(sys, "argv", argv):
+            args = perf_log.parse_args()
+        self.assertTrue(args.replays)
+        self.assertEqual(args.host, "kiosk-1")
+
+    def test_filters_default_off(self):
+        with mock.patch.object(sys, "argv", ["perf_log.py", "diff", "old.jsonl", "new.jsonl"]):
+            args = perf_log.parse_args()
+        self.assertFalse(args.replays)
+        self.assertIsNone(args.host)
+
+
+if __name__ == "__main__":
+    unittest.main()